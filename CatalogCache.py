@@ -0,0 +1,308 @@
+import os
+from os import path
+import sys
+import time
+import json
+import gc
+import zlib
+import struct
+import marshal
+import hashlib
+import threading
+
+#Default maximum size of all cached catalogs together
+DEFAULT_MAX_CACHE_SIZE_MB = 1024
+
+#Cache file of all accounts together of previous versions, it is replaced by a catalog per account
+LEGACY_CACHE_FILE = "all_cached_data.json"
+
+#EPG stores of each account and the files SQLite keeps next to them, these count to the size of the account's catalog
+STORE_PREFIXES  = ["epg", "epg_streams"]
+STORE_SUFFIXES  = [".sqlite", ".sqlite-wal", ".sqlite-shm", ".sqlite-download"]
+
+#Binary catalog format. Bump CACHE_FORMAT_VERSION when the layout changes,
+#catalogs written with another format or Python version are treated as a cache miss.
+CACHE_MAGIC             = b"IPTVCAT\0"
+CACHE_FORMAT_VERSION    = 1
+CACHE_HEADER            = struct.Struct('<8sHBBB')
+CACHE_FRAME             = struct.Struct('<I')
+CACHE_EXTENSION         = ".bin"
+
+#Number of entries packed and compressed together
+CACHE_CHUNK_SIZE        = 5000
+CACHE_COMPRESSION_LEVEL = 1
+
+class CatalogCache:
+    def __init__(self, cache_dir, max_size_mb=DEFAULT_MAX_CACHE_SIZE_MB):
+        self.cache_dir      = cache_dir
+        self.index_file     = path.join(cache_dir, "cache_index.json")
+        self.max_size_mb    = max_size_mb
+
+        #Workers can access the cache at the same time
+        self.lock = threading.RLock()
+
+    def cache_key(self, server, username):
+        #Key catalogs by server and username, so accounts never share a catalog
+        account = f"{server.strip().rstrip('/').lower()}|{username}"
+
+        return hashlib.sha1(account.encode("utf-8")).hexdigest()
+
+    def cache_path(self, server, username):
+        return path.join(self.cache_dir, f"catalog_{self.cache_key(server, username)}{CACHE_EXTENSION}")
+
+    def epg_path(self, server, username):
+        return path.join(self.cache_dir, f"epg_{self.cache_key(server, username)}.sqlite")
+
+    def stream_epg_path(self, server, username):
+        return path.join(self.cache_dir, f"epg_streams_{self.cache_key(server, username)}.sqlite")
+
+    def has_cache(self, server, username):
+        cache_path = self.cache_path(server, username)
+
+        #Check if cache file exists
+        if not path.isfile(cache_path):
+            return False
+
+        try:
+            with open(cache_path, 'rb') as cache_file:
+                return self.read_header(cache_file)
+        except Exception as e:
+            print(f"Failed reading cache header: {e}")
+            return False
+
+    def load(self, server, username):
+        with self.lock:
+            cache_path = self.cache_path(server, username)
+
+            #Check if cache file exists
+            if not path.isfile(cache_path):
+                return {}
+
+            with open(cache_path, 'rb') as cache_file:
+                #Catalogs of another format are a cache miss, they get replaced with the next save
+                if not self.read_header(cache_file):
+                    print("Cached catalog has an incompatible format, ignoring it")
+                    return {}
+
+                #Creating all entries would trigger the garbage collector many times for nothing
+                gc_enabled = gc.isenabled()
+                gc.disable()
+                try:
+                    cached_data = self.read_sections(cache_file)
+                finally:
+                    if gc_enabled:
+                        gc.enable()
+
+            #Mark catalog as recently used
+            index = self.load_index()
+            key = self.cache_key(server, username)
+            if key in index:
+                index[key]['last_used'] = time.time()
+                self.save_index(index)
+
+            return cached_data
+
+    def save(self, server, username, data, exclude_fields=()):
+        with self.lock:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+            cache_path  = self.cache_path(server, username)
+            tmp_path    = f"{cache_path}.tmp"
+
+            #Write to temporary file first, so a failed write doesn't corrupt the existing cache
+            with open(tmp_path, 'wb') as cache_file:
+                self.write_header(cache_file)
+                self.write_sections(cache_file, data, exclude_fields)
+
+            os.replace(tmp_path, cache_path)
+
+            #Update size and usage of this catalog
+            index = self.load_index()
+            index[self.cache_key(server, username)] = {
+                'server': server,
+                'username': username,
+                'size': self.get_key_size(self.cache_key(server, username)),
+                'last_used': time.time()
+            }
+
+            #Remove least recently used catalogs of other accounts when the cache is too large
+            self.evict(index, self.cache_key(server, username))
+
+            self.save_index(index)
+
+    def write_header(self, cache_file):
+        cache_file.write(CACHE_HEADER.pack(CACHE_MAGIC, CACHE_FORMAT_VERSION, sys.version_info.major, sys.version_info.minor, marshal.version))
+
+    def read_header(self, cache_file):
+        header = cache_file.read(CACHE_HEADER.size)
+        if len(header) != CACHE_HEADER.size:
+            return False
+
+        return CACHE_HEADER.unpack(header) == (CACHE_MAGIC, CACHE_FORMAT_VERSION, sys.version_info.major, sys.version_info.minor, marshal.version)
+
+    def write_frame(self, cache_file, obj):
+        #Each frame is compressed on its own, so only one chunk is in memory at a time
+        frame = zlib.compress(marshal.dumps(obj), CACHE_COMPRESSION_LEVEL)
+
+        cache_file.write(CACHE_FRAME.pack(len(frame)))
+        cache_file.write(frame)
+
+    def read_frame(self, cache_file):
+        size = cache_file.read(CACHE_FRAME.size)
+        if len(size) != CACHE_FRAME.size:
+            raise Exception("Cached catalog is truncated")
+
+        frame = cache_file.read(CACHE_FRAME.unpack(size)[0])
+
+        return marshal.loads(zlib.decompress(frame))
+
+    def write_sections(self, cache_file, data, exclude_fields=()):
+        #Table of contents: name and number of entries of each section
+        sections = [(name, len(entries)) for name, entries in data.items()]
+        self.write_frame(cache_file, sections)
+
+        for name, entries in data.items():
+            for start in range(0, len(entries), CACHE_CHUNK_SIZE):
+                self.write_frame(cache_file, self.pack_chunk(entries[start:start + CACHE_CHUNK_SIZE], exclude_fields))
+
+    def read_sections(self, cache_file):
+        data = {}
+
+        for name, num_of_entries in self.read_frame(cache_file):
+            entries = []
+
+            while len(entries) < num_of_entries:
+                entries.extend(self.unpack_chunk(self.read_frame(cache_file)))
+
+            data[name] = entries
+
+        return data
+
+    def pack_chunk(self, entries, exclude_fields=()):
+        #Pack entries as value tuples, the keys of entries with the same fields are only stored once.
+        #Excluded fields are left out, e.g. fields that are derived from the settings when loading.
+        schemas     = []
+        schema_idxs = {}
+        rows        = []
+
+        for entry in entries:
+            #Removed entries are kept as None, so rows stay the same
+            if entry is None:
+                rows.append((-1, ()))
+                continue
+
+            if exclude_fields and not exclude_fields.isdisjoint(entry.keys()):
+                entry = {key: value for key, value in entry.items() if key not in exclude_fields}
+
+            keys = tuple(entry.keys())
+
+            schema_idx = schema_idxs.get(keys)
+            if schema_idx is None:
+                schema_idx = len(schemas)
+                schema_idxs[keys] = schema_idx
+                schemas.append(keys)
+
+            rows.append((schema_idx, tuple(entry.values())))
+
+        return (schemas, rows)
+
+    def unpack_chunk(self, chunk):
+        schemas, rows = chunk
+
+        return [dict(zip(schemas[schema_idx], values)) if schema_idx >= 0 else None for schema_idx, values in rows]
+
+    def remove(self, server, username):
+        with self.lock:
+            index = self.load_index()
+            self.remove_key(index, self.cache_key(server, username))
+            self.save_index(index)
+
+    def update_size(self, server, username):
+        #Update the sizes after the EPG stores changed, e.g. after downloading the EPG
+        with self.lock:
+            index = self.load_index()
+            self.evict(index, self.cache_key(server, username))
+            self.save_index(index)
+
+    def total_size(self):
+        with self.lock:
+            return sum(self.get_key_size(key) for key in self.load_index().keys())
+
+    def get_key_size(self, key):
+        #Size of the catalog and the EPG stores of an account
+        paths = [path.join(self.cache_dir, f"catalog_{key}{CACHE_EXTENSION}")]
+        paths += [path.join(self.cache_dir, f"{prefix}_{key}{suffix}") for prefix in STORE_PREFIXES for suffix in STORE_SUFFIXES]
+
+        return sum(path.getsize(file_path) for file_path in paths if path.isfile(file_path))
+
+    def remove_legacy_cache(self):
+        if path.isfile(LEGACY_CACHE_FILE):
+            try:
+                os.remove(LEGACY_CACHE_FILE)
+            except Exception as e:
+                print(f"Failed removing old cache file: {e}")
+
+    def set_max_size(self, max_size_mb, server="", username=""):
+        with self.lock:
+            self.max_size_mb = max_size_mb
+
+            #Remove catalogs that don't fit anymore, except the one of the current account
+            index = self.load_index()
+            self.evict(index, self.cache_key(server, username))
+            self.save_index(index)
+
+    def evict(self, index, keep_key):
+        #The EPG stores change without saving the catalog, so the sizes are taken from the files
+        for key, info in index.items():
+            info['size'] = self.get_key_size(key)
+
+        max_size    = self.max_size_mb * 1024 * 1024
+        total_size  = sum(info.get('size', 0) for info in index.values())
+
+        #Go through the catalogs from least to most recently used
+        for key in sorted(index.keys(), key=lambda key: index[key].get('last_used', 0)):
+            if total_size <= max_size:
+                break
+
+            #Never remove the catalog of the current account
+            if key == keep_key:
+                continue
+
+            total_size -= index[key].get('size', 0)
+
+            print(f"Removing cached catalog of {index[key].get('username', '?')} at {index[key].get('server', '?')}")
+            self.remove_key(index, key)
+
+    def remove_key(self, index, key):
+        index.pop(key, None)
+
+        cache_path = path.join(self.cache_dir, f"catalog_{key}{CACHE_EXTENSION}")
+        if path.isfile(cache_path):
+            os.remove(cache_path)
+
+        #Remove EPG stores of this account including their SQLite journal and download files
+        for prefix in STORE_PREFIXES:
+            for suffix in STORE_SUFFIXES:
+                store_path = path.join(self.cache_dir, f"{prefix}_{key}{suffix}")
+                if path.isfile(store_path):
+                    os.remove(store_path)
+
+    def load_index(self):
+        index = {}
+
+        #Check if index file exists
+        if path.isfile(self.index_file):
+            try:
+                with open(self.index_file, 'r') as index_file:
+                    index = json.load(index_file)
+            except Exception as e:
+                print(f"Failed loading cache index: {e}")
+
+        #Forget catalogs that have been removed from the cache directory
+        return {key: info for key, info in index.items() if path.isfile(path.join(self.cache_dir, f"catalog_{key}{CACHE_EXTENSION}"))}
+
+    def save_index(self, index):
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        with open(self.index_file, 'w') as index_file:
+            json.dump(index, index_file, indent=4)
@@ -0,0 +1,420 @@
+import re
+import time
+import locale
+from bisect import insort
+from heapq import merge
+
+from SearchIndex import TrigramIndex, intersect_rows, PROVIDER_PREFIX_PATTERN
+
+#Sort keys per sort order, 0: A-Z, 1: Z-A (reversed A-Z), 2: recently added, 3: rating
+SORT_KEYS = {0: 'name', 1: 'name', 2: 'added', 3: 'rating'}
+
+#Facets the lists can be filtered on, extracted from the provider data of each entry
+FACETS = ('country', 'year', 'adult')
+
+#Release year in parentheses in names, e.g. 'CN - Name (2023)'
+YEAR_PATTERN = re.compile(r'\((19\d\d|20\d\d)\)')
+
+#Country codes of ISO 3166-1 and language codes of ISO 639-1 that are not a country code, and the
+#codes providers commonly use instead, e.g. 'UK' for GB and 'LAT' for Latin America.
+#Only prefixes starting with one of these are used as country, so prefixes like '4K' or 'VIP' are not.
+COUNTRY_CODES = frozenset('''
+    AD AE AF AG AI AL AM AO AQ AR AS AT AU AW AX AZ BA BB BD BE BF BG BH BI BJ BL BM BN BO BQ BR BS BT BV BW BY BZ
+    CA CC CD CF CG CH CI CK CL CM CN CO CR CU CV CW CX CY CZ DE DJ DK DM DO DZ EC EE EG EH ER ES ET FI FJ FK FM FO FR
+    GA GB GD GE GF GG GH GI GL GM GN GP GQ GR GS GT GU GW GY HK HM HN HR HT HU ID IE IL IM IN IO IQ IR IS IT JE JM JO
+    JP KE KG KH KI KM KN KP KR KW KY KZ LA LB LC LI LK LR LS LT LU LV LY MA MC MD ME MF MG MH MK ML MM MN MO MP MQ MR
+    MS MT MU MV MW MX MY MZ NA NC NE NF NG NI NL NO NP NR NU NZ OM PA PE PF PG PH PK PL PM PN PR PS PT PW PY QA RE RO
+    RS RU RW SA SB SC SD SE SG SH SI SJ SK SL SM SN SO SR SS ST SV SX SY SZ TC TD TF TG TH TJ TK TL TM TN TO TR TT TV
+    TW TZ UA UG UM US UY UZ VA VC VE VG VI VN VU WF WS YE YT ZA ZM ZW
+    DA EL EN FA HE HI JA KO KU SQ UR ZH
+    UK EU LAT ARB AFR USA
+'''.split())
+
+#Rows sorted at once when building a sort permutation in steps, the sorted runs are merged afterwards
+SORT_RUN_LENGTH = 1024
+
+#Number of rows between checking the time of a step
+ROWS_PER_TIME_CHECK = 256
+
+#Set bits of every byte value, used for converting bitmaps to rows
+BYTE_BITS = [tuple(bit for bit in range(8) if byte >> bit & 1) for byte in range(256)]
+
+def build_search_index(search_index, entries, strip_prefixes):
+    #Index the rows of a search index snapshot again with other search keys.
+    #Only reads the snapshot and the entries, so it can be done in another thread.
+    rebuilt_index = TrigramIndex(strip_prefixes)
+
+    for row, name in enumerate(search_index.names):
+        if name is not None and entries[row] is not None:
+            rebuilt_index.add(row, entries[row].get('name', ''))
+
+    return rebuilt_index
+
+def name_sort_key(name):
+    #Compare names case insensitive and in the order of the user's language.
+    #QApplication sets the locale of the user, so strxfrm follows it.
+    try:
+        return locale.strxfrm(str(name).casefold())
+    except Exception:
+        return str(name).casefold()
+
+def number_sort_key(value):
+    #Numbers can be strings or missing in the provider data
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+def entry_sort_key(entry, sort_key):
+    match sort_key:
+        case 'added': #Newest first, series have 'last_modified' instead of 'added'
+            return (-number_sort_key(entry.get('added') or entry.get('last_modified')), number_sort_key(entry.get('num')))
+
+        case 'rating': #Highest rating first
+            return (-number_sort_key(entry.get('rating_5based')), number_sort_key(entry.get('num')))
+
+        case _:
+            return name_sort_key(entry.get('name', ''))
+
+def get_entry_facets(entry):
+    #Facet values of an entry, facets without value are left out
+    facets  = {}
+    name    = str(entry.get('name', ''))
+
+    #Country or language prefix of the provider, e.g. 'PT' of 'PT|' and 'BE' of 'BE-VIP|'
+    prefix_match = PROVIDER_PREFIX_PATTERN.match(name)
+    if prefix_match:
+        country = re.split(r'[ -]', prefix_match.group(1), maxsplit=1)[0]
+        if country in COUNTRY_CODES:
+            facets['country'] = country
+
+    #Year in the name, otherwise from the release date of series
+    years = YEAR_PATTERN.findall(name)
+    if years:
+        facets['year'] = years[-1]
+    else:
+        release_date = str(entry.get('year') or entry.get('releaseDate') or '')[:4]
+        if release_date.isdigit():
+            facets['year'] = release_date
+
+    facets['adult'] = str(entry.get('is_adult', 0)).lower() in ('1', 'true')
+
+    return facets
+
+def rows_to_bitmap(rows):
+    #Bit n of the bitmap is set when row n is in the rows
+    if not rows:
+        return 0
+
+    data = bytearray(max(rows) // 8 + 1)
+    for row in rows:
+        data[row >> 3] |= 1 << (row & 7)
+
+    return int.from_bytes(data, 'little')
+
+def bitmap_to_rows(bitmap):
+    #Sorted rows of the set bits, empty bytes are skipped
+    rows = []
+    data = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, 'little')
+
+    for i, byte in enumerate(data):
+        if byte:
+            rows.extend(i * 8 + bit for bit in BYTE_BITS[byte])
+
+    return rows
+
+class CatalogIndex:
+    def __init__(self, stream_type, entries=(), build=True, strip_prefixes=False):
+        self.entries = entries
+
+        #Series are identified by series id, LIVE and Movies by stream id
+        self.id_key = 'series_id' if stream_type == 'Series' else 'stream_id'
+
+        #Rows in entries_per_stream_type per stream id. Providers can have duplicate stream ids.
+        self.rows_per_id        = {}
+        self.favorite_rows      = set()
+
+        #Rows per category id, entries can be in multiple categories
+        self.rows_per_category  = {}
+
+        #Rows per value of each facet, see get_entry_facets. The bitmaps of the values
+        #are computed once when first filtered on.
+        self.rows_per_facet_value   = {facet: {} for facet in FACETS}
+        self.facet_bitmaps          = {}
+
+        #Trigram index of the names for substring search. Once it is shared with a search worker,
+        #it is copied before it is changed.
+        self.search_index           = TrigramIndex(strip_prefixes)
+        self.search_index_shared    = False
+
+        #Number of changes of the search index, a search index rebuilt in another thread is only used when it didn't change
+        self.search_index_version   = 0
+
+        #Sorted rows and rank of each row per sort key, computed once when first needed
+        self.sort_permutations  = {}
+        self.num_of_rows        = 0
+
+        #Without build the rows are added in parts with add_rows
+        if build:
+            self.add_rows(0, len(entries))
+
+    def add_rows(self, start, stop, deadline=None):
+        #Add rows until stop, or until the deadline has passed. Returns the row to continue with.
+        for row in range(start, stop):
+            if deadline is not None and time.perf_counter() >= deadline:
+                return row
+
+            #Skip entries that are not available anymore
+            if self.entries[row] is not None:
+                self.add_row(row, self.entries[row])
+
+        return stop
+
+    def add_row(self, row, entry):
+        #Keep rows sorted, so duplicates are matched in list order
+        insort(self.rows_per_id.setdefault(entry.get(self.id_key), []), row)
+        self.num_of_rows += 1
+
+        #Sort permutations don't contain this row yet
+        self.sort_permutations.clear()
+
+        if entry.get('favorite', False):
+            self.favorite_rows.add(row)
+
+        self.get_own_search_index().add(row, entry.get('name', ''))
+
+        for category_id in self.get_entry_categories(entry):
+            insort(self.rows_per_category.setdefault(category_id, []), row)
+
+        #Bitmaps don't contain this row yet
+        self.facet_bitmaps.clear()
+
+        for facet, value in get_entry_facets(entry).items():
+            insort(self.rows_per_facet_value[facet].setdefault(value, []), row)
+
+    def remove_row(self, row, entry):
+        stream_id   = entry.get(self.id_key)
+        rows        = self.rows_per_id.get(stream_id)
+
+        if rows and row in rows:
+            rows.remove(row)
+            self.num_of_rows -= 1
+
+            if not rows:
+                del self.rows_per_id[stream_id]
+
+        self.sort_permutations.clear()
+
+        self.favorite_rows.discard(row)
+
+        self.get_own_search_index().remove(row)
+
+        for category_id in self.get_entry_categories(entry):
+            rows = self.rows_per_category.get(category_id)
+
+            if rows and row in rows:
+                rows.remove(row)
+
+                if not rows:
+                    del self.rows_per_category[category_id]
+
+        self.facet_bitmaps.clear()
+
+        for facet, value in get_entry_facets(entry).items():
+            rows = self.rows_per_facet_value[facet].get(value)
+
+            if rows and row in rows:
+                rows.remove(row)
+
+                if not rows:
+                    del self.rows_per_facet_value[facet][value]
+
+    def get_entry_categories(self, entry):
+        #Category ids are strings in the category list, but can be numbers in 'category_ids'
+        category_ids = set()
+
+        if entry.get('category_id') is not None:
+            category_ids.add(str(entry['category_id']))
+
+        if isinstance(entry.get('category_ids'), list):
+            for category_id in entry['category_ids']:
+                if category_id is not None:
+                    category_ids.add(str(category_id))
+
+        return category_ids
+
+    def get_category_rows(self, category_id):
+        return self.rows_per_category.get(str(category_id), [])
+
+    def get_rows(self, stream_id):
+        return self.rows_per_id.get(stream_id, [])
+
+    def set_favorite(self, row, is_fav):
+        if is_fav:
+            self.favorite_rows.add(row)
+        else:
+            self.favorite_rows.discard(row)
+
+    def get_favorite_rows(self):
+        return sorted(self.favorite_rows)
+
+    def search_rows(self, text, rows=None):
+        #Get rows of which the name contains the text, only within the given rows
+        if not text and rows is not None:
+            return list(rows)
+
+        found_rows = self.search_index.search(text)
+
+        if rows is None or len(rows) == self.num_of_rows:
+            return found_rows
+
+        return intersect_rows(found_rows, rows)
+
+    def get_search_snapshot(self):
+        #The returned search index doesn't change anymore, so it can be searched from another thread
+        self.search_index_shared = True
+
+        return self.search_index
+
+    def get_own_search_index(self):
+        #Copy the search index before changing it, when it is shared with a search worker
+        if self.search_index_shared:
+            self.search_index           = self.search_index.copy()
+            self.search_index_shared    = False
+
+        #The caller changes the search index
+        self.search_index_version += 1
+
+        return self.search_index
+
+    def get_search_key(self, text):
+        #Search texts are normalized the same as the indexed names
+        return self.search_index.get_key(text)
+
+    def get_search_rebuild(self):
+        #Search index snapshot and its version for rebuilding it in another thread, see build_search_index
+        return self.get_search_snapshot(), self.search_index_version
+
+    def set_rebuilt_search_index(self, search_index, version):
+        #Use the rebuilt search index, unless rows were changed while it was rebuilt
+        if version != self.search_index_version:
+            return False
+
+        self.search_index           = search_index
+        self.search_index_shared    = False
+
+        return True
+
+    def filter_rows(self, rows, text):
+        #Get the given rows of which the name contains the text, without using the trigram index
+        return self.search_index.filter(rows, text)
+
+    def get_facet_values(self, facet):
+        #Values of the facet with their number of rows
+        return {value: len(rows) for value, rows in self.rows_per_facet_value[facet].items()}
+
+    def get_facet_bitmap(self, facet, value):
+        if (facet, value) not in self.facet_bitmaps:
+            self.facet_bitmaps[(facet, value)] = rows_to_bitmap(self.rows_per_facet_value[facet].get(value, []))
+
+        return self.facet_bitmaps[(facet, value)]
+
+    def filter_facets(self, rows, selected_facets):
+        #Get the given rows that have all selected facet values, by intersecting the bitmaps of the values.
+        #Facets without selected value (None) don't filter.
+        selected_facets = [(facet, value) for facet, value in selected_facets.items() if value is not None]
+
+        if not selected_facets:
+            return list(rows)
+
+        #All rows are given, so the rows don't have to be intersected
+        bitmap = None if len(rows) == self.num_of_rows else rows_to_bitmap(rows)
+
+        for facet, value in selected_facets:
+            facet_bitmap    = self.get_facet_bitmap(facet, value)
+            bitmap          = facet_bitmap if bitmap is None else bitmap & facet_bitmap
+
+            if not bitmap:
+                return []
+
+        return bitmap_to_rows(bitmap)
+
+    def get_sort_permutation(self, sort_key):
+        if sort_key not in self.sort_permutations:
+            for _ in self.build_sort_permutation(sort_key):
+                pass
+
+        return self.sort_permutations[sort_key]
+
+    def build_sort_permutation(self, sort_key, step_seconds=None):
+        #Compute the sort permutation in steps of about step_seconds, the caller can do other work at each yield.
+        #In steps the rows are sorted in short runs which are merged, so no step sorts all rows at once.
+        #Without step_seconds everything is done in one step.
+        entries     = self.entries
+        run_length  = SORT_RUN_LENGTH if step_seconds else len(entries) + 1
+        deadline    = time.perf_counter() + step_seconds if step_seconds else None
+
+        runs    = []
+        run     = []
+
+        for row, entry in enumerate(entries):
+            #Equal sort keys keep the order of the rows
+            if entry is not None:
+                run.append((entry_sort_key(entry, sort_key), row))
+
+            if len(run) >= run_length:
+                run.sort()
+                runs.append(run)
+                run = []
+
+            if deadline is not None and row % ROWS_PER_TIME_CHECK == 0 and time.perf_counter() >= deadline:
+                yield
+                deadline = time.perf_counter() + step_seconds
+
+        run.sort()
+        runs.append(run)
+
+        if len(runs) == 1:
+            sorted_rows = [row for key, row in runs[0]]
+        else:
+            sorted_rows = []
+
+            for key, row in merge(*runs):
+                sorted_rows.append(row)
+
+                if len(sorted_rows) % ROWS_PER_TIME_CHECK == 0 and time.perf_counter() >= deadline:
+                    yield
+                    deadline = time.perf_counter() + step_seconds
+
+        #Free the runs one at a time, freeing all sort keys at once takes longer than a step
+        while runs:
+            runs.pop()
+
+            if deadline is not None and time.perf_counter() >= deadline:
+                yield
+                deadline = time.perf_counter() + step_seconds
+
+        #Rank of each row, so subsets can be sorted by comparing numbers only
+        ranks = [0] * len(entries)
+        for rank, row in enumerate(sorted_rows):
+            ranks[row] = rank
+
+            if deadline is not None and rank % ROWS_PER_TIME_CHECK == 0 and time.perf_counter() >= deadline:
+                yield
+                deadline = time.perf_counter() + step_seconds
+
+        self.sort_permutations[sort_key] = (sorted_rows, ranks)
+
+    def sort_rows(self, rows, sort_order):
+        sorted_rows, ranks = self.get_sort_permutation(SORT_KEYS.get(sort_order, 'name'))
+
+        if len(rows) == self.num_of_rows:
+            #All rows are shown, use the permutation itself
+            rows = list(sorted_rows)
+        else:
+            rows = sorted(rows, key=ranks.__getitem__)
+
+        if sort_order == 1:
+            rows.reverse()
+
+        return rows
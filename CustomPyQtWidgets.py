@@ -1,7 +1,8 @@
-from PyQt5.QtGui import QIcon, QFont, QImage, QPixmap, QColor, QDesktopServices
+from PyQt5.QtGui import QIcon, QFont, QImage, QPixmap, QColor, QDesktopServices, QPalette
 from PyQt5.QtCore import (
     Qt, QTimer, QPropertyAnimation, QEasingCurve, QSize, QObject, pyqtSignal, 
-    QRunnable, pyqtSlot, QThreadPool, QModelIndex, QAbstractItemModel, QVariant, QUrl
+    QRunnable, pyqtSlot, QThreadPool, QModelIndex, QAbstractItemModel, QVariant, QUrl,
+    QAbstractListModel
 )
 from PyQt5 import QtWidgets
 from PyQt5.QtWidgets import (
@@ -9,13 +10,25 @@ from PyQt5.QtWidgets import (
     QListWidget, QWidget, QFileDialog, QCheckBox, QSizePolicy, QHBoxLayout,
     QDialog, QFormLayout, QDialogButtonBox, QTabWidget, QListWidgetItem,
     QSpinBox, QMenu, QAction, QTextEdit, QGridLayout, QMessageBox, QListView,
-    QTreeWidget, QTreeWidgetItem, QTreeView, QScrollArea
+    QTreeWidget, QTreeWidgetItem, QTreeView, QScrollArea, QStyledItemDelegate, QStyleOptionViewItem, QStyle
 )
 
 from os import path
+import time
 import configparser
 import json
 
+from CatalogIndex import name_sort_key
+from IngestFilter import IngestFilter, STREAM_TYPES, compile_pattern
+from EPGStore import get_epg_description
+
+#Updates with more separate row ranges than this reset the list model instead
+MAX_LIST_UPDATE_RANGES = 200
+
+#Columns of the EPG list, the description of a programme is shown below it in the name column
+EPG_COLUMNS             = ["Date", "From", "To", "Name"]
+EPG_DESCRIPTION_COLUMN  = 3
+
 class LiveInfoBox(QWidget):
     def __init__(self, parent=None):
         super().__init__()
@@ -41,10 +54,15 @@ class LiveInfoBox(QWidget):
         self.cover.setPixmap(self.cover_img.scaledToHeight(self.maxCoverHeight))
         self.cover.setMaximumHeight(self.maxCoverHeight)
 
-        #Create entry info window
-        self.live_EPG_info = QTreeWidget()
-        self.live_EPG_info.setColumnCount(2)
-        self.live_EPG_info.setHeaderLabels(["Date", "From", "To", "Name"])
+        #Create entry info window. Programmes are shown with a model and descriptions are drawn by a delegate,
+        #so no item or widget is created per programme.
+        self.live_EPG_model = EPGListModel(self)
+        self.live_EPG_info  = QTreeView()
+        self.live_EPG_info.setModel(self.live_EPG_model)
+        self.live_EPG_info.setItemDelegate(EPGDescriptionDelegate(self.live_EPG_info))
+
+        #Descriptions get their height from the width of the name column
+        self.live_EPG_info.header().sectionResized.connect(self.live_EPG_info.itemDelegate().columnResized)
 
         #Set column widths of EPG info window
         self.live_EPG_info.setColumnWidth(0, 120)
@@ -340,4 +358,490 @@ class SeriesInfoBox(QScrollArea):
             #If not favorite, set normal icon
             self.fav_button.setIcon(self.parent.favorites_icon)
 
+class CatalogListModel(QAbstractListModel):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+
+        #Rows refer to entries by index, so no item is created per entry
+        self.entries        = []
+        self.rows           = []
+        self.source_rows    = []
+        self.text_key       = 'name'
+
+        #Function sorting rows with precomputed sort permutations, otherwise rows are sorted by text
+        self.sort_function  = None
+
+        #Items shown above the entries, e.g. 'All', 'Favorites' and 'Go back'. Each item is (text, data, icon).
+        self.pinned_items   = []
+
+        #Changes every time the list is reloaded, used for identifying items of the current list
+        self.generation     = 0
+
+        self.font           = None
+
+    def setEntries(self, entries, rows=None, text_key='name', pinned_items=None, sort_function=None):
+        self.beginResetModel()
+
+        self.entries        = entries
+        self.source_rows    = list(range(len(entries))) if rows is None else list(rows)
+        self.rows           = list(self.source_rows)
+        self.text_key       = text_key
+        self.sort_function  = sort_function
+        self.pinned_items   = list(pinned_items or [])
+        self.generation    += 1
+
+        self.endResetModel()
+
+    def updateRows(self, source_rows, rows):
+        #Show other rows of the same entries. When rows are only removed or only added, the view is updated
+        #with remove or insert signals instead of a reset, so it keeps its scroll position and selection.
+        self.source_rows = list(source_rows)
+
+        if not self.removeRowRanges(rows) and not self.insertRowRanges(rows):
+            self.beginResetModel()
+            self.rows = list(rows)
+            self.endResetModel()
+
+        self.generation += 1
+
+    def removeRowRanges(self, rows):
+        kept_rows   = set(rows)
+        keep        = [row in kept_rows for row in self.rows]
+
+        #Check if the new rows are the current rows with some rows removed
+        if [row for row, is_kept in zip(self.rows, keep) if is_kept] != list(rows):
+            return False
+
+        ranges = self.getRanges(keep)
+        if len(ranges) > MAX_LIST_UPDATE_RANGES:
+            return False
+
+        #Remove from the end, so the positions of the other ranges stay the same
+        offset = len(self.pinned_items)
+        for start, end in reversed(ranges):
+            self.beginRemoveRows(QModelIndex(), offset + start, offset + end)
+            del self.rows[start:end + 1]
+            self.endRemoveRows()
+
+        return True
+
+    def insertRowRanges(self, rows):
+        current_rows    = set(self.rows)
+        keep            = [row in current_rows for row in rows]
+
+        #Check if the new rows are the current rows with some rows added
+        if [row for row, is_kept in zip(rows, keep) if is_kept] != self.rows:
+            return False
+
+        ranges = self.getRanges(keep)
+        if len(ranges) > MAX_LIST_UPDATE_RANGES:
+            return False
+
+        #Insert from the start, the rows before each range are already in place
+        offset = len(self.pinned_items)
+        for start, end in ranges:
+            self.beginInsertRows(QModelIndex(), offset + start, offset + end)
+            self.rows[start:start] = rows[start:end + 1]
+            self.endInsertRows()
+
+        return True
+
+    def getRanges(self, keep):
+        #Get (start, end) ranges of positions that are not kept
+        ranges = []
+        start = None
+
+        for i, is_kept in enumerate(keep):
+            if not is_kept and start is None:
+                start = i
+            elif is_kept and start is not None:
+                ranges.append((start, i - 1))
+                start = None
+
+        if start is not None:
+            ranges.append((start, len(keep) - 1))
+
+        return ranges
+
+    def setPinnedItems(self, pinned_items):
+        self.beginResetModel()
+
+        self.pinned_items   = list(pinned_items)
+        self.generation    += 1
+
+        self.endResetModel()
+
+    def clear(self):
+        self.setEntries([])
+
+    def sortRows(self, sort_order):
+        #Sort entries, 0: A-Z, 1: Z-A, 2: recently added, 3: rating. Pinned items stay on top.
+        self.beginResetModel()
+
+        if self.sort_function:
+            self.rows = self.sort_function(self.source_rows, sort_order)
+        else:
+            #Lists without sort permutations are sorted by text only
+            self.rows = sorted(self.source_rows, key=lambda row: name_sort_key(self.entryText(self.entries[row])), reverse=(sort_order == 1))
+        self.generation += 1
+
+        self.endResetModel()
+
+    def unsortRows(self):
+        #Show entries in their original order
+        self.beginResetModel()
+
+        self.rows = list(self.source_rows)
+        self.generation += 1
+
+        self.endResetModel()
+
+    def setFont(self, font):
+        self.font = font
+
+        if self.rowCount():
+            self.dataChanged.emit(self.index(0), self.index(self.rowCount() - 1), [Qt.FontRole])
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+
+        return len(self.pinned_items) + len(self.rows)
+
+    def isPinned(self, row):
+        return row < len(self.pinned_items)
+
+    def entryCount(self):
+        return len(self.rows)
+
+    def entry(self, row):
+        #Get the data of the item, for entries this is the entry dict itself
+        if row < 0 or row >= self.rowCount():
+            return None
+
+        if self.isPinned(row):
+            return self.pinned_items[row][1]
+
+        return self.entries[self.rows[row - len(self.pinned_items)]]
+
+    def entryRow(self, row):
+        #Get the index of the entry in the entries list
+        if row < len(self.pinned_items) or row >= self.rowCount():
+            return None
+
+        return self.rows[row - len(self.pinned_items)]
+
+    def text(self, row):
+        if self.isPinned(row):
+            return self.pinned_items[row][0]
+
+        return self.entryText(self.entry(row))
+
+    def entryText(self, entry):
+        #Entries that are not available anymore have no text
+        if entry is None:
+            return ""
+
+        return str(entry.get(self.text_key, ""))
+
+    def itemKey(self, row):
+        #Identifies an item until the list is reloaded, like a list widget item
+        return (id(self), self.generation, row)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+
+        row = index.row()
+
+        if role == Qt.DisplayRole:
+            return self.text(row)
+
+        if role == Qt.DecorationRole and self.isPinned(row):
+            return self.pinned_items[row][2]
+
+        if role == Qt.FontRole:
+            return self.font
+
+        return None
+
+class EPGListModel(QAbstractItemModel):
+    #Programmes of a channel, each with its description as child row. Instead of programmes a message row can be
+    #shown, e.g. 'Loading EPG Data...'. Descriptions are decoded when their row is shown, i.e. when it is expanded.
+    def __init__(self, parent=None):
+        super().__init__(parent)
+
+        self.epg_listings   = []
+        self.message        = None
+
+    def setListings(self, epg_listings):
+        self.beginResetModel()
+
+        self.epg_listings   = list(epg_listings)
+        self.message        = None
+
+        self.endResetModel()
+
+    def setMessage(self, columns):
+        self.beginResetModel()
+
+        self.epg_listings   = []
+        self.message        = list(columns)
+
+        self.endResetModel()
+
+    def clear(self):
+        self.setListings([])
+
+    def isDescription(self, index):
+        #Description rows store the row of their programme + 1 as internal id, programme rows 0
+        return index.isValid() and index.internalId() != 0
+
+    def index(self, row, column, parent=QModelIndex()):
+        if not self.hasIndex(row, column, parent):
+            return QModelIndex()
+
+        if parent.isValid():
+            return self.createIndex(row, column, parent.row() + 1)
+
+        return self.createIndex(row, column, 0)
+
+    def parent(self, index):
+        if not self.isDescription(index):
+            return QModelIndex()
+
+        return self.createIndex(index.internalId() - 1, 0, 0)
+
+    def rowCount(self, parent=QModelIndex()):
+        if not parent.isValid():
+            return 1 if self.message else len(self.epg_listings)
+
+        #Only programmes have a description row
+        if not self.message and not self.isDescription(parent) and parent.column() == 0:
+            return 1
+
+        return 0
+
+    def columnCount(self, parent=QModelIndex()):
+        return len(EPG_COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return EPG_COLUMNS[section]
+
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+
+        column = index.column()
+
+        if self.message:
+            return self.message[column]
+
+        if self.isDescription(index):
+            if column != EPG_DESCRIPTION_COLUMN:
+                return None
+
+            return get_epg_description(self.epg_listings[index.internalId() - 1])
+
+        epg_entry = self.epg_listings[index.row()]
+
+        if column == 0:
+            return epg_entry['date']
+        if column == 1:
+            return epg_entry['start_time'].strftime("%H:%M")
+        if column == 2:
+            return epg_entry['stop_time'].strftime("%H:%M")
+
+        return epg_entry['program_name']
+
+class EPGDescriptionDelegate(QStyledItemDelegate):
+    #Draws programme descriptions word wrapped in the name column, instead of a label widget per description
+    def isDescription(self, index):
+        return index.column() == EPG_DESCRIPTION_COLUMN and index.model().isDescription(index)
+
+    def columnResized(self, column, old_width, new_width):
+        #Lay out the expanded descriptions again with the new width
+        if column == EPG_DESCRIPTION_COLUMN:
+            self.sizeHintChanged.emit(QModelIndex())
+
+    def paint(self, painter, option, index):
+        if not self.isDescription(index):
+            super().paint(painter, option, index)
+            return
+
+        option = QStyleOptionViewItem(option)
+        self.initStyleOption(option, index)
+
+        text        = option.text
+        option.text = ""
+
+        #Draw the background and selection without text, then the wrapped text on top
+        style = option.widget.style() if option.widget else QApplication.style()
+        style.drawControl(QStyle.CE_ItemViewItem, option, painter, option.widget)
+
+        painter.save()
+        painter.setFont(option.font)
+        painter.setPen(option.palette.color(QPalette.HighlightedText if option.state & QStyle.State_Selected else QPalette.Text))
+        painter.drawText(option.rect.adjusted(2, 0, -2, 0), Qt.AlignLeft | Qt.AlignTop | Qt.TextWordWrap, text)
+        painter.restore()
+
+    def sizeHint(self, option, index):
+        if not self.isDescription(index):
+            return super().sizeHint(option, index)
+
+        width = max(self.parent().columnWidth(EPG_DESCRIPTION_COLUMN) - 4, 1)
+        rect  = option.fontMetrics.boundingRect(0, 0, width, 0, Qt.AlignLeft | Qt.TextWordWrap, index.data() or "")
+
+        return QSize(width, rect.height() + 4)
+
+class LiveListModel(CatalogListModel):
+    #Shows what's on now behind the channel names. now_next_function(entry, now) returns (text, tooltip, valid until).
+    def __init__(self, now_next_function, parent=None):
+        super().__init__(parent)
+        self.now_next_function = now_next_function
+
+        #Now and next per entry row, only computed for shown rows
+        self.now_next = {}
+
+    def setEntries(self, *args, **kwargs):
+        self.now_next = {}
+        super().setEntries(*args, **kwargs)
+
+    def updateRows(self, source_rows, rows):
+        self.now_next = {}
+        super().updateRows(source_rows, rows)
+
+    def getNowNext(self, row, now):
+        entry_row   = self.entryRow(row)
+        now_next    = self.now_next.get(entry_row)
+
+        if now_next is None or now_next[2] <= now:
+            now_next = self.now_next_function(self.entries[entry_row], now)
+            self.now_next[entry_row] = now_next
+
+        return now_next
+
+    def updateNowNext(self, now, clear=False):
+        #Forget the now and next of rows that rolled over, the view asks them again for the shown rows only
+        if clear:
+            changed = bool(self.now_next)
+            self.now_next = {}
+        else:
+            expired = [entry_row for entry_row, now_next in self.now_next.items() if now_next[2] <= now]
+            changed = bool(expired)
+
+            for entry_row in expired:
+                del self.now_next[entry_row]
+
+        if changed and self.rowCount():
+            self.dataChanged.emit(self.index(0), self.index(self.rowCount() - 1), [Qt.DisplayRole, Qt.ToolTipRole])
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role in (Qt.DisplayRole, Qt.ToolTipRole) and index.isValid() and not self.isPinned(index.row()) and self.entry(index.row()) is not None:
+            text, tooltip, valid_until = self.getNowNext(index.row(), time.time())
+
+            if role == Qt.ToolTipRole:
+                return tooltip
+
+            if text:
+                return f"{self.text(index.row())}  \u00b7  {text}"
+
+        return super().data(index, role)
+
+class GlobalSearchListModel(CatalogListModel):
+    #Shows the search results of all stream types, each with the icon of its tab
+    def __init__(self, icons, parent=None):
+        super().__init__(parent)
+        self.icons = icons
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role == Qt.DecorationRole and index.isValid() and not self.isPinned(index.row()):
+            return self.icons.get(self.entry(index.row())['result_type'])
+
+        return super().data(index, role)
+
+class IngestFilterDialog(QDialog):
+    #Edits the rules for leaving out streams of an account while loading the IPTV data
+    def __init__(self, ingest_filter, categories_per_stream_type, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Ingest filter rules")
+        self.setMinimumSize(500, 500)
+
+        layout = QVBoxLayout(self)
+
+        form_layout = QFormLayout()
+
+        self.include_names_entry        = QLineEdit(ingest_filter.include_names)
+        self.exclude_names_entry        = QLineEdit(ingest_filter.exclude_names)
+        self.exclude_categories_entry   = QLineEdit(ingest_filter.exclude_categories)
+
+        self.include_names_entry.setPlaceholderText("e.g. ^(UK|NL)\\s*\\|")
+        self.exclude_names_entry.setPlaceholderText("e.g. radio|xxx")
+        self.exclude_categories_entry.setPlaceholderText("e.g. ^(AR|TR)\\s*\\|")
+
+        self.exclude_adult_checkbox = QCheckBox("Leave out adult streams")
+        self.exclude_adult_checkbox.setChecked(ingest_filter.exclude_adult)
+
+        form_layout.addRow("Only names matching:", self.include_names_entry)
+        form_layout.addRow("Leave out names matching:", self.exclude_names_entry)
+        form_layout.addRow("Leave out categories matching:", self.exclude_categories_entry)
+        form_layout.addRow(self.exclude_adult_checkbox)
+
+        layout.addLayout(form_layout)
+
+        #Checkable list of the loaded categories and the already hidden categories
+        layout.addWidget(QLabel("Hidden categories:"))
+
+        self.categories_list = QListWidget()
+
+        for stream_type in STREAM_TYPES:
+            category_names = {category.get('category_name', '') for category in categories_per_stream_type.get(stream_type, [])}
+            hidden_names   = ingest_filter.hidden_categories[stream_type]
+
+            for category_name in sorted(category_names | hidden_names, key=name_sort_key):
+                item = QListWidgetItem(f"{stream_type}: {category_name}")
+                item.setData(Qt.UserRole, (stream_type, category_name))
+                item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+                item.setCheckState(Qt.Checked if category_name in hidden_names else Qt.Unchecked)
+
+                self.categories_list.addItem(item)
+
+        layout.addWidget(self.categories_list)
+
+        layout.addWidget(QLabel("Patterns are regular expressions and are matched case insensitive.\n"
+            "The IPTV data is reloaded after saving the rules."))
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel, Qt.Horizontal, self)
+        buttons.accepted.connect(self.validate_and_accept)
+        buttons.rejected.connect(self.reject)
+
+        layout.addWidget(buttons)
+
+    def validate_and_accept(self):
+        for entry in [self.include_names_entry, self.exclude_names_entry, self.exclude_categories_entry]:
+            if entry.text().strip() and not compile_pattern(entry.text().strip()):
+                QMessageBox.warning(self, "Input Error", f"Invalid regular expression: {entry.text().strip()}")
+                return
+
+        self.accept()
+
+    def get_ingest_filter(self):
+        hidden_categories = {stream_type: [] for stream_type in STREAM_TYPES}
+
+        for i in range(self.categories_list.count()):
+            item = self.categories_list.item(i)
+
+            if item.checkState() == Qt.Checked:
+                stream_type, category_name = item.data(Qt.UserRole)
+                hidden_categories[stream_type].append(category_name)
 
+        return IngestFilter(
+            self.include_names_entry.text().strip(),
+            self.exclude_names_entry.text().strip(),
+            self.exclude_categories_entry.text().strip(),
+            hidden_categories,
+            self.exclude_adult_checkbox.isChecked()
+        )
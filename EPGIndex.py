@@ -0,0 +1,92 @@
+from array import array
+from bisect import bisect_right
+
+#Only programmes within this time from now are indexed, which is enough for showing what's on now and next
+EPG_INDEX_WINDOW = 24 * 3600
+
+#The index is loaded again when the window ends within this time, so the coming programmes don't run out
+EPG_INDEX_RELOAD_MARGIN = 3 * 3600
+
+#Channels without upcoming programmes are checked again after this time
+EPG_INDEX_RECHECK = 3600
+
+#Start and stop times are arrays of signed 64 bit ints, which take less memory than lists of ints
+TIME_TYPECODE = 'q'
+
+class EPGIndex:
+    def __init__(self):
+        #Sorted start times, stop times and titles of the programmes per channel key
+        self.channels = {}
+
+        #End of the window of the loaded programmes
+        self.window_end = 0
+
+    def clear(self, now):
+        self.channels   = {}
+        self.window_end = now + EPG_INDEX_WINDOW
+
+    def needs_reload(self, now):
+        return now + EPG_INDEX_RELOAD_MARGIN >= self.window_end
+
+    def set_programmes(self, key, programmes, now):
+        #Programmes are (start, stop, title). Programmes that ended or start after the window are left out.
+        programmes = sorted((start, stop, title) for start, stop, title in programmes if stop > now and start < now + EPG_INDEX_WINDOW)
+
+        if not programmes:
+            self.channels.pop(key, None)
+            return
+
+        self.channels[key] = (
+            array(TIME_TYPECODE, (programme[0] for programme in programmes)),
+            array(TIME_TYPECODE, (programme[1] for programme in programmes)),
+            [programme[2] for programme in programmes]
+        )
+
+    def load_rows(self, rows, now):
+        #Add programmes from (key, start, stop, title) rows sorted by key
+        key         = None
+        programmes  = []
+
+        for row_key, start, stop, title in rows:
+            if row_key != key:
+                if programmes:
+                    self.set_programmes(key, programmes, now)
+
+                key         = row_key
+                programmes  = []
+
+            programmes.append((start, stop, title))
+
+        if programmes:
+            self.set_programmes(key, programmes, now)
+
+    def has_channel(self, key):
+        return key in self.channels
+
+    def get_now_next(self, key, now):
+        #Returns the programme on now and the next one, each (start, stop, title) or None,
+        #and the time until which this result is valid
+        channel = self.channels.get(key)
+
+        if channel is None:
+            return None, None, now + EPG_INDEX_RECHECK
+
+        starts, stops, titles = channel
+
+        #Last programme that started at or before now
+        i = bisect_right(starts, now) - 1
+
+        now_programme = None
+        if i >= 0 and stops[i] > now:
+            now_programme = (starts[i], stops[i], titles[i])
+
+        next_programme = None
+        if i + 1 < len(starts):
+            next_programme = (starts[i + 1], stops[i + 1], titles[i + 1])
+
+        #The result changes when the current programme stops or the next one starts
+        changes = [programme_time for programme_time in (now_programme and now_programme[1], next_programme and next_programme[0]) if programme_time]
+
+        valid_until = min(changes) if changes else now + EPG_INDEX_RECHECK
+
+        return now_programme, next_programme, valid_until
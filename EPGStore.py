@@ -0,0 +1,329 @@
+import os
+from os import path
+import time
+import json
+import base64
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from lxml import etree
+
+#Number of programmes inserted and committed at once while parsing the XMLTV data
+EPG_INSERT_BATCH_SIZE = 5000
+
+#The EPG is downloaded into a separate file, which replaces the store when the download is complete
+EPG_DOWNLOAD_SUFFIX = "-download"
+
+#Seconds a query waits for a write of another connection, the GUI never waits longer than this
+EPG_BUSY_TIMEOUT = 0.1
+
+#Cached EPG of a channel is refreshed this long before its last programme ends, and at least after the max age
+EPG_CACHE_LOOKAHEAD     = 3600
+EPG_CACHE_MAX_AGE       = 6 * 3600
+
+#Channels without any programmes are asked again after this time
+EPG_CACHE_EMPTY_AGE     = 900
+
+#Number of channels of which the EPG is kept in memory, stale EPG is kept on disk for a day
+EPG_CACHE_MAX_CHANNELS  = 500
+EPG_CACHE_KEEP_STALE    = 24 * 3600
+
+def parse_xmltv_time(text):
+    #XMLTV times look like '20250101210000 +0100', times without offset are UTC
+    text        = str(text).strip()
+    timestamp   = datetime.strptime(text[:14], "%Y%m%d%H%M%S").replace(tzinfo=timezone.utc).timestamp()
+    offset      = text[14:].strip()
+
+    if len(offset) == 5 and offset[0] in '+-' and offset[1:].isdigit():
+        sign        = -1 if offset[0] == '+' else 1
+        timestamp  += sign * (int(offset[1:3]) * 3600 + int(offset[3:5]) * 60)
+
+    return int(timestamp)
+
+def make_epg_listing(start, stop, title, description, encoded_description=None):
+    #EPG entry as shown in the EPG list, start and stop are unix timestamps.
+    #Descriptions can be kept base64 encoded, see get_epg_description.
+    start_time = datetime.fromtimestamp(start)
+
+    epg_entry = {
+        'start_time': start_time,
+        'stop_time': datetime.fromtimestamp(stop),
+        'program_name': title,
+        'date': f"{start_time.day:02}-{start_time.month:02}-{start_time.year}"
+    }
+
+    if description is None and encoded_description is not None:
+        epg_entry['encoded_description'] = encoded_description
+    else:
+        epg_entry['description'] = description
+
+    return epg_entry
+
+def get_epg_description(epg_entry):
+    #Descriptions of the provider EPG are base64 encoded, they are only decoded when shown
+    if 'description' not in epg_entry:
+        try:
+            epg_entry['description'] = base64.b64decode(epg_entry.get('encoded_description', '')).decode("utf-8")
+        except Exception as e:
+            print(f"failed decoding description: {e}")
+            epg_entry['description'] = ""
+
+    return epg_entry['description']
+
+def get_epg_expiry(epg_listings, now):
+    #The EPG of a channel expires shortly before its last programme ends
+    if not epg_listings:
+        return int(now + EPG_CACHE_EMPTY_AGE)
+
+    last_stop = max(epg_entry['stop_time'].timestamp() for epg_entry in epg_listings)
+
+    return int(max(now + EPG_CACHE_EMPTY_AGE, min(last_stop - EPG_CACHE_LOOKAHEAD, now + EPG_CACHE_MAX_AGE)))
+
+def iter_xmltv_programmes(source):
+    #Parse the XMLTV data element by element, each parsed element is removed again so memory stays bounded.
+    #Yields (channel, start, stop, title, description) per programme.
+    for event, element in etree.iterparse(source, events=('end',), tag=('channel', 'programme'), huge_tree=True, recover=True):
+        if element.tag == 'programme':
+            try:
+                yield (
+                    element.get('channel', ''),
+                    parse_xmltv_time(element.get('start')),
+                    parse_xmltv_time(element.get('stop')),
+                    element.findtext('title', ''),
+                    element.findtext('desc', '')
+                )
+            except Exception as e:
+                print(f"Skipping invalid programme: {e}")
+
+        #Remove the element and the already parsed elements before it
+        element.clear(keep_tail=True)
+        while element.getprevious() is not None:
+            del element.getparent()[0]
+
+class EPGStore:
+    def __init__(self, db_file, stream_db_file):
+        self.db_file        = db_file
+        self.stream_db_file = stream_db_file
+
+        #The store is filled by the EPG workers and read by the GUI
+        self.lock           = threading.RLock()
+        self.stream_lock    = threading.RLock()
+
+        os.makedirs(path.dirname(db_file) or ".", exist_ok=True)
+
+        self.closed     = False
+        self.connection = self.connect()
+
+        #The EPG fetched per stream is in its own file, so saving it never waits for the EPG download
+        self.stream_connection = sqlite3.connect(stream_db_file, timeout=EPG_BUSY_TIMEOUT, check_same_thread=False)
+        self.stream_connection.execute("PRAGMA journal_mode=WAL")
+        self.stream_connection.execute("PRAGMA synchronous=NORMAL")
+
+        self.create_tables()
+
+    def connect(self):
+        connection = sqlite3.connect(self.db_file, timeout=EPG_BUSY_TIMEOUT, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+
+        return connection
+
+    def create_programme_tables(self, connection):
+        with connection:
+            #Programmes per XMLTV channel id, sorted by start time with the index
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS programmes (
+                    channel     TEXT NOT NULL,
+                    start       INTEGER NOT NULL,
+                    stop        INTEGER NOT NULL,
+                    title       TEXT,
+                    description TEXT
+                )""")
+
+            connection.execute("CREATE INDEX IF NOT EXISTS programmes_channel_start ON programmes (channel, start)")
+
+            #Time of the last complete download
+            connection.execute("CREATE TABLE IF NOT EXISTS epg_info (key TEXT PRIMARY KEY, value)")
+
+    def create_tables(self):
+        with self.lock:
+            self.create_programme_tables(self.connection)
+
+        with self.stream_lock, self.stream_connection:
+            #EPG fetched per stream, as JSON list of [start, stop, title, description]
+            self.stream_connection.execute("""
+                CREATE TABLE IF NOT EXISTS stream_epg (
+                    stream_id   TEXT PRIMARY KEY,
+                    expires     INTEGER NOT NULL,
+                    listings    TEXT NOT NULL
+                )""")
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            self.connection.close()
+
+        with self.stream_lock:
+            self.stream_connection.close()
+
+    def replace_all(self, programmes):
+        #Write all programmes into a separate download file, so no transaction on the store is kept open
+        #while downloading. The GUI keeps reading the previous EPG until the download file replaces it.
+        num_of_programmes   = 0
+        download_file       = self.db_file + EPG_DOWNLOAD_SUFFIX
+
+        if path.isfile(download_file):
+            os.remove(download_file)
+
+        try:
+            #The download file is only used by this connection, it doesn't need a journal
+            connection = sqlite3.connect(download_file)
+            connection.execute("PRAGMA journal_mode=OFF")
+            connection.execute("PRAGMA synchronous=OFF")
+
+            try:
+                self.create_programme_tables(connection)
+
+                batch = []
+                for programme in programmes:
+                    batch.append(programme)
+
+                    if len(batch) >= EPG_INSERT_BATCH_SIZE:
+                        with connection:
+                            connection.executemany("INSERT INTO programmes (channel, start, stop, title, description) VALUES (?, ?, ?, ?, ?)", batch)
+                        num_of_programmes += len(batch)
+                        batch = []
+
+                with connection:
+                    connection.executemany("INSERT INTO programmes (channel, start, stop, title, description) VALUES (?, ?, ?, ?, ?)", batch)
+                    connection.execute("INSERT OR REPLACE INTO epg_info (key, value) VALUES ('updated', ?)", (int(time.time()),))
+                num_of_programmes += len(batch)
+            finally:
+                connection.close()
+
+            self.replace_file(download_file)
+        finally:
+            if path.isfile(download_file):
+                os.remove(download_file)
+
+        return num_of_programmes
+
+    def replace_file(self, download_file):
+        #Swap in the downloaded EPG. The connection is closed first, which also checkpoints and removes its WAL file.
+        #The download is dropped when the store was closed in the meantime, another store can have the file open.
+        with self.lock:
+            if self.closed:
+                return
+
+            self.connection.close()
+
+            try:
+                for suffix in ["-wal", "-shm"]:
+                    if path.isfile(self.db_file + suffix):
+                        os.remove(self.db_file + suffix)
+
+                os.replace(download_file, self.db_file)
+            finally:
+                self.connection = self.connect()
+
+    def last_updated(self):
+        #Time of the last complete download, 0 when never downloaded
+        with self.lock:
+            row = self.connection.execute("SELECT value FROM epg_info WHERE key = 'updated'").fetchone()
+
+        return row[0] if row else 0
+
+    def get_epg_listings(self, channel, since=None):
+        #Programmes of the channel sorted by start time, in the same format as the EPG worker.
+        #Only programmes that didn't end before 'since' are returned.
+        if not channel:
+            return []
+
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT start, stop, title, description FROM programmes WHERE channel = ? AND stop >= ? ORDER BY start",
+                (channel, since or 0)).fetchall()
+
+        return [make_epg_listing(start, stop, title, description) for start, stop, title, description in rows]
+
+    def get_programmes_between(self, since, until):
+        #(channel, start, stop, title) of all programmes between the times, sorted by channel and start time
+        with self.lock:
+            return self.connection.execute(
+                "SELECT channel, start, stop, title FROM programmes WHERE stop > ? AND start < ? ORDER BY channel, start",
+                (since, until)).fetchall()
+
+    def get_all_stream_epg(self):
+        #Cached EPG of all streams, as (stream id, [[start, stop, title, description, encoded description], ...])
+        with self.stream_lock:
+            rows = self.stream_connection.execute("SELECT stream_id, listings FROM stream_epg").fetchall()
+
+        return [(stream_id, json.loads(listings)) for stream_id, listings in rows]
+
+    def get_stream_epg(self, stream_id):
+        #Returns when the cached EPG of the stream expires and the EPG itself, or None
+        with self.stream_lock:
+            row = self.stream_connection.execute("SELECT expires, listings FROM stream_epg WHERE stream_id = ?", (str(stream_id),)).fetchone()
+
+        if not row:
+            return None
+
+        expires, listings = row
+
+        return expires, [make_epg_listing(*listing) for listing in json.loads(listings)]
+
+    def save_stream_epg(self, stream_id, epg_listings, expires):
+        #Called by the EPG worker. Descriptions that were never shown are saved still encoded.
+        listings = [[int(epg_entry['start_time'].timestamp()), int(epg_entry['stop_time'].timestamp()),
+            epg_entry['program_name'], epg_entry.get('description'), epg_entry.get('encoded_description')] for epg_entry in epg_listings]
+
+        with self.stream_lock, self.stream_connection:
+            self.stream_connection.execute("INSERT OR REPLACE INTO stream_epg (stream_id, expires, listings) VALUES (?, ?, ?)",
+                (str(stream_id), expires, json.dumps(listings)))
+
+    def remove_expired_stream_epg(self, before):
+        with self.stream_lock, self.stream_connection:
+            self.stream_connection.execute("DELETE FROM stream_epg WHERE expires < ?", (before,))
+
+class EPGCache:
+    def __init__(self, max_channels=EPG_CACHE_MAX_CHANNELS):
+        self.max_channels = max_channels
+
+        #(expires, EPG listings) per (account key, stream id), least recently used first
+        self.entries = OrderedDict()
+
+    def get(self, account_key, stream_id, epg_store=None):
+        #Returns the cached EPG and whether it is stale, or None when it isn't cached.
+        #The EPG store of the account is the on-disk tier.
+        key     = (account_key, str(stream_id))
+        cached  = self.entries.get(key)
+
+        if cached is None and epg_store:
+            try:
+                cached = epg_store.get_stream_epg(stream_id)
+            except Exception as e:
+                print(f"Failed loading cached EPG: {e}")
+
+            if cached is not None:
+                self.entries[key] = cached
+
+        if cached is None:
+            return None
+
+        self.entries.move_to_end(key)
+
+        expires, epg_listings = cached
+
+        return epg_listings, time.time() >= expires
+
+    def put(self, account_key, stream_id, epg_listings):
+        #The EPG worker saves the EPG in the store, so the GUI doesn't write to disk
+        expires = get_epg_expiry(epg_listings, time.time())
+        key     = (account_key, str(stream_id))
+
+        self.entries[key] = (expires, epg_listings)
+        self.entries.move_to_end(key)
+
+        while len(self.entries) > self.max_channels:
+            self.entries.popitem(last=False)
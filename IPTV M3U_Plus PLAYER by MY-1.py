@@ -2,6 +2,7 @@ import sys
 import os
 from os import path
 import time
+import gc
 import requests
 import subprocess
 import configparser
@@ -27,9 +28,15 @@ from PyQt5.QtWidgets import (
 )
 
 from AccountManager import AccountManager
-from CustomPyQtWidgets import LiveInfoBox, MovieInfoBox, SeriesInfoBox
+from CatalogCache import CatalogCache, DEFAULT_MAX_CACHE_SIZE_MB
+from EPGStore import EPGStore, EPGCache, EPG_CACHE_KEEP_STALE
+from EPGIndex import EPGIndex, EPG_INDEX_WINDOW, EPG_INDEX_RECHECK
+from CatalogIndex import CatalogIndex, SORT_KEYS, FACETS, ROWS_PER_TIME_CHECK
+from SearchIndex import TRIGRAM_LENGTH, fold_text
+from CustomPyQtWidgets import LiveInfoBox, MovieInfoBox, SeriesInfoBox, CatalogListModel, LiveListModel, GlobalSearchListModel, IngestFilterDialog
+from IngestFilter import IngestFilter
 import Threadpools
-from Threadpools import FetchDataWorker, SearchWorker, OnlineWorker, EPGWorker, MovieInfoFetcher, SeriesInfoFetcher, ImageFetcher
+from Threadpools import SHORT_EPG_LIMIT, FetchDataWorker, SearchWorker, SearchIndexWorker, GlobalSearchWorker, OnlineWorker, EPGWorker, EPGDownloadWorker, EPGCleanupWorker, MovieInfoFetcher, SeriesInfoFetcher, ImageFetcher
 
 CURRENT_VERSION = "V1.04.00"
 
@@ -39,6 +46,26 @@ is_linux    = sys.platform.startswith('linux')
 
 GITHUB_REPO = "Youri666/Xtream-m3u_plus-IPTV-Player"
 
+#Time the lists are filled per event loop iteration, so the window keeps responding while loading.
+#A slice consists of steps, the time of a slice is checked between steps.
+POPULATE_SLICE_SECONDS  = 0.008
+POPULATE_STEP_SECONDS   = 0.002
+
+#Rows laid out by a list per event loop iteration. Laying out all rows of a large list at once blocks longer than a slice.
+LIST_LAYOUT_BATCH_SIZE  = 500
+
+#Time to wait after the last key press before searching while typing
+SEARCH_DEBOUNCE_MS      = 200
+
+#Results of the previous search are only filtered again up to this number of rows, larger results are searched with the index
+MAX_NARROW_SEARCH_ROWS  = 5000
+
+#Maximum number of results per stream type shown by the search of all lists
+MAX_GLOBAL_SEARCH_RESULTS = 200
+
+#Interval of checking if programmes in the now and next of the LIVE list rolled over
+NOW_NEXT_UPDATE_MS      = 30000
+
 class IPTVPlayerApp(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -65,7 +92,7 @@ class IPTVPlayerApp(QMainWindow):
 
         self.user_data_file = "userdata.ini"
         self.favorites_file = "favorites.json"
-        self.cache_file     = "all_cached_data.json"
+        self.cache_dir      = "cache"
         # Default values for URL formats
         self.default_url_formats = {
             'live': "{server}/live/{username}/{password}/{stream_id}.{container_extension}",
@@ -76,6 +103,10 @@ class IPTVPlayerApp(QMainWindow):
         # Update the .ini file if needed to maintain backward compatibility.
         self.updateUserDataFile()
 
+        #Create cache with a cached catalog per account, the cache file of previous versions is not used anymore
+        self.catalog_cache = CatalogCache(self.cache_dir)
+        self.catalog_cache.remove_legacy_cache()
+
         self.path_to_window_icon            = path.abspath(path.join(path.dirname(__file__), 'Images/TV_icon.ico'))
         self.path_to_no_img                 = path.abspath(path.join(path.dirname(__file__), 'Images/no_image.jpg'))
         self.path_to_loading_img            = path.abspath(path.join(path.dirname(__file__), 'Images/loading-icon.png'))
@@ -132,6 +163,7 @@ class IPTVPlayerApp(QMainWindow):
             'Series': 0
         }
         self.prev_clicked_streaming_item        = 0
+        self.prev_clicked_streaming_entry       = {}
         self.prev_double_clicked_streaming_item = 0
 
         self.categories_per_stream_type = {}
@@ -141,6 +173,34 @@ class IPTVPlayerApp(QMainWindow):
             'Series': []
         }
 
+        #Index of stream ids and favorites per stream type
+        self.catalog_indexes = {
+            'LIVE': CatalogIndex('LIVE'),
+            'Movies': CatalogIndex('Movies'),
+            'Series': CatalogIndex('Series')
+        }
+
+        #Debounce timer per search bar and the previous search per stream type, used for narrowing the results
+        self.search_timers              = {}
+        self.last_streaming_searches    = {}
+
+        #Search generation per stream type, only the result of the latest search is shown
+        self.search_generations = {
+            'LIVE': 0,
+            'Movies': 0,
+            'Series': 0
+        }
+
+        #Search generation and ranked results of the search in all lists
+        self.global_search_generation   = 0
+        self.global_search_results      = []
+        self.global_search_episodes     = []
+
+        #Lists are filled per tab in time slices by the population timer
+        self.populations        = {}
+        self.population_timer   = QTimer(self)
+        self.population_timer.timeout.connect(self.populate_next_slice)
+
         #Loaded data used for search algorithm
         self.currently_loaded_categories = {
             'LIVE': [],
@@ -158,10 +218,49 @@ class IPTVPlayerApp(QMainWindow):
         # Whether to request the VODs or not
         self.vods_enabled = True
 
+        #Whether to startup with the cached IPTV data and refresh it in the background
+        self.cache_on_startup = False
+
+        #Whether provider prefixes like 'UK |' are ignored when searching
+        self.search_strip_prefixes  = False
+
+        #Generation of rebuilding the search indexes and the catalog index with its version per rebuilt stream type
+        self.search_index_generation    = 0
+        self.search_index_rebuilds      = {}
+
+        #Whether the full XMLTV EPG of the account is downloaded into the SQLite EPG store
+        self.bulk_epg_enabled   = False
+        self.epg_store          = None
+
+        #EPG fetched per channel, with the EPG store as on-disk tier. Stream id of which the EPG is shown.
+        self.epg_cache          = EPGCache()
+        self.epg_stream_id      = None
+
+        #Programmes of the downloaded and cached EPG per channel, for showing what's on now in the LIVE list
+        self.epg_index          = EPGIndex()
+        self.now_next_timer     = QTimer(self)
+        self.now_next_timer.timeout.connect(self.update_now_next)
+        self.now_next_timer.start(NOW_NEXT_UPDATE_MS)
+
+        #Signals of the running background refresh, used to ignore outdated refreshes
+        self.refresh_signals = None
+
+        #Currently selected category per stream type, used to reload the list after a refresh
+        self.selected_category = {
+            'LIVE': None,
+            'Movies': None,
+            'Series': None
+        }
+
         #Create search bar dicts
         self.category_search_bars   = {}
         self.streaming_search_bars  = {}
 
+        #Facet filter bar and comboboxes per stream type, with the selected value per facet. None selects all values.
+        self.facet_bars         = {}
+        self.facet_boxes        = {}
+        self.selected_facets    = {stream_type: {facet: None for facet in FACETS} for stream_type in ['LIVE', 'Movies', 'Series']}
+
         #Create sorting all lists setting variable. Set sorting to A-Z by default.
         self.sorting_enabled    = True
         self.sorting_order      = 0
@@ -178,6 +277,22 @@ class IPTVPlayerApp(QMainWindow):
         self.threadpool = QThreadPool()
         self.threadpool.setMaxThreadCount(1)
 
+        #Create separate threadpool for refreshing the IPTV data, so it doesn't block the other workers
+        self.refresh_threadpool = QThreadPool()
+        self.refresh_threadpool.setMaxThreadCount(1)
+
+        #Create separate threadpool for searching, only one search runs at a time
+        self.search_threadpool = QThreadPool()
+        self.search_threadpool.setMaxThreadCount(1)
+
+        #Create separate threadpool for searching all lists, so it isn't dropped by searches in a single list
+        self.global_search_threadpool = QThreadPool()
+        self.global_search_threadpool.setMaxThreadCount(1)
+
+        #Create separate threadpool for downloading the full EPG, which can take a while
+        self.epg_threadpool = QThreadPool()
+        self.epg_threadpool.setMaxThreadCount(1)
+
         self.initIcons()
 
         self.initTabWidget()
@@ -190,6 +305,10 @@ class IPTVPlayerApp(QMainWindow):
 
         self.initSearchBars()
 
+        self.initFacetBars()
+
+        self.initGlobalSearch()
+
         # self.initHomeTab()
 
         self.initSettingsTab()
@@ -217,6 +336,7 @@ class IPTVPlayerApp(QMainWindow):
         live_streaming_layout = QVBoxLayout(live_streaming_container)
         live_streaming_layout.setContentsMargins(0, 0, 0, 0)
         live_streaming_layout.addWidget(self.streaming_search_bars["LIVE"])
+        live_streaming_layout.addWidget(self.facet_bars["LIVE"])
         live_streaming_layout.addWidget(self.streaming_list_live)
 
         # Set width limits
@@ -265,6 +385,7 @@ class IPTVPlayerApp(QMainWindow):
         movies_streaming_layout = QVBoxLayout(movies_streaming_container)
         movies_streaming_layout.setContentsMargins(0, 0, 0, 0)
         movies_streaming_layout.addWidget(self.streaming_search_bars["Movies"])
+        movies_streaming_layout.addWidget(self.facet_bars["Movies"])
         movies_streaming_layout.addWidget(self.streaming_list_movies)
 
         # Set width limits
@@ -313,6 +434,7 @@ class IPTVPlayerApp(QMainWindow):
         series_streaming_layout = QVBoxLayout(series_streaming_container)
         series_streaming_layout.setContentsMargins(0, 0, 0, 0)
         series_streaming_layout.addWidget(self.streaming_search_bars["Series"])
+        series_streaming_layout.addWidget(self.facet_bars["Series"])
         series_streaming_layout.addWidget(self.streaming_list_series)
 
         # Set width limits
@@ -418,6 +540,7 @@ class IPTVPlayerApp(QMainWindow):
         live_tab        = QWidget()
         movies_tab      = QWidget()
         series_tab      = QWidget()
+        search_tab      = QWidget()
         favorites_tab   = QWidget()
         info_tab        = QWidget()
         settings_tab    = QWidget()
@@ -427,6 +550,7 @@ class IPTVPlayerApp(QMainWindow):
         self.live_tab_layout        = QVBoxLayout(live_tab)
         self.movies_tab_layout      = QVBoxLayout(movies_tab)
         self.series_tab_layout      = QVBoxLayout(series_tab)
+        self.search_tab_layout      = QVBoxLayout(search_tab)
         self.favorites_tab_layout   = QGridLayout(favorites_tab)
         self.info_tab_layout        = QVBoxLayout(info_tab)
         self.settings_layout        = QGridLayout(settings_tab)
@@ -436,10 +560,14 @@ class IPTVPlayerApp(QMainWindow):
         self.tab_widget.addTab(live_tab,        self.live_icon,         "LIVE")
         self.tab_widget.addTab(movies_tab,      self.movies_icon,       "Movies")
         self.tab_widget.addTab(series_tab,      self.series_icon,       "Series")
+        self.tab_widget.addTab(search_tab,      self.search_icon,       "Search")
         # self.tab_widget.addTab(favorites_tab,   self.favorites_icon,    "Favorites")
         self.tab_widget.addTab(info_tab,        self.info_icon,         "Info")
         self.tab_widget.addTab(settings_tab,    self.settings_icon,     "Settings")
 
+        #Fill lists of a tab first when it is opened
+        self.tab_widget.currentChanged.connect(self.tab_changed)
+
     def initSearchBars(self):
         #Initialize search bars for category lists
         self.category_search_bars["LIVE"] = QLineEdit()
@@ -471,6 +599,8 @@ class IPTVPlayerApp(QMainWindow):
         #Create sorting actions
         sort_a_z        = QAction("A-Z", self)
         sort_z_a        = QAction("Z-A", self)
+        sort_added      = QAction("Recently added", self)
+        sort_rating     = QAction("Rating", self)
         sort_disabled   = QAction("Sorting disabled", self)
 
         #Add search icon
@@ -479,7 +609,7 @@ class IPTVPlayerApp(QMainWindow):
         #Create sorting action menu
         sorting_menu = QMenu()
         sorting_menu.setTitle("Set sorting order:")
-        sorting_menu.addActions([sort_a_z, sort_z_a, sort_disabled])
+        sorting_menu.addActions([sort_a_z, sort_z_a, sort_added, sort_rating, sort_disabled])
 
         #Create sorting button
         sort_action = QAction(self.sorting_icon, "sort", self)
@@ -489,6 +619,8 @@ class IPTVPlayerApp(QMainWindow):
         #Connect functions to sorting actions
         sort_a_z.triggered.connect(lambda: self.sortList(search_bar, list_content_type, stream_type, list_widgets, True, 0))
         sort_z_a.triggered.connect(lambda: self.sortList(search_bar, list_content_type, stream_type, list_widgets, True, 1))
+        sort_added.triggered.connect(lambda: self.sortList(search_bar, list_content_type, stream_type, list_widgets, True, 2))
+        sort_rating.triggered.connect(lambda: self.sortList(search_bar, list_content_type, stream_type, list_widgets, True, 3))
         sort_disabled.triggered.connect(lambda: self.sortList(search_bar, list_content_type, stream_type, list_widgets, False, 0))
 
         #Create clear search button
@@ -498,77 +630,176 @@ class IPTVPlayerApp(QMainWindow):
         #Connect function to clear search action
         clear_action.triggered.connect(lambda: self.clearSearch(search_bar, list_content_type, stream_type, list_widgets, search_history_list_idx))
 
+        #Search while typing, once the user stopped typing for a moment
+        search_timer = QTimer(self)
+        search_timer.setSingleShot(True)
+        search_timer.setInterval(SEARCH_DEBOUNCE_MS)
+        search_timer.timeout.connect(lambda: self.search_in_list(list_content_type, stream_type, search_bar.text()))
+        self.search_timers[search_bar] = search_timer
+
+        #Every edit restarts the timer, so searches for text that is still being typed are dropped
+        search_bar.textEdited.connect(lambda text: search_timer.start())
+
         #Connect function to process search bar key presses
         search_bar.keyPressEvent = lambda e: self.SearchBarKeyPressed(e, 
             search_bar, list_content_type, stream_type, list_widgets, search_history_list, search_history_list_idx)
 
-    def clearSearch(self, search_bar, list_content_type, stream_type, list_widgets, history_list_idx):
-        #Clear search bar
-        search_bar.clear()
+    def initFacetBars(self):
+        for stream_type in ['LIVE', 'Movies', 'Series']:
+            #Create comboboxes for filtering on country prefix, year and adult content
+            facet_boxes = {facet: QComboBox() for facet in FACETS}
 
-        #Reset list history index to -1
-        history_list_idx[0] = -1
+            facet_boxes['country'].addItem("All countries", None)
+            facet_boxes['year'].addItem("All years", None)
 
-        #Search for nothing so list will be reset
-        self.search_in_list(list_content_type, stream_type, "")
+            facet_boxes['adult'].addItem("All content", None)
+            facet_boxes['adult'].addItem("Hide adult content", False)
+            facet_boxes['adult'].addItem("Only adult content", True)
 
-    def sortList(self, search_bar, list_content_type, stream_type, list_widgets, sorting_enabled, sort_order):
-        self.set_progress_bar(0, f"Sorting {stream_type} {list_content_type}")
+            facet_bar = QWidget()
+            facet_bar_layout = QHBoxLayout(facet_bar)
+            facet_bar_layout.setContentsMargins(0, 0, 0, 0)
 
-        #Get list
-        list_widget = list_widgets[stream_type]
+            for combobox in facet_boxes.values():
+                combobox.setSizeAdjustPolicy(QComboBox.AdjustToMinimumContentsLengthWithIcon)
+                combobox.setMinimumContentsLength(6)
+                combobox.currentIndexChanged.connect(lambda index, stream_type=stream_type: self.facet_changed(stream_type))
+                facet_bar_layout.addWidget(combobox)
 
-        #Enable or disable sorting
-        list_widget.setSortingEnabled(sorting_enabled)
+            self.facet_boxes[stream_type]   = facet_boxes
+            self.facet_bars[stream_type]    = facet_bar
 
-        #Remove 'All' and 'Favorites' category items
-        if list_content_type == 'category':
-            matches = []
-            for text in [self.all_categories_text, self.fav_categories_text]:
-                matches.extend(list_widget.findItems(text, Qt.MatchExactly))
+    def load_facet_bar(self, stream_type):
+        #Fill the comboboxes with the facet values of the loaded entries, keeping the selected values when still available
+        index = self.catalog_indexes[stream_type]
 
-            for item in matches:
-                idx = list_widget.row(item)
-                list_widget.takeItem(idx)
+        for facet in ['country', 'year']:
+            combobox        = self.facet_boxes[stream_type][facet]
+            facet_values    = index.get_facet_values(facet)
 
-        if sorting_enabled:
-            #When sorting is enabled, set sort order, 0: A-Z, 1: Z-A
-            list_widget.sortItems(sort_order)
+            #Countries alphabetically, newest years first
+            values = sorted(facet_values, reverse=(facet == 'year'))
 
-        else:
-            #When sorting is disabled, reload list manually
-            if list_content_type == 'category':
-                self.category_list_widgets[stream_type].clear()
+            combobox.blockSignals(True)
 
-                for entry in self.currently_loaded_categories[stream_type]:
-                    item = QListWidgetItem(entry['category_name'])
-                    item.setData(Qt.UserRole, entry)
+            while combobox.count() > 1:
+                combobox.removeItem(1)
 
-                    self.category_list_widgets[stream_type].addItem(item)
+            for value in values:
+                combobox.addItem(f"{value} ({facet_values[value]})", value)
 
-            elif list_content_type == 'streaming':
-                self.streaming_list_widgets[stream_type].clear()
+            selected_idx = combobox.findData(self.selected_facets[stream_type][facet])
+            combobox.setCurrentIndex(max(selected_idx, 0))
+
+            self.selected_facets[stream_type][facet] = combobox.currentData()
+
+            combobox.blockSignals(False)
+
+    def facet_changed(self, stream_type):
+        #Save selected facet values
+        for facet, combobox in self.facet_boxes[stream_type].items():
+            self.selected_facets[stream_type][facet] = combobox.currentData()
+
+        #Lists that are still being filled are filtered when they are loaded
+        if stream_type in self.populations:
+            return
+
+        try:
+            self.set_progress_bar(0, "Loading items")
+
+            if stream_type == 'Series':
+                #Reset navigation level
+                self.series_navigation_level = 0
+
+            #Load the rows of the selected category that match the selected facets
+            self.load_streaming_list(stream_type, self.get_filtered_rows(stream_type, self.selected_category[stream_type]))
+
+            #Search again in the filtered list
+            search_text = self.streaming_search_bars[stream_type].text()
+            if search_text:
+                self.search_in_list('streaming', stream_type, search_text)
+
+            #Check if list is empty after process
+            elif self.streaming_list_widgets[stream_type].model().rowCount() == 0:
+                self.streaming_list_widgets[stream_type].model().setPinnedItems([("No items in list...", None, None)])
 
-                for entry in self.currently_loaded_streams[stream_type]:
-                    item = QListWidgetItem(entry['name'])
-                    item.setData(Qt.UserRole, entry)
+            self.animate_progress(0, 100, "Loading finished")
+
+        except Exception as e:
+            print(f"Failed filtering list: {e}")
+
+    def initGlobalSearch(self):
+        #Create search bar for searching in all lists at once
+        self.global_search_bar = QLineEdit()
+        self.global_search_bar.setPlaceholderText("Search Live TV, Movies, Series and loaded episodes...")
+        self.global_search_bar.addAction(self.search_icon, QLineEdit.LeadingPosition)
+
+        #Create clear search button
+        clear_action = QAction(self.clear_btn_icon, "clear", self)
+        self.global_search_bar.addAction(clear_action, QLineEdit.TrailingPosition)
+        clear_action.triggered.connect(self.clearGlobalSearch)
+
+        #Search while typing, once the user stopped typing for a moment
+        self.global_search_timer = QTimer(self)
+        self.global_search_timer.setSingleShot(True)
+        self.global_search_timer.setInterval(SEARCH_DEBOUNCE_MS)
+        self.global_search_timer.timeout.connect(lambda: self.start_global_search(self.global_search_bar.text()))
+
+        self.global_search_bar.textEdited.connect(lambda text: self.global_search_timer.start())
+        self.global_search_bar.returnPressed.connect(lambda: self.start_global_search(self.global_search_bar.text()))
+
+        #Create list of the results, showing the icon of the tab of each result
+        self.global_search_list = QListView()
+        self.global_search_list.setModel(GlobalSearchListModel({
+            'LIVE': self.live_icon,
+            'Movies': self.movies_icon,
+            'Series': self.series_icon,
+            'Episodes': self.series_icon
+        }, self))
+        self.global_search_list.setUniformItemSizes(True)
+        self.global_search_list.setIconSize(QSize(24, 24))
+        self.global_search_list.setEditTriggers(QListView.NoEditTriggers)
+        self.global_search_list.setStyleSheet("""
+            QListView::item {
+                padding-top: 5px;
+                padding-bottom: 5px;
+            }
+        """)
+        self.global_search_list.doubleClicked.connect(self.global_search_item_double_clicked)
+
+        #Add widgets to search tab
+        self.search_tab_layout.addWidget(self.global_search_bar)
+        self.search_tab_layout.addWidget(self.global_search_list)
+
+    def clearGlobalSearch(self):
+        self.global_search_bar.clear()
+        self.start_global_search("")
+
+    def clearSearch(self, search_bar, list_content_type, stream_type, list_widgets, history_list_idx):
+        #Clear search bar
+        search_bar.clear()
+
+        #Reset list history index to -1
+        history_list_idx[0] = -1
 
-                    self.streaming_list_widgets[stream_type].addItem(item)
+        #Cancel search while typing
+        self.search_timers[search_bar].stop()
 
-        #Disable sorting
-        list_widget.setSortingEnabled(False)
+        #Search for nothing so list will be reset
+        self.search_in_list(list_content_type, stream_type, "")
 
-        if list_content_type == 'category':
-            #Add 'All' and 'Favorites' categories to top
-            itemAll = QListWidgetItem(self.all_categories_text)
-            itemAll.setData(Qt.UserRole, {'category_name': self.all_categories_text})
-            self.category_list_widgets[stream_type].insertItem(0, itemAll)
+    def sortList(self, search_bar, list_content_type, stream_type, list_widgets, sorting_enabled, sort_order):
+        #Get model of the list, 'All' and 'Favorites' categories stay on top.
+        #Sorting picks a precomputed sort permutation, so no progress is shown.
+        list_model = list_widgets[stream_type].model()
 
-            itemFav = QListWidgetItem(self.fav_categories_text)
-            itemFav.setData(Qt.UserRole, {'category_name': self.fav_categories_text})
-            self.category_list_widgets[stream_type].insertItem(1, itemFav)
+        if sorting_enabled:
+            #When sorting is enabled, set sort order, 0: A-Z, 1: Z-A, 2: recently added, 3: rating
+            list_model.sortRows(sort_order)
 
-        self.animate_progress(0, 100, f"Finished sorting {stream_type} {list_content_type}")
+        else:
+            #When sorting is disabled, show the list in the original order
+            list_model.unsortRows()
 
     def initIPTVinfo(self):
         self.iptv_info_text = QTextEdit()
@@ -581,19 +812,19 @@ class IPTVPlayerApp(QMainWindow):
 
     def initCategoryListWidgets(self):
         #Create lists for categories
-        self.category_list_live     = QListWidget()
-        self.category_list_movies   = QListWidget()
-        self.category_list_series   = QListWidget()
+        self.category_list_live     = QListView()
+        self.category_list_movies   = QListView()
+        self.category_list_series   = QListView()
 
-        #Enable sorting
-        # self.category_list_live.setSortingEnabled(True)
-        # self.category_list_movies.setSortingEnabled(True)
-        # self.category_list_series.setSortingEnabled(True)
+        #Set models that show the categories without creating an item per category
+        self.category_list_live.setModel(CatalogListModel(self))
+        self.category_list_movies.setModel(CatalogListModel(self))
+        self.category_list_series.setModel(CatalogListModel(self))
 
         #Connect functions to category list events
-        self.category_list_live.itemClicked.connect(self.category_item_clicked)
-        self.category_list_movies.itemClicked.connect(self.category_item_clicked)
-        self.category_list_series.itemClicked.connect(self.category_item_clicked)
+        self.category_list_live.clicked.connect(self.category_item_clicked)
+        self.category_list_movies.clicked.connect(self.category_item_clicked)
+        self.category_list_series.clicked.connect(self.category_item_clicked)
 
         #Put category lists in list
         self.category_list_widgets = {
@@ -607,8 +838,9 @@ class IPTVPlayerApp(QMainWindow):
         for list_widget in [self.category_list_live, self.category_list_movies, self.category_list_series]:
             list_widget.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
             list_widget.setIconSize(standard_icon_size)
+            list_widget.setEditTriggers(QListView.NoEditTriggers)
             list_widget.setStyleSheet("""
-                QListWidget::item {
+                QListView::item {
                     padding-top: 5px;
                     padding-bottom: 5px;
                 }
@@ -616,32 +848,33 @@ class IPTVPlayerApp(QMainWindow):
 
     def initEntryListWidgets(self):
         #Create lists for channels
-        self.streaming_list_live      = QListWidget()
-        self.streaming_list_movies    = QListWidget()
-        self.streaming_list_series    = QListWidget()
+        self.streaming_list_live      = QListView()
+        self.streaming_list_movies    = QListView()
+        self.streaming_list_series    = QListView()
 
-        #Enable sorting
-        # self.streaming_list_live.setSortingEnabled(True)
-        # self.streaming_list_movies.setSortingEnabled(True)
-        # self.streaming_list_series.setSortingEnabled(True)
+        #Set models that show the entries without creating an item per entry
+        self.streaming_list_live.setModel(LiveListModel(self.get_now_next, self))
+        self.streaming_list_movies.setModel(CatalogListModel(self))
+        self.streaming_list_series.setModel(CatalogListModel(self))
 
-        #Set that lists load items in batches to prevent screen freezing
-        self.streaming_list_live.setLayoutMode(QListView.Batched)
-        self.streaming_list_movies.setLayoutMode(QListView.Batched)
-        self.streaming_list_series.setLayoutMode(QListView.Batched)
+        #All items have the same height, so the list only lays out the visible items
+        self.streaming_list_live.setUniformItemSizes(True)
+        self.streaming_list_movies.setUniformItemSizes(True)
+        self.streaming_list_series.setUniformItemSizes(True)
 
-        self.streaming_list_live.setBatchSize(2000)
-        self.streaming_list_movies.setBatchSize(2000)
-        self.streaming_list_series.setBatchSize(2000)
+        #Lay out the rows in batches after the list is reset, so large lists don't block the window
+        for list_widget in [self.streaming_list_live, self.streaming_list_movies, self.streaming_list_series]:
+            list_widget.setLayoutMode(QListView.Batched)
+            list_widget.setBatchSize(LIST_LAYOUT_BATCH_SIZE)
 
         #Connect functions to entry list events
-        self.streaming_list_live.itemDoubleClicked.connect(self.streaming_item_double_clicked)
-        self.streaming_list_movies.itemDoubleClicked.connect(self.streaming_item_double_clicked)
-        self.streaming_list_series.itemDoubleClicked.connect(self.streaming_item_double_clicked)
+        self.streaming_list_live.doubleClicked.connect(self.streaming_item_double_clicked)
+        self.streaming_list_movies.doubleClicked.connect(self.streaming_item_double_clicked)
+        self.streaming_list_series.doubleClicked.connect(self.streaming_item_double_clicked)
 
-        self.streaming_list_live.itemClicked.connect(self.streaming_item_clicked)
-        self.streaming_list_movies.itemClicked.connect(self.streaming_item_clicked)
-        self.streaming_list_series.itemClicked.connect(self.streaming_item_clicked)
+        self.streaming_list_live.clicked.connect(self.streaming_item_clicked)
+        self.streaming_list_movies.clicked.connect(self.streaming_item_clicked)
+        self.streaming_list_series.clicked.connect(self.streaming_item_clicked)
 
         #Put entry lists in list
         self.streaming_list_widgets = {
@@ -655,8 +888,9 @@ class IPTVPlayerApp(QMainWindow):
         for list_widget in [self.streaming_list_live, self.streaming_list_movies, self.streaming_list_series]:
             list_widget.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
             list_widget.setIconSize(standard_icon_size)
+            list_widget.setEditTriggers(QListView.NoEditTriggers)
             list_widget.setStyleSheet("""
-                QListWidget::item {
+                QListView::item {
                     padding-top: 5px;
                     padding-bottom: 5px;
                 }
@@ -717,50 +951,35 @@ class IPTVPlayerApp(QMainWindow):
             self.default_sorting_order_box.setCurrentText(sorting_order)
 
         #Set sorting variables
-        match self.default_sorting_order_box.currentText():
-            case "A-Z":
-                self.sorting_enabled    = True
-                self.sorting_order      = 0
-
-            case "Z-A":
-                self.sorting_enabled    = True
-                self.sorting_order      = 1
-
-            case _:
-                self.sorting_enabled    = False
-                self.sorting_order      = 0
+        self.sorting_enabled, self.sorting_order = self.get_sorting_order(self.default_sorting_order_box.currentText())
 
-    def setAllSortingOrder(self, sorting_order):
+    def get_sorting_order(self, sorting_order):
+        #Get sorting enabled and sort order, 0: A-Z, 1: Z-A, 2: recently added, 3: rating
         match sorting_order:
             case "A-Z":
-                print("sorting A-Z")
-                self.sortList(self.category_search_bars["LIVE"], 'category', "LIVE", self.category_list_widgets, True, 0)
-                self.sortList(self.category_search_bars["Movies"], 'category', "Movies", self.category_list_widgets, True, 0)
-                self.sortList(self.category_search_bars["Series"], 'category', "Series", self.category_list_widgets, True, 0)
-
-                self.sortList(self.streaming_search_bars["LIVE"], 'streaming', "LIVE", self.streaming_list_widgets, True, 0)
-                self.sortList(self.streaming_search_bars["Movies"], 'streaming', "Movies", self.streaming_list_widgets, True, 0)
-                self.sortList(self.streaming_search_bars["Series"], 'streaming', "Series", self.streaming_list_widgets, True, 0)
+                return True, 0
 
             case "Z-A":
-                print("sorting Z-A")
-                self.sortList(self.category_search_bars["LIVE"], 'category', "LIVE", self.category_list_widgets, True, 1)
-                self.sortList(self.category_search_bars["Movies"], 'category', "Movies", self.category_list_widgets, True, 1)
-                self.sortList(self.category_search_bars["Series"], 'category', "Series", self.category_list_widgets, True, 1)
+                return True, 1
+
+            case "Recently added":
+                return True, 2
 
-                self.sortList(self.streaming_search_bars["LIVE"], 'streaming', "LIVE", self.streaming_list_widgets, True, 1)
-                self.sortList(self.streaming_search_bars["Movies"], 'streaming', "Movies", self.streaming_list_widgets, True, 1)
-                self.sortList(self.streaming_search_bars["Series"], 'streaming', "Series", self.streaming_list_widgets, True, 1)
+            case "Rating":
+                return True, 3
 
             case _:
-                print("sorting disabled")
-                self.sortList(self.category_search_bars["LIVE"], 'category', "LIVE", self.category_list_widgets, False, 0)
-                self.sortList(self.category_search_bars["Movies"], 'category', "Movies", self.category_list_widgets, False, 0)
-                self.sortList(self.category_search_bars["Series"], 'category', "Series", self.category_list_widgets, False, 0)
+                return False, 0
 
-                self.sortList(self.streaming_search_bars["LIVE"], 'streaming', "LIVE", self.streaming_list_widgets, False, 0)
-                self.sortList(self.streaming_search_bars["Movies"], 'streaming', "Movies", self.streaming_list_widgets, False, 0)
-                self.sortList(self.streaming_search_bars["Series"], 'streaming', "Series", self.streaming_list_widgets, False, 0)
+    def setAllSortingOrder(self, sorting_order):
+        print(f"sorting {sorting_order}")
+
+        sorting_enabled, sort_order = self.get_sorting_order(sorting_order)
+
+        #Only picks the precomputed sort permutations, lists are not sorted again
+        for stream_type in ["LIVE", "Movies", "Series"]:
+            self.sortList(self.category_search_bars[stream_type], 'category', stream_type, self.category_list_widgets, sorting_enabled, sort_order)
+            self.sortList(self.streaming_search_bars[stream_type], 'streaming', stream_type, self.streaming_list_widgets, sorting_enabled, sort_order)
 
     def setDefaultSortingOrder(self, e, combobox):
         sorting_order = combobox.currentText()
@@ -768,18 +987,7 @@ class IPTVPlayerApp(QMainWindow):
         print(f"setting default sorting order: {sorting_order}")
 
         #Set sorting variables
-        match sorting_order:
-            case "A-Z":
-                self.sorting_enabled    = True
-                self.sorting_order      = 0
-
-            case "Z-A":
-                self.sorting_enabled    = True
-                self.sorting_order      = 1
-
-            case _:
-                self.sorting_enabled    = False
-                self.sorting_order      = 0
+        self.sorting_enabled, self.sorting_order = self.get_sorting_order(sorting_order)
 
         self.setAllSortingOrder(sorting_order)
 
@@ -815,16 +1023,17 @@ class IPTVPlayerApp(QMainWindow):
         self.keep_on_top_checkbox.stateChanged.connect(self.toggleKeepOnTop)
 
         self.default_sorting_order_box = QComboBox()
-        self.default_sorting_order_box.addItems(["A-Z", "Z-A", "Sorting disabled"])
+        self.default_sorting_order_box.addItems(["A-Z", "Z-A", "Recently added", "Rating", "Sorting disabled"])
         self.default_sorting_order_box.currentTextChanged.connect(lambda e: self.setDefaultSortingOrder(e, self.default_sorting_order_box))
 
-        # self.cache_on_startup_checkbox = QCheckBox("Startup with cached data")
-        # self.cache_on_startup_checkbox.setToolTip("Loads the cached IPTV data on startup to reduce startup time.\nNote that the cached data only changes if you manually reload it once in a while.")
-        # self.cache_on_startup_checkbox.stateChanged.connect(self.toggle_cache_on_startup)
+        self.cache_on_startup_checkbox = QCheckBox("Startup with cached data")
+        self.cache_on_startup_checkbox.setToolTip("Loads the cached IPTV data on startup to reduce startup time.\nThe IPTV data is refreshed in the background afterwards.")
+        self.cache_on_startup_checkbox.stateChanged.connect(self.toggle_cache_on_startup)
 
-        # self.reload_data_btn = QPushButton("Reload data")
-        # self.reload_data_btn.setIcon(self.style().standardIcon(QtWidgets.QStyle.SP_BrowserReload))
-        # self.reload_data_btn.setToolTip("Click this to manually reload the IPTV data.\nNote that this only has effect if \'Startup with cached data\' is checked.")
+        self.reload_data_btn = QPushButton("Reload data")
+        self.reload_data_btn.setIcon(self.style().standardIcon(QtWidgets.QStyle.SP_BrowserReload))
+        self.reload_data_btn.setToolTip("Click this to reload the IPTV data in the background.")
+        self.reload_data_btn.clicked.connect(self.refresh_data)
 
         self.select_user_agent_box = QComboBox()
         self.select_user_agent_box.addItems(self.user_agents)
@@ -855,11 +1064,31 @@ class IPTVPlayerApp(QMainWindow):
         self.set_live_status_timeout.setValidator(timeout_validator)
         self.set_live_status_timeout.returnPressed.connect(lambda: self.setTimeout(self.set_live_status_timeout))
 
+        self.set_max_cache_size = QLineEdit()
+        self.set_max_cache_size.setFixedWidth(100)
+        self.set_max_cache_size.setValidator(QIntValidator(1, 999999))
+        self.set_max_cache_size.setToolTip("Maximum size of the cached IPTV data of all accounts together.\nThe least recently used accounts are removed from the cache first.")
+        self.set_max_cache_size.returnPressed.connect(lambda: self.setMaxCacheSize(self.set_max_cache_size))
+
+        self.strip_prefixes_checkbox = QCheckBox()
+        self.strip_prefixes_checkbox.setToolTip("Ignore provider prefixes like 'UK |' or 'NL|' in front of names when searching.")
+        self.strip_prefixes_checkbox.stateChanged.connect(self.toggle_strip_prefixes)
+
+        self.ingest_filter_button = QPushButton("Edit filter rules")
+        self.ingest_filter_button.setToolTip("Leave out streams of the current account while loading the IPTV data,\ne.g. other countries, radio or adult channels.")
+        self.ingest_filter_button.clicked.connect(self.open_ingest_filter_dialog)
+
+        self.bulk_epg_checkbox = QCheckBox()
+        self.bulk_epg_checkbox.setToolTip("Download the EPG of all channels at once after logging in (xmltv.php).\nShowing the EPG of a channel doesn't need a request anymore.")
+        self.bulk_epg_checkbox.stateChanged.connect(self.toggle_bulk_epg)
+
         #Add widgets to settings tab layout
         self.settings_layout.addWidget(self.address_book_button,                            0, 0)
         self.settings_layout.addWidget(self.choose_player_button,                           0, 1)
         self.settings_layout.addWidget(self.vods_enabled_checkbox,                          1, 0)
+        self.settings_layout.addWidget(self.cache_on_startup_checkbox,                      1, 1)
         self.settings_layout.addWidget(self.keep_on_top_checkbox,                           2, 0)
+        self.settings_layout.addWidget(self.reload_data_btn,                                2, 1)
         self.settings_layout.addWidget(QLabel("Default sorting order: "),                   3, 0)
         self.settings_layout.addWidget(self.default_sorting_order_box,                      3, 1)
         self.settings_layout.addWidget(self.update_checker,                                 4, 0)
@@ -874,9 +1103,14 @@ class IPTVPlayerApp(QMainWindow):
         self.settings_layout.addWidget(self.set_read_timeout,                                   7, 1)
         self.settings_layout.addWidget(QLabel("Set live status timeout (Advanced option): "),   8, 0)
         self.settings_layout.addWidget(self.set_live_status_timeout,                            8, 1)
-
-        # self.settings_layout.addWidget(self.cache_on_startup_checkbox,  2, 0)
-        # self.settings_layout.addWidget(self.reload_data_btn,            3, 0)
+        self.settings_layout.addWidget(QLabel("Set max cache size in MB (Advanced option): "),   9, 0)
+        self.settings_layout.addWidget(self.set_max_cache_size,                                 9, 1)
+        self.settings_layout.addWidget(QLabel("Ignore provider prefixes in search (Advanced option): "), 10, 0)
+        self.settings_layout.addWidget(self.strip_prefixes_checkbox,                            10, 1)
+        self.settings_layout.addWidget(QLabel("Filter streams of this account (Advanced option): "), 11, 0)
+        self.settings_layout.addWidget(self.ingest_filter_button,                               11, 1)
+        self.settings_layout.addWidget(QLabel("Download full EPG (XMLTV) (Advanced option): "), 12, 0)
+        self.settings_layout.addWidget(self.bulk_epg_checkbox,                                  12, 1)
 
     def userAgentSelected(self, e, combobox):
         #Get selected text
@@ -884,6 +1118,7 @@ class IPTVPlayerApp(QMainWindow):
 
         #Set current user agent
         self.current_user_agent = user_agent
+        Threadpools.set_user_agent(user_agent)
 
         #Save selected user agent to userdata
         config = configparser.ConfigParser()
@@ -905,6 +1140,9 @@ class IPTVPlayerApp(QMainWindow):
         else:
             self.current_user_agent = Threadpools.DEFAULT_USER_AGENT_HEADER
 
+        #Apply user agent to the shared HTTP session
+        Threadpools.set_user_agent(self.current_user_agent)
+
         #Update combobox to selection
         self.select_user_agent_box.setCurrentText(self.current_user_agent)
 
@@ -929,6 +1167,89 @@ class IPTVPlayerApp(QMainWindow):
         else:
             self.vods_enabled_checkbox.setCheckState(Qt.Unchecked)
 
+    def loadDefaultCacheOnStartup(self):
+        #Read userdata config file
+        config = configparser.ConfigParser()
+        config.read(self.user_data_file)
+
+        #Check if defined in config. Otherwise set to default
+        if 'Cache' in config:
+            self.cache_on_startup = (config['Cache'].get('startup_with_cache', 'False') == 'True')
+            self.catalog_cache.max_size_mb = int(config['Cache'].get('max_size_mb', DEFAULT_MAX_CACHE_SIZE_MB))
+        else:
+            self.cache_on_startup = False
+
+        #Set value in LineEdit widget
+        self.set_max_cache_size.setText(str(self.catalog_cache.max_size_mb))
+
+        #Update checkbox to match config
+        if self.cache_on_startup:
+            self.cache_on_startup_checkbox.setCheckState(Qt.Checked)
+        else:
+            self.cache_on_startup_checkbox.setCheckState(Qt.Unchecked)
+
+    def loadDefaultStripPrefixes(self):
+        #Read userdata config file
+        config = configparser.ConfigParser()
+        config.read(self.user_data_file)
+
+        #Check if defined in config. Otherwise set to default
+        if 'Search' in config:
+            strip_prefixes = (config['Search'].get('strip_provider_prefixes', 'False') == 'True')
+        else:
+            strip_prefixes = False
+
+        #Update checkbox to match config, which also rebuilds the search indexes when changed
+        if strip_prefixes:
+            self.strip_prefixes_checkbox.setCheckState(Qt.Checked)
+        else:
+            self.strip_prefixes_checkbox.setCheckState(Qt.Unchecked)
+
+    def loadDefaultBulkEPG(self):
+        #Read userdata config file
+        config = configparser.ConfigParser()
+        config.read(self.user_data_file)
+
+        #Check if defined in config. Otherwise set to default
+        if 'EPG' in config:
+            self.bulk_epg_enabled = (config['EPG'].get('bulk_epg', 'False') == 'True')
+        else:
+            self.bulk_epg_enabled = False
+
+        #Update checkbox to match config
+        if self.bulk_epg_enabled:
+            self.bulk_epg_checkbox.setCheckState(Qt.Checked)
+        else:
+            self.bulk_epg_checkbox.setCheckState(Qt.Unchecked)
+
+    def setMaxCacheSize(self, lineedit):
+        try:
+            #Get cache size from lineedit
+            value = lineedit.text()
+
+            #If value is invalid
+            if not value:
+                raise Exception(f"Value entered is not valid: {value}!")
+
+            #Apply new size, this removes cached catalogs if needed
+            self.catalog_cache.set_max_size(int(value), self.server, self.username)
+
+            config = configparser.ConfigParser()
+            config.read(self.user_data_file)
+
+            if 'Cache' not in config:
+                config['Cache'] = {}
+
+            config['Cache']['max_size_mb'] = value
+
+            with open(self.user_data_file, 'w') as config_file:
+                config.write(config_file)
+
+            self.animate_progress(0, 100, "Succesfully adjusted setting")
+
+        except Exception as e:
+            self.animate_progress(0, 100, f"Failed setting max cache size: {e}")
+
     def setTimeout(self, lineedit):
         try: 
             #Get timeout value from lineedit
@@ -1121,6 +1442,15 @@ class IPTVPlayerApp(QMainWindow):
         #Load default auto update checker
         self.loadDefaultAutoUpdate()
 
+        #Load if startup with cached data is enabled
+        self.loadDefaultCacheOnStartup()
+
+        #Load if provider prefixes are ignored in search
+        self.loadDefaultStripPrefixes()
+
+        #Load if the full EPG is downloaded
+        self.loadDefaultBulkEPG()
+
         #Load startup credentials
         self.loadStartupCredentials()
 
@@ -1186,125 +1516,671 @@ class IPTVPlayerApp(QMainWindow):
             config.write(config_file)
     
     def toggle_cache_on_startup(self, state):
-        if state == Qt.Checked:
-            print("checked")
-        else:
-            print("unchecked")
-
-    def open_m3u_plus_dialog(self):
-        text, ok = QtWidgets.QInputDialog.getText(self, 'M3u_plus Login', 'Enter m3u_plus URL:')
-        if ok and text:
-            m3u_plus_url = text.strip()
-            self.extract_credentials_from_m3u_plus_url(m3u_plus_url)
-            self.login()
+        checked = bool(state)
 
-    def update_font_size(self, value):
-        self.default_font_size = value
-        for tab_name, list_widget in self.streaming_list_widgets.items():
-            for i in range(list_widget.count()):
-                item = list_widget.item(i)
-                font = item.font()
-                font.setPointSize(value)
-                item.setFont(font)
+        self.cache_on_startup = checked
 
-        font = QFont()
-        font.setPointSize(value)
-        self.iptv_info_text.setFont(font)
+        config = configparser.ConfigParser()
+        config.read(self.user_data_file)
 
-    def extract_credentials_from_m3u_plus_url(self, url):
-        try:
-            pattern = r'(http[s]?://[^/]+)/get\.php\?username=([^&]*)&password=([^&]*)&type=(m3u_plus|m3u|&output=m3u8)'
-            match = re.match(pattern, url)
-            if match:
-                self.server     = match.group(1)
-                self.username   = match.group(2)
-                self.password   = match.group(3)
+        if 'Cache' not in config:
+            config['Cache'] = {}
 
-                return True
-            else:
-                self.animate_progress(0, 100, "Invalid m3u_plus or m3u URL")
+        config['Cache']['startup_with_cache'] = str(checked)
 
-                dlg = QMessageBox(self)
-                dlg.setWindowTitle("Error!")
-                dlg.setText("M3U plus URL is invalid!\nPlease enter valid URL")
-                dlg.exec()
+        with open(self.user_data_file, 'w') as config_file:
+            config.write(config_file)
 
-                return False
-        except Exception as e:
-            print(f"Error extracting credentials: {e}")
-            self.animate_progress(0, 100, "Error extracting credentials")
+    def toggle_bulk_epg(self, state):
+        checked = bool(state)
 
-            return False
+        #Nothing changed, e.g. when loading the setting at startup
+        if checked == self.bulk_epg_enabled:
+            return
 
-    def set_progress_text(self, text):
-        self.progress_bar.setFormat(text)
-        QtWidgets.qApp.processEvents()
-        # QtWidgets.qApp.sendPostedEvents()
+        self.bulk_epg_enabled = checked
 
-    def set_progress_bar(self, val, text):
-        self.progress_bar.setFormat(text)
-        self.progress_bar.setValue(val)
-        QtWidgets.qApp.processEvents()
+        config = configparser.ConfigParser()
+        config.read(self.user_data_file)
 
-    def animate_progress(self, start, end, text):
-        self.playlist_progress_animation.stop()
-        self.playlist_progress_animation.setStartValue(start)
-        self.playlist_progress_animation.setEndValue(end)
-        self.set_progress_text(text)
-        self.playlist_progress_animation.start()
-        QtWidgets.qApp.processEvents()
+        if 'EPG' not in config:
+            config['EPG'] = {}
 
-    def login(self):
-        # When logging into another server, reset the progress bar
-        self.set_progress_bar(0, "Logging in...")
+        config['EPG']['bulk_epg'] = str(checked)
 
-        #Clear lists
-        for tab_name, list_widget in self.streaming_list_widgets.items():
-            list_widget.clear()
+        with open(self.user_data_file, 'w') as config_file:
+            config.write(config_file)
 
-        for tab_name, list_widget in self.category_list_widgets.items():
-            list_widget.clear()
+        #Download the EPG of the current account right away, or leave the downloaded EPG out of the now and next
+        self.start_epg_download()
+        self.load_epg_index()
 
-        #Check if login credentials are not empty
-        if not self.server or not self.username or not self.password:
-            dlg = QMessageBox(self)
-            dlg.setWindowTitle("Error!")
-            dlg.setText("Please fill in all fields to login!")
-            dlg.exec()
+    def toggle_strip_prefixes(self, state):
+        checked = bool(state)
 
+        #Nothing changed, e.g. when loading the setting at startup
+        if checked == self.search_strip_prefixes:
             return
 
-        #Start IPTV data fetch thread
-        self.fetch_data_thread()
+        self.search_strip_prefixes = checked
 
-        self.set_progress_bar(0, "Going to fetch data...")
+        config = configparser.ConfigParser()
+        config.read(self.user_data_file)
 
-    def fetch_data_thread(self):
-        dataWorker = FetchDataWorker(self.server, self.username, self.password, self.live_url_format, self.movie_url_format, self.series_url_format, self, self.vods_enabled)
-        dataWorker.signals.finished.connect(self.process_data)
-        dataWorker.signals.error.connect(self.on_fetch_data_error)
-        dataWorker.signals.progress_bar.connect(self.animate_progress)
-        dataWorker.signals.show_error_msg.connect(self.show_error_msg)
-        dataWorker.signals.show_info_msg.connect(self.show_info_msg)
-        self.threadpool.start(dataWorker)
+        if 'Search' not in config:
+            config['Search'] = {}
 
-    def process_data(self, iptv_info, categories_per_stream_type, entries_per_stream_type):
-        print("Going to process IPTV data now")
+        config['Search']['strip_provider_prefixes'] = str(checked)
 
-        self.categories_per_stream_type = categories_per_stream_type
-        self.entries_per_stream_type    = entries_per_stream_type
+        with open(self.user_data_file, 'w') as config_file:
+            config.write(config_file)
 
-        self.set_progress_bar(0, "Processing received data...")
+        self.set_progress_bar(0, "Rebuilding search index")
 
-        #Process IPTV info
-        user_info   = iptv_info.get("user_info", {})
-        server_info = iptv_info.get("server_info", {})
+        #Index the loaded names again with the new search keys in worker threads, results of previous toggles are ignored
+        self.search_index_generation += 1
+        self.search_index_rebuilds    = {}
 
-        hostname    = server_info.get("url", "Unknown")
-        port        = server_info.get("port", "Unknown")
-        if hostname == "Unknown" or port == "Unknown":
-            host = "Unknown"
-        else:
+        for stream_type in self.catalog_indexes.keys():
+            self.start_search_index_rebuild(stream_type)
+
+        if not self.search_index_rebuilds:
+            self.set_progress_bar(100, "Finished rebuilding search index")
+
+    def start_search_index_rebuild(self, stream_type):
+        index                   = self.catalog_indexes[stream_type]
+        search_index, version   = index.get_search_rebuild()
+
+        #Remember which index is rebuilt, the lists can be loaded again in the meantime
+        self.search_index_rebuilds[stream_type] = (index, version)
+
+        search_index_worker = SearchIndexWorker(self.search_index_generation, stream_type, search_index, index.entries, self.search_strip_prefixes)
+
+        search_index_worker.signals.finished.connect(self.on_search_index_rebuilt)
+        search_index_worker.signals.error.connect(self.on_search_index_rebuild_error)
+
+        self.threadpool.start(search_index_worker)
+
+    def on_search_index_rebuilt(self, generation, stream_type, search_index):
+        #Ignore indexes of a previous toggle
+        if generation != self.search_index_generation or stream_type not in self.search_index_rebuilds:
+            return
+
+        index, version = self.search_index_rebuilds.pop(stream_type)
+
+        #When the lists were loaded again, the new index already uses the new search keys
+        if self.catalog_indexes.get(stream_type) is index:
+            if not index.set_rebuilt_search_index(search_index, version):
+                #Rows were changed while rebuilding, e.g. by a refresh, so rebuild again
+                self.start_search_index_rebuild(stream_type)
+                return
+
+            #Previous searches used the old search keys, so they can't be narrowed down anymore
+            self.last_streaming_searches.pop(stream_type, None)
+
+        if not self.search_index_rebuilds:
+            self.set_progress_bar(100, "Finished rebuilding search index")
+
+    def on_search_index_rebuild_error(self, generation, stream_type, error_msg):
+        if generation == self.search_index_generation:
+            self.search_index_rebuilds.pop(stream_type, None)
+
+            self.animate_progress(0, 100, "Failed rebuilding search index")
+
+    def load_ingest_filter(self):
+        #Read the ingest filter rules of the current account
+        config = configparser.ConfigParser()
+        config.read(self.user_data_file)
+
+        try:
+            return IngestFilter.from_config(config, self.server, self.username)
+        except Exception as e:
+            print(f"Failed loading ingest filter rules: {e}")
+            return IngestFilter()
+
+    def open_ingest_filter_dialog(self):
+        #Check if logged in
+        if not self.server or not self.username:
+            self.animate_progress(0, 100, "Not logged in, no account to filter")
+            return
+
+        dialog = IngestFilterDialog(self.load_ingest_filter(), self.categories_per_stream_type, self)
+
+        if dialog.exec_() != QDialog.Accepted:
+            return
+
+        config = configparser.ConfigParser()
+        config.read(self.user_data_file)
+
+        dialog.get_ingest_filter().save_config(config, self.server, self.username)
+
+        with open(self.user_data_file, 'w') as config_file:
+            config.write(config_file)
+
+        #Reload the IPTV data with the new rules, left out entries are removed from the lists
+        self.refresh_data()
+
+    def open_epg_store(self):
+        db_file = self.catalog_cache.epg_path(self.server, self.username) if self.server and self.username else None
+
+        #Close EPG store of the previous account. The store is kept when logging in to the same account again,
+        #an EPG download of that account can still be writing to it.
+        if self.epg_store and self.epg_store.db_file != db_file:
+            self.epg_store.close()
+            self.epg_store = None
+
+        #Check if logged in. The store also caches the EPG fetched per channel, so it is opened without bulk EPG too.
+        if db_file and not self.epg_store:
+            try:
+                self.epg_store = EPGStore(db_file, self.catalog_cache.stream_epg_path(self.server, self.username))
+
+                #Remove EPG that expired long ago in a worker thread
+                self.threadpool.start(EPGCleanupWorker(self.epg_store, time.time() - EPG_CACHE_KEEP_STALE))
+            except Exception as e:
+                self.epg_store = None
+
+                print(f"Failed opening EPG store: {e}")
+
+        self.load_epg_index()
+
+    def load_epg_index(self):
+        #Index the programmes of the coming hours of the downloaded EPG and of the cached EPG per stream
+        now = time.time()
+
+        self.epg_index.clear(now)
+
+        if self.epg_store:
+            try:
+                if self.bulk_epg_enabled:
+                    self.epg_index.load_rows(((('channel', channel), start, stop, title)
+                        for channel, start, stop, title in self.epg_store.get_programmes_between(now, now + EPG_INDEX_WINDOW)), now)
+
+                for stream_id, listings in self.epg_store.get_all_stream_epg():
+                    self.epg_index.set_programmes(('stream', stream_id), [tuple(listing[:3]) for listing in listings], now)
+            except Exception as e:
+                print(f"Failed loading EPG index: {e}")
+
+        self.update_now_next(clear=True)
+
+    def get_now_next(self, entry, now):
+        #Returns the text shown behind the channel name, the tooltip and the time until which they are valid.
+        #The EPG fetched for the stream goes before the downloaded EPG of its channel.
+        keys = [('stream', str(entry.get('stream_id')))]
+
+        if self.bulk_epg_enabled:
+            keys.append(('channel', entry.get('epg_channel_id')))
+
+        key = next((key for key in keys if self.epg_index.has_channel(key)), None)
+
+        if key is None:
+            return None, None, now + EPG_INDEX_RECHECK
+
+        now_programme, next_programme, valid_until = self.epg_index.get_now_next(key, now)
+
+        tooltip_lines = []
+        for label, programme in [("Now", now_programme), ("Next", next_programme)]:
+            if programme:
+                start, stop, title = programme
+                tooltip_lines.append(f"{label}: {datetime.fromtimestamp(start).strftime('%H:%M')}-{datetime.fromtimestamp(stop).strftime('%H:%M')} {title}")
+
+        return (now_programme[2] if now_programme else None), ("\n".join(tooltip_lines) or None), valid_until
+
+    def update_now_next(self, clear=False):
+        now = time.time()
+
+        #The index only holds the programmes of a window from when it was loaded, load the coming hours before it runs out
+        if self.epg_index.needs_reload(now):
+            self.load_epg_index()
+            return
+
+        #Only the now and next of shown rows that rolled over are computed again
+        self.streaming_list_live.model().updateNowNext(now, clear)
+
+    def start_epg_download(self):
+        if not self.bulk_epg_enabled or not self.epg_store:
+            return
+
+        epg_worker = EPGDownloadWorker(self.server, self.username, self.password, self.epg_store)
+
+        epg_worker.signals.finished.connect(self.on_epg_downloaded)
+        epg_worker.signals.error.connect(self.on_epg_download_error)
+
+        self.epg_threadpool.start(epg_worker)
+
+    def on_epg_downloaded(self, num_of_programmes):
+        print(f"Downloaded EPG with {num_of_programmes} programmes")
+
+        #The EPG store counts to the size of the cached catalog of the account
+        self.catalog_cache.update_size(self.server, self.username)
+
+        self.load_epg_index()
+
+    def on_epg_download_error(self, error_msg):
+        #The EPG of single channels is still fetched when clicked
+        print(f"Failed downloading EPG: {error_msg}")
+
+    def open_m3u_plus_dialog(self):
+        text, ok = QtWidgets.QInputDialog.getText(self, 'M3u_plus Login', 'Enter m3u_plus URL:')
+        if ok and text:
+            m3u_plus_url = text.strip()
+            self.extract_credentials_from_m3u_plus_url(m3u_plus_url)
+            self.login()
+
+    def update_font_size(self, value):
+        self.default_font_size = value
+        for tab_name, list_widget in self.streaming_list_widgets.items():
+            font = QFont()
+            font.setPointSize(value)
+            list_widget.model().setFont(font)
+
+        font = QFont()
+        font.setPointSize(value)
+        self.global_search_list.model().setFont(font)
+
+        font = QFont()
+        font.setPointSize(value)
+        self.iptv_info_text.setFont(font)
+
+    def extract_credentials_from_m3u_plus_url(self, url):
+        try:
+            pattern = r'(http[s]?://[^/]+)/get\.php\?username=([^&]*)&password=([^&]*)&type=(m3u_plus|m3u|&output=m3u8)'
+            match = re.match(pattern, url)
+            if match:
+                self.server     = match.group(1)
+                self.username   = match.group(2)
+                self.password   = match.group(3)
+
+                return True
+            else:
+                self.animate_progress(0, 100, "Invalid m3u_plus or m3u URL")
+
+                dlg = QMessageBox(self)
+                dlg.setWindowTitle("Error!")
+                dlg.setText("M3U plus URL is invalid!\nPlease enter valid URL")
+                dlg.exec()
+
+                return False
+        except Exception as e:
+            print(f"Error extracting credentials: {e}")
+            self.animate_progress(0, 100, "Error extracting credentials")
+
+            return False
+
+    def set_progress_text(self, text):
+        self.progress_bar.setFormat(text)
+        QtWidgets.qApp.processEvents()
+        # QtWidgets.qApp.sendPostedEvents()
+
+    def set_progress_bar(self, val, text):
+        self.progress_bar.setFormat(text)
+        self.progress_bar.setValue(val)
+        QtWidgets.qApp.processEvents()
+
+    def animate_progress(self, start, end, text):
+        self.playlist_progress_animation.stop()
+        self.playlist_progress_animation.setStartValue(start)
+        self.playlist_progress_animation.setEndValue(end)
+        self.set_progress_text(text)
+        self.playlist_progress_animation.start()
+        QtWidgets.qApp.processEvents()
+
+    def login(self):
+        # When logging into another server, reset the progress bar
+        self.set_progress_bar(0, "Logging in...")
+
+        #Stop filling the lists of the previous login
+        self.stop_population()
+
+        #Clear lists
+        for tab_name, list_widget in self.streaming_list_widgets.items():
+            list_widget.model().clear()
+
+        for tab_name, list_widget in self.category_list_widgets.items():
+            list_widget.model().clear()
+
+        #Check if login credentials are not empty
+        if not self.server or not self.username or not self.password:
+            dlg = QMessageBox(self)
+            dlg.setWindowTitle("Error!")
+            dlg.setText("Please fill in all fields to login!")
+            dlg.exec()
+
+            return
+
+        #Open EPG store of this account and download the full EPG in the background
+        self.open_epg_store()
+        self.start_epg_download()
+
+        #Start IPTV data fetch thread, startup with the cached data if enabled
+        if self.cache_on_startup and self.catalog_cache.has_cache(self.server, self.username):
+            self.fetch_data_thread(load_from_cache=True)
+        else:
+            self.fetch_data_thread()
+
+        self.set_progress_bar(0, "Going to fetch data...")
+
+    def fetch_data_thread(self, load_from_cache=False):
+        #Ignore any running background refresh of the previous login
+        self.refresh_signals = None
+
+        dataWorker = FetchDataWorker(self.server, self.username, self.password, self.live_url_format, self.movie_url_format, self.series_url_format, self, self.vods_enabled, load_from_cache,
+            self.load_ingest_filter())
+
+        if load_from_cache:
+            dataWorker.signals.finished.connect(self.process_cached_data)
+            dataWorker.signals.error.connect(self.on_cache_load_error)
+        else:
+            dataWorker.signals.finished.connect(self.process_data)
+            dataWorker.signals.error.connect(self.on_fetch_data_error)
+
+        dataWorker.signals.progress_bar.connect(self.animate_progress)
+        dataWorker.signals.show_error_msg.connect(self.show_error_msg)
+        dataWorker.signals.show_info_msg.connect(self.show_info_msg)
+        self.threadpool.start(dataWorker)
+
+    def process_cached_data(self, iptv_info, categories_per_stream_type, entries_per_stream_type):
+        #Show cached data immediately
+        self.process_data(iptv_info, categories_per_stream_type, entries_per_stream_type)
+
+        #Fetch fresh data in the background
+        self.refresh_data()
+
+    def on_cache_load_error(self, error_msg):
+        print(f"Failed loading cached data: {error_msg}")
+
+        #Fetch the IPTV data from the provider instead
+        self.fetch_data_thread()
+
+    def refresh_data(self):
+        #Check if logged in
+        if not self.server or not self.username or not self.password:
+            self.animate_progress(0, 100, "Not logged in, nothing to reload")
+            return
+
+        refreshWorker = FetchDataWorker(self.server, self.username, self.password, self.live_url_format, self.movie_url_format, self.series_url_format, self, self.vods_enabled,
+            ingest_filter=self.load_ingest_filter())
+        refreshWorker.signals.finished.connect(self.process_refreshed_data)
+        refreshWorker.signals.error.connect(self.on_refresh_data_error)
+        refreshWorker.signals.progress_bar.connect(self.show_refresh_progress)
+
+        #Save signals, so results of outdated refreshes can be ignored
+        self.refresh_signals = refreshWorker.signals
+
+        self.refresh_threadpool.start(refreshWorker)
+
+    def show_refresh_progress(self, start, end, text):
+        #Only show text, the user can keep using the lists while refreshing
+        self.progress_bar.setFormat(f"Refreshing in background: {text}")
+
+    def on_refresh_data_error(self, error_msg):
+        print(f"Failed refreshing IPTV data: {error_msg}")
+        self.animate_progress(0, 100, "Failed refreshing IPTV data")
+
+    def process_refreshed_data(self, iptv_info, categories_per_stream_type, entries_per_stream_type):
+        #Ignore refreshes of a previous login
+        if self.sender() is not self.refresh_signals:
+            return
+
+        self.refresh_signals = None
+
+        #Lists must be filled completely before refreshed entries are merged in
+        self.finish_population()
+
+        #Update IPTV info if it could be fetched
+        if iptv_info:
+            self.process_iptv_info(iptv_info)
+
+        num_of_differences = 0
+
+        for stream_type in entries_per_stream_type.keys():
+            #Skip VODs if option enabled
+            if self.vods_enabled is False and (stream_type == 'Movies' or stream_type == 'Series'):
+                continue
+
+            #Only reload the category list if the categories have changed
+            if categories_per_stream_type[stream_type] != self.categories_per_stream_type.get(stream_type, []):
+                num_of_differences += 1
+
+                self.categories_per_stream_type[stream_type] = categories_per_stream_type[stream_type]
+                self.load_category_list(stream_type)
+
+                #Categories are new items, so clicking a category has to be possible again
+                self.prev_clicked_category_item[stream_type] = 0
+
+            #Merge the fresh entries into the current entries
+            added, removed, changed = self.merge_refreshed_entries(stream_type, entries_per_stream_type[stream_type])
+
+            if not (added or removed or changed):
+                continue
+
+            num_of_differences += len(added) + len(removed) + len(changed)
+
+            print(f"Refreshed {stream_type}: {len(added)} added, {len(removed)} removed, {len(changed)} changed")
+
+            #Facet values can be added or removed
+            self.load_facet_bar(stream_type)
+
+            #Reload streaming list with the currently selected category and facets
+            rows = self.get_filtered_rows(stream_type, self.selected_category[stream_type])
+
+            if stream_type == 'Series' and self.series_navigation_level != 0:
+                #Don't leave series navigation, only update the list used for going back
+                self.currently_loaded_streams['Series'] = rows
+            else:
+                self.load_streaming_list(stream_type, rows)
+
+                #Search again, so the list keeps showing the results of the search text
+                search_text = self.streaming_search_bars[stream_type].text()
+                if search_text:
+                    self.search_in_list('streaming', stream_type, search_text)
+
+        if num_of_differences:
+            self.animate_progress(0, 100, "Refreshed IPTV data")
+        else:
+            self.animate_progress(0, 100, "IPTV data is up to date")
+
+    def merge_refreshed_entries(self, stream_type, new_entries):
+        entries = self.entries_per_stream_type[stream_type]
+        index   = self.catalog_indexes[stream_type]
+        id_key  = index.id_key
+
+        #Copy rows per stream id of the current entries, matched rows are removed from it
+        rows_per_id = {stream_id: list(rows) for stream_id, rows in index.rows_per_id.items()}
+
+        added   = []
+        changed = []
+
+        for new_entry in new_entries:
+            rows = rows_per_id.get(new_entry.get(id_key))
+
+            if rows:
+                row = rows.pop(0)
+
+                #Update changed entry in place, so the row stays the same
+                if entries[row] != new_entry:
+                    index.remove_row(row, entries[row])
+
+                    entries[row].clear()
+                    entries[row].update(new_entry)
+                    changed.append(row)
+
+                    index.add_row(row, entries[row])
+            else:
+                #Append new entry
+                entries.append(new_entry)
+                added.append(len(entries) - 1)
+
+                index.add_row(len(entries) - 1, new_entry)
+
+        #Remaining rows are not available anymore. Keep an empty row, so the other rows don't shift.
+        removed = [row for rows in rows_per_id.values() for row in rows]
+        for row in removed:
+            index.remove_row(row, entries[row])
+
+            entries[row] = None
+
+        return added, removed, changed
+
+    def process_data(self, iptv_info, categories_per_stream_type, entries_per_stream_type):
+        print("Going to process IPTV data now")
+
+        #Stop filling the lists of previously loaded data
+        self.stop_population()
+
+        #The previously loaded data was frozen by population_finished, so it can be collected again once it is dropped
+        reloading = gc.get_freeze_count() > 0
+        gc.unfreeze()
+
+        self.categories_per_stream_type = categories_per_stream_type
+        self.entries_per_stream_type    = entries_per_stream_type
+
+        self.set_progress_bar(0, "Processing received data...")
+
+        #Process IPTV info
+        self.process_iptv_info(iptv_info)
+
+        #Results of the search in all lists refer to the previous data
+        self.clearGlobalSearch()
+
+        for stream_type in self.entries_per_stream_type.keys():
+            #Reset selected category
+            self.selected_category[stream_type]             = None
+            self.prev_clicked_category_item[stream_type]    = 0
+
+            #Clear category and streaming list
+            self.category_list_widgets[stream_type].model().clear()
+            self.streaming_list_widgets[stream_type].model().clear()
+            self.currently_loaded_categories[stream_type] = []
+            self.currently_loaded_streams[stream_type] = []
+
+        #Collect the garbage of the previous data once, then don't collect while filling the lists.
+        #Every full collection goes over all entries, which takes longer than a time slice in large playlists.
+        if reloading:
+            gc.collect()
+        gc.disable()
+
+        #Fill the lists per tab in time slices from the event loop, see populate_next_slice
+        self.populations            = {stream_type: self.populate_tab(stream_type) for stream_type in self.entries_per_stream_type.keys()}
+        self.num_of_populated_rows  = 0
+        self.num_of_population_rows = sum(len(entries) for entries in self.entries_per_stream_type.values())
+        self.population_timer.start(0)
+
+    def populate_tab(self, stream_type):
+        entries = self.entries_per_stream_type[stream_type]
+
+        #Index stream ids and favorites in steps of limited time
+        index = CatalogIndex(stream_type, entries, build=False, strip_prefixes=self.search_strip_prefixes)
+        self.catalog_indexes[stream_type] = index
+
+        row = 0
+        while row < len(entries):
+            next_row = index.add_rows(row, len(entries), time.perf_counter() + POPULATE_STEP_SECONDS)
+
+            self.num_of_populated_rows += next_row - row
+            self.progress_bar.setValue(int(self.num_of_populated_rows * 100 / max(self.num_of_population_rows, 1)))
+
+            row = next_row
+            yield
+
+        #Skip VODs if option enabled
+        if self.vods_enabled is False and (stream_type == 'Movies' or stream_type == 'Series'):
+            return
+
+        self.progress_bar.setFormat(f"Loading {stream_type} lists...")
+
+        #Add categories in category list and facet values in the filter bar
+        self.load_category_list(stream_type)
+        self.load_facet_bar(stream_type)
+        yield
+
+        #Compute sort permutation of the current order in steps
+        if self.sorting_enabled:
+            yield from index.build_sort_permutation(SORT_KEYS[self.sorting_order], POPULATE_STEP_SECONDS)
+
+        #Get the rows of all available entries in steps
+        rows        = []
+        deadline    = time.perf_counter() + POPULATE_STEP_SECONDS
+
+        for row, entry in enumerate(entries):
+            if entry is not None:
+                rows.append(row)
+
+            if row % ROWS_PER_TIME_CHECK == 0 and time.perf_counter() >= deadline:
+                yield
+                deadline = time.perf_counter() + POPULATE_STEP_SECONDS
+
+        rows = index.filter_facets(rows, self.selected_facets[stream_type])
+        yield
+
+        #Add streams with the selected facets in streaming list
+        self.load_streaming_list(stream_type, rows)
+
+    def populate_next_slice(self):
+        #Fill the lists until the time of this slice is used, the event loop handles input and painting in between
+        deadline = time.perf_counter() + POPULATE_SLICE_SECONDS
+
+        #Don't start a step that would end after the slice
+        while self.populations and time.perf_counter() + POPULATE_STEP_SECONDS <= deadline:
+            #Fill the visible tab first, the other tabs when the user is not on an unfilled tab
+            stream_type = self.tab_widget.tabText(self.tab_widget.currentIndex())
+            if stream_type not in self.populations:
+                stream_type = next(iter(self.populations))
+
+            try:
+                next(self.populations[stream_type])
+            except StopIteration:
+                del self.populations[stream_type]
+            except Exception as e:
+                print(f"Failed filling {stream_type} lists: {e}")
+                del self.populations[stream_type]
+
+        if not self.populations:
+            self.population_finished()
+
+    def population_finished(self):
+        self.population_timer.stop()
+
+        #Move the loaded data out of the garbage collector's generations, so later collections don't go over it
+        gc.freeze()
+        gc.enable()
+
+        self.progress_bar.setValue(100)
+        self.progress_bar.setFormat("Finished loading")
+
+    def tab_changed(self, tab_index):
+        #Start filling the opened tab right away when it is not filled yet
+        if self.tab_widget.tabText(tab_index) in self.populations:
+            self.populate_next_slice()
+
+    def finish_population(self):
+        #Fill the remaining lists immediately, e.g. before refreshed data is merged
+        if not self.populations:
+            return
+
+        for stream_type, population in self.populations.items():
+            for _ in population:
+                pass
+
+        self.populations = {}
+
+        self.population_finished()
+
+    def stop_population(self):
+        self.population_timer.stop()
+        self.populations = {}
+
+        gc.enable()
+
+    def process_iptv_info(self, iptv_info):
+        #Process IPTV info
+        user_info   = iptv_info.get("user_info", {})
+        server_info = iptv_info.get("server_info", {})
+
+        hostname    = server_info.get("url", "Unknown")
+        port        = server_info.get("port", "Unknown")
+        if hostname == "Unknown" or port == "Unknown":
+            host = "Unknown"
+        else:
             host = f"http://{hostname}:{port}"
 
         username                = user_info.get("username", "Unknown")
@@ -1351,67 +2227,56 @@ class IPTVPlayerApp(QMainWindow):
 
         #Set formatted data to iptv info tab
         self.iptv_info_text.setText(formatted_data)
-        QtWidgets.qApp.processEvents()
 
-        #Process categories and entries
-        for stream_type in self.entries_per_stream_type.keys():
-            #Clear category and streaming list
-            self.category_list_widgets[stream_type].clear()
-            self.streaming_list_widgets[stream_type].clear()
+    def load_category_list(self, stream_type):
+        #Fill currently loaded categories with current category data
+        self.currently_loaded_categories[stream_type] = list(self.categories_per_stream_type[stream_type])
 
-            #Skip VODs if option enabled
-            if self.vods_enabled is False and (stream_type == 'Movies' or stream_type == 'Series'):
-                continue
+        #Show categories in category list with 'All' and 'Favorites' categories on top
+        self.category_list_widgets[stream_type].model().setEntries(self.currently_loaded_categories[stream_type], None, 'category_name', self.get_pinned_categories())
 
-            #Fill currently loaded streams with current stream data
-            for entry in self.entries_per_stream_type[stream_type]:
-                self.currently_loaded_streams[stream_type].append(entry)
-
-            #Fill currently loaded categories with current category data
-            for entry in self.categories_per_stream_type[stream_type]:
-                self.currently_loaded_categories[stream_type].append(entry)
-
-            #Add categories in category list
-            num_of_categories = len(self.categories_per_stream_type[stream_type])
-            prev_perc = 0
-            for idx, category_item in enumerate(self.categories_per_stream_type[stream_type]):
-                item = QListWidgetItem(category_item['category_name'])
-                item.setData(Qt.UserRole, category_item)
-                # item.setIcon(channel_icon)
-
-                #Add item to list
-                self.category_list_widgets[stream_type].addItem(item)
-
-                perc = (idx * 100) / num_of_categories
-                if (perc - prev_perc) > 10:
-                    prev_perc = perc
-                    self.set_progress_bar(int(perc), f"Loading {stream_type} categories: {idx} of {num_of_categories}")
-                    QtWidgets.qApp.processEvents()
-
-            #Sort category list
-            self.sortList(self.category_search_bars[stream_type], 'category', stream_type, self.category_list_widgets, self.sorting_enabled, self.sorting_order)
-
-            #Add streams in streaming list
-            num_of_entries = len(self.entries_per_stream_type[stream_type])
-            prev_perc = 0
-            for idx, entry in enumerate(self.entries_per_stream_type[stream_type]):
-                item = QListWidgetItem(entry['name'])
-                item.setData(Qt.UserRole, entry)
-                # item.setIcon(channel_icon)
-
-                self.streaming_list_widgets[stream_type].addItem(item)
-
-                perc = (idx * 100) / num_of_entries
-                if (perc - prev_perc) > 10:
-                    prev_perc = perc
-                    self.set_progress_bar(int(perc), f"Loading {stream_type} streams: {idx} of {num_of_entries}")
-                    QtWidgets.qApp.processEvents()
-
-            #Sort streaming list
-            self.sortList(self.streaming_search_bars[stream_type], 'streaming', stream_type, self.streaming_list_widgets, self.sorting_enabled, self.sorting_order)
-
-        self.set_progress_bar(100, f"Finished loading")
-        QtWidgets.qApp.processEvents()
+        #Sort category list
+        self.sortList(self.category_search_bars[stream_type], 'category', stream_type, self.category_list_widgets, self.sorting_enabled, self.sorting_order)
+
+    def load_streaming_list(self, stream_type, rows):
+        #Results of searches in the previous list are outdated
+        self.search_generations[stream_type] += 1
+
+        #Save rows of the shown entries for searching and going back
+        self.currently_loaded_streams[stream_type] = list(rows)
+
+        #Show entries in streaming list, the list refers to the entries by row
+        self.streaming_list_widgets[stream_type].model().setEntries(self.entries_per_stream_type[stream_type], self.currently_loaded_streams[stream_type],
+            sort_function=self.catalog_indexes[stream_type].sort_rows)
+
+        #Reset scrollbar position to top
+        self.streaming_list_widgets[stream_type].scrollToTop()
+
+        #Sort streaming list
+        self.sortList(self.streaming_search_bars[stream_type], 'streaming', stream_type, self.streaming_list_widgets, self.sorting_enabled, self.sorting_order)
+
+    def get_pinned_categories(self):
+        #'All' and 'Favorites' categories shown on top of the category lists
+        return [
+            (self.all_categories_text, {'category_name': self.all_categories_text}, None),
+            (self.fav_categories_text, {'category_name': self.fav_categories_text}, None)
+        ]
+
+    def get_category_rows(self, stream_type, category_data):
+        #No category selected or 'All' category selected, get all entries that are still available
+        if not category_data or category_data['category_name'] == self.all_categories_text:
+            return [row for row, entry in enumerate(self.entries_per_stream_type[stream_type]) if entry is not None]
+
+        #'Favorites' category selected, get favorites from the index
+        if category_data['category_name'] == self.fav_categories_text:
+            return self.catalog_indexes[stream_type].get_favorite_rows()
+
+        #Get rows of the category from the index
+        return self.catalog_indexes[stream_type].get_category_rows(category_data['category_id'])
+
+    def get_filtered_rows(self, stream_type, category_data):
+        #Rows of the category that have the selected facet values
+        return self.catalog_indexes[stream_type].filter_facets(self.get_category_rows(stream_type, category_data), self.selected_facets[stream_type])
 
     def on_fetch_data_error(self, error_msg):
         print(f"Error occurred while fetching data: {error_msg}")
@@ -1510,33 +2375,13 @@ class IPTVPlayerApp(QMainWindow):
 
         #Check if fetch request came from show_seasons()
         if is_show_request:
-            #Clear series list
-            self.streaming_list_widgets['Series'].clear()
-
-            #Reset scrollbar position to top
-            self.streaming_list_widgets['Series'].scrollToTop()
-
-            #Add go back item
-            go_back_item = QListWidgetItem(self.go_back_text)
-            go_back_item.setIcon(self.go_back_icon)
-            self.streaming_list_widgets['Series'].addItem(go_back_item)
-
-            #Save currently loaded series data for search funcitonality
-            self.currently_loaded_streams['Seasons'] = series_info_data['episodes']
-
-            #Go through each season in the series info data.
+            #Save currently loaded series data for search funcitonality.
             #Note that 'episodes' is called, as this is the name given in the data. 
             #When you look at the data you can see these are actually seasons.
-            for season in series_info_data['episodes'].keys():
-                #Create season item
-                item = QListWidgetItem(f"Season {season}")
-
-                #Set season data to item
-                item.setData(Qt.UserRole, series_info_data['episodes'][season])
-                # item.setIcon(channel_icon)
+            self.currently_loaded_streams['Seasons'] = series_info_data['episodes']
 
-                #Add season item to series list
-                self.streaming_list_widgets['Series'].addItem(item)
+            #Show seasons in series list
+            self.load_seasons_list(self.currently_loaded_streams['Seasons'])
 
             self.animate_progress(0, 100, "Loading finished")
 
@@ -1637,11 +2482,11 @@ class IPTVPlayerApp(QMainWindow):
 
     def favButtonPressed(self, stream_type, info_box):
         try:
-            #Get current selected item and stream id
-            current_sel_item = self.streaming_list_widgets[stream_type].currentItem()
+            #Get current selected row and stream id
+            current_sel_row = self.streaming_list_widgets[stream_type].currentIndex().row()
 
             #Check if an item is selected
-            if not current_sel_item:
+            if current_sel_row < 0:
                 #Otherwise return from function
                 return
 
@@ -1649,7 +2494,7 @@ class IPTVPlayerApp(QMainWindow):
             if self.series_navigation_level != 0 and stream_type == "Series":
                 return
 
-            data = current_sel_item.data(Qt.UserRole)
+            data = self.streaming_list_widgets[stream_type].model().entry(current_sel_row)
 
             #Check if item data is valid
             if not data:
@@ -1661,30 +2506,20 @@ class IPTVPlayerApp(QMainWindow):
             else:
                 stream_id = data.get('stream_id', -1)
 
-            is_fav = False
+            #Toggle favorite
+            is_fav = not data.get('favorite', False)
 
-            #loop through all streaming entries
-            for idx, entry in enumerate(self.entries_per_stream_type[stream_type]):
-                #Match to current data streaming id
-                if entry['stream_id' if not (stream_type == "Series") else 'series_id'] == stream_id:
-                    #Check if item is favorite
-                    is_fav = self.entries_per_stream_type[stream_type][idx].get('favorite', False)
-
-                    #toggle favorite
-                    is_fav = not is_fav
-
-                    #Set favorite parameter
-                    self.entries_per_stream_type[stream_type][idx]['favorite'] = is_fav
+            #Set favorite parameter of all entries with this stream id
+            for idx in self.catalog_indexes[stream_type].get_rows(stream_id):
+                self.entries_per_stream_type[stream_type][idx]['favorite'] = is_fav
+                self.catalog_indexes[stream_type].set_favorite(idx, is_fav)
 
             #Change fav button colour
             info_box.setFavorite(is_fav)
             
-            #Set favorite parameter
+            #Set favorite parameter, the list item refers to the entry itself
             data['favorite'] = is_fav
 
-            #Set data to currently selected item
-            current_sel_item.setData(Qt.UserRole, data)
-
             fav_data = {}
 
             #Read favorites data file
@@ -1698,17 +2533,14 @@ class IPTVPlayerApp(QMainWindow):
                 with open(self.favorites_file, 'r') as fav_file:
                     fav_data = json.load(fav_file)
 
+            fav_key = 'stream_ids' if not (stream_type == "Series") else 'series_ids'
+
+            #Add or remove stream id, keeping the order of the file
+            fav_ids = [fav_id for fav_id in fav_data.get(fav_key, []) if fav_id != stream_id]
             if is_fav:
-                #Check if stream ids exists in file
-                if fav_data.get('stream_ids' if not (stream_type == "Series") else 'series_ids', 0):
-                    fav_data['stream_ids' if not (stream_type == "Series") else 'series_ids'].append(stream_id)
-                else:
-                    # fav_data = {'stream_ids':[123]}
-                    fav_data['stream_ids' if not (stream_type == "Series") else 'series_ids'] = [stream_id]
-            else:
-                #Check if stream ids exists in file
-                if fav_data.get('stream_ids' if not (stream_type == "Series") else 'series_ids', 0):
-                    fav_data['stream_ids' if not (stream_type == "Series") else 'series_ids'].remove(stream_id)
+                fav_ids.append(stream_id)
+
+            fav_data[fav_key] = fav_ids
 
             # with open(self.favorites_file, 'w') as fav_file:
             with open(self.favorites_file, 'w') as fav_file:
@@ -1719,7 +2551,7 @@ class IPTVPlayerApp(QMainWindow):
 
             print(f"Failed adding to favorites: {e}")
 
-    def category_item_clicked(self, clicked_item):
+    def category_item_clicked(self, clicked_index):
         try:
             sender = self.sender()
             stream_type = {
@@ -1731,23 +2563,27 @@ class IPTVPlayerApp(QMainWindow):
             if not stream_type:
                 return
 
-            selected_item = sender.currentItem()
-            if not selected_item:
+            if not clicked_index.isValid():
                 return
 
+            category_model  = sender.model()
+            selected_row    = clicked_index.row()
+
             #Check if the item is already selected
-            if selected_item == self.prev_clicked_category_item[stream_type]:
+            if category_model.itemKey(selected_row) == self.prev_clicked_category_item[stream_type]:
                 return
 
             #Save to previous clicked
-            self.prev_clicked_category_item[stream_type] = selected_item
+            self.prev_clicked_category_item[stream_type] = category_model.itemKey(selected_row)
+
+            selected_item_data = category_model.entry(selected_row)
 
-            selected_item_text = selected_item.text()
-            selected_item_data = selected_item.data(Qt.UserRole)
+            #Skip items without category, e.g. 'No search results found...'
+            if not selected_item_data:
+                return
 
-            #Check if All and Favorites category are not selected
-            if (selected_item_text != self.all_categories_text and selected_item_text != self.fav_categories_text):
-                category_id = selected_item_data['category_id']
+            #Save selected category, so the list can be reloaded after refreshing the data
+            self.selected_category[stream_type] = selected_item_data
 
             self.set_progress_bar(0, "Loading items")
 
@@ -1755,47 +2591,14 @@ class IPTVPlayerApp(QMainWindow):
                 #Reset navigation level
                 self.series_navigation_level = 0
 
-            #Clear items in list
-            self.streaming_list_widgets[stream_type].clear()
-            self.currently_loaded_streams[stream_type].clear()
-
-            #Reset scrollbar position to top
-            self.streaming_list_widgets[stream_type].scrollToTop()
-
-            for entry in self.entries_per_stream_type[stream_type]:
-                # print(entry)
-                if selected_item_text == self.all_categories_text:
-                    item = QListWidgetItem(entry['name'])
-                    item.setData(Qt.UserRole, entry)
-
-                    self.currently_loaded_streams[stream_type].append(entry)
-                    self.streaming_list_widgets[stream_type].addItem(item)
-
-                elif selected_item_text == self.fav_categories_text:
-                    #Check if item is favorite
-                    if entry['favorite'] == True:
-                        item = QListWidgetItem(entry['name'])
-                        item.setData(Qt.UserRole, entry)
-
-                        self.currently_loaded_streams[stream_type].append(entry)
-                        self.streaming_list_widgets[stream_type].addItem(item)
-
-                elif entry['category_id'] == category_id:
-                    item = QListWidgetItem(entry['name'])
-                    item.setData(Qt.UserRole, entry)
-
-                    self.currently_loaded_streams[stream_type].append(entry)
-                    self.streaming_list_widgets[stream_type].addItem(item)
+            #Get rows of selected category that match the selected facets and load them in the list
+            rows = self.get_filtered_rows(stream_type, selected_item_data)
+            self.load_streaming_list(stream_type, rows)
 
             #Check if list is empty after process
-            if self.streaming_list_widgets[stream_type].count() == 0:
+            if self.streaming_list_widgets[stream_type].model().rowCount() == 0:
                 #Add list is empty text
-                item = QListWidgetItem("No items in list...")
-
-                self.streaming_list_widgets[stream_type].addItem(item)
-            else:
-                #Sort list
-                self.sortList(self.streaming_search_bars[stream_type], 'streaming', stream_type, self.streaming_list_widgets, self.sorting_enabled, self.sorting_order)
+                self.streaming_list_widgets[stream_type].model().setPinnedItems([("No items in list...", None, None)])
 
             self.animate_progress(0, 100, "Loading finished")
 
@@ -1818,7 +2621,7 @@ class IPTVPlayerApp(QMainWindow):
     def ProcessStreamStatus(self, stream_id, stream_status):
         try:
             #Ensure user hasn't changed live channel before request came through
-            last_clicked_item = self.prev_clicked_streaming_item.data(Qt.UserRole)
+            last_clicked_item = self.prev_clicked_streaming_entry
             if (stream_id != last_clicked_item['stream_id']):
                 return
 
@@ -1831,38 +2634,102 @@ class IPTVPlayerApp(QMainWindow):
         except Exception as e:
             print(f"Failed processing streaming status: {e}")
 
-    def startEPGWorker(self, stream_id):
-        #Create EPG thread worker that will fetch EPG data
-        epg_worker = EPGWorker(self.server, self.username, self.password, stream_id, self)
+    def load_epg(self, entry):
+        stream_id           = entry['stream_id']
+        self.epg_stream_id  = stream_id
+
+        #Use the downloaded EPG when it has programmes of this channel
+        if self.bulk_epg_enabled and self.epg_store:
+            try:
+                epg_data = self.epg_store.get_epg_listings(entry.get('epg_channel_id'), time.time())
+
+                if epg_data:
+                    self.ProcessEPGData(epg_data)
+                    return
+            except Exception as e:
+                print(f"Failed loading EPG from store: {e}")
+
+        #Show cached EPG of the channel right away, and only fetch it again when it is stale
+        cached = self.epg_cache.get(self.catalog_cache.cache_key(self.server, self.username), stream_id, self.epg_store)
+
+        if cached:
+            epg_data, is_stale = cached
+
+            self.ProcessEPGData(epg_data)
+
+            if is_stale:
+                self.startEPGWorker(stream_id, refresh=True)
+        else:
+            self.startEPGWorker(stream_id)
+
+    def startEPGWorker(self, stream_id, refresh=False):
+        #Create EPG thread worker that will fetch EPG data. The short EPG is only fetched first
+        #when nothing is shown yet, a refresh replaces the shown cached EPG at once.
+        epg_worker  = EPGWorker(self.server, self.username, self.password, stream_id, self, 0 if refresh else SHORT_EPG_LIMIT, self.epg_store)
+        account_key = self.catalog_cache.cache_key(self.server, self.username)
 
         #Connect functions to signals
-        epg_worker.signals.finished.connect(self.ProcessEPGData)
-        epg_worker.signals.error.connect(self.onEPGFetchError)
+        epg_worker.signals.short_finished.connect(lambda epg_data: self.on_short_epg_fetched(stream_id, epg_data))
+        epg_worker.signals.finished.connect(lambda epg_data, complete: self.on_epg_fetched(account_key, stream_id, epg_data, complete))
+        epg_worker.signals.error.connect(lambda error_msg: self.on_epg_fetch_error(stream_id, refresh, error_msg))
 
         #Start EPG thread
         self.threadpool.start(epg_worker)
 
+    def on_short_epg_fetched(self, stream_id, epg_data):
+        #Show the next programmes until the full EPG arrives, it isn't cached because it is incomplete
+        if stream_id == self.epg_stream_id:
+            self.ProcessEPGData(epg_data)
+
+    def on_epg_fetched(self, account_key, stream_id, epg_data, complete=True):
+        #Failed decrypting the EPG data
+        if epg_data is None:
+            self.on_epg_fetch_error(stream_id, False, "Invalid EPG data")
+            return
+
+        #Only the short EPG was fetched, show it without caching it, so the full EPG is fetched again next time
+        if not complete:
+            self.on_short_epg_fetched(stream_id, epg_data)
+            return
+
+        #The EPG of a previous account was already saved in the EPG store of that account by the worker
+        if account_key != self.catalog_cache.cache_key(self.server, self.username):
+            return
+
+        self.epg_cache.put(account_key, stream_id, epg_data)
+
+        #Show the fetched EPG in the now and next of the LIVE list
+        self.epg_index.set_programmes(('stream', str(stream_id)), [(int(epg_entry['start_time'].timestamp()), int(epg_entry['stop_time'].timestamp()),
+            epg_entry['program_name']) for epg_entry in epg_data], time.time())
+        self.update_now_next(clear=True)
+
+        #Only show the EPG when the channel is still selected
+        if stream_id == self.epg_stream_id:
+            self.ProcessEPGData(epg_data)
+
+    def on_epg_fetch_error(self, stream_id, refresh, error_msg):
+        #Keep showing the cached EPG when refreshing it failed
+        if refresh or stream_id != self.epg_stream_id:
+            print(f"Failed fetching EPG data: {error_msg}")
+            return
+
+        self.onEPGFetchError(error_msg)
+
     def onEPGFetchError(self, error_msg):
         print(f"Failed fetching EPG data: {error_msg}")
         self.set_progress_bar(100, "Failed loading EPG data")
 
         #Set list view
-        item = QTreeWidgetItem(["??-??-????", "??:??", "??:??", "Failed loading EPG data..."])
-        self.live_info_box.live_EPG_info.addTopLevelItem(item)
+        self.live_info_box.live_EPG_model.setMessage(["??-??-????", "??:??", "??:??", "Failed loading EPG data..."])
 
     def ProcessEPGData(self, epg_data):
         try:
-            #Clear EPG data
-            self.live_info_box.live_EPG_info.clear()
-
             # is_fav = self.streaming_list_live.currentItem().data(Qt.UserRole).get('favorite', False)
             # self.live_info_box.setFavorite(is_fav)
 
             #Check if EPG data is empty
             if not epg_data:
-                item = QTreeWidgetItem(["??-??-????", "??:??", "??:??", "No EPG Data Available..."])
-
-                self.live_info_box.live_EPG_info.addTopLevelItem(item)
+                self.live_info_box.live_EPG_model.setMessage(["??-??-????", "??:??", "??:??", "No EPG Data Available..."])
 
                 self.set_progress_bar(100, "No EPG data")
                 return
@@ -1870,43 +2737,9 @@ class IPTVPlayerApp(QMainWindow):
             #Get current time
             current_timestamp = time.mktime(datetime.now().timetuple())
 
-            items = []
-
-            #Loop through EPG data
-            for epg_entry in epg_data:
-                #Get EPG data
-                start_timestamp = epg_entry['start_time']
-                stop_timestamp  = epg_entry['stop_time']
-                program_name    = epg_entry['program_name']
-                description     = epg_entry['description']
-                date            = epg_entry['date']
-
-                #Convert timestamps to string in correct format
-                start_time = start_timestamp.strftime("%H:%M")
-                stop_time = stop_timestamp.strftime("%H:%M")
-
-                #Convert stop time to unix timebase so it can be used for calculating
-                unix_stop_time = time.mktime(stop_timestamp.timetuple())
-
-                #Compute time difference
-                time_diff = unix_stop_time - current_timestamp
-
-                if time_diff >= 0:
-                    #Create EPG item
-                    item    = QTreeWidgetItem([date, start_time, stop_time, program_name])
-                    label   = QLabel(description)
-                    label.setWordWrap(True)
-                    desc    = QTreeWidgetItem()
-                    item.addChild(desc)
-
-                    #Add label widget to description. This way it is word wrapped correctly
-                    self.live_info_box.live_EPG_info.setItemWidget(desc, 3, label)
-
-                    #Append item to list
-                    items.append(item)
-
-            #Add all items to EPG treeview
-            self.live_info_box.live_EPG_info.addTopLevelItems(items)
+            #Show programmes that didn't end yet. The model draws them, descriptions are decoded when expanded.
+            self.live_info_box.live_EPG_model.setListings(epg_entry for epg_entry in epg_data
+                if time.mktime(epg_entry['stop_time'].timetuple()) - current_timestamp >= 0)
 
             #Update progress bar
             self.set_progress_bar(100, "Loaded EPG data")
@@ -1914,29 +2747,35 @@ class IPTVPlayerApp(QMainWindow):
         except Exception as e:
             print(f"Failed processing EPG: {e}")
 
-    def streaming_item_clicked(self, clicked_item):
+    def streaming_item_clicked(self, clicked_index):
         try:
             # print("single clicked")
 
             #Check if clicked item is valid
-            if not clicked_item:
+            if not clicked_index.isValid():
                 return
 
+            streaming_model = self.sender().model()
+            clicked_row     = clicked_index.row()
+
             #Check if clicked item is already selected
-            if (clicked_item == self.prev_clicked_streaming_item):
+            if (streaming_model.itemKey(clicked_row) == self.prev_clicked_streaming_item):
                 return
 
             #Save to previous item
-            self.prev_clicked_streaming_item = clicked_item
+            self.prev_clicked_streaming_item = streaming_model.itemKey(clicked_row)
 
             #Get clicked item data
-            clicked_item_text = clicked_item.text()
-            clicked_item_data = clicked_item.data(Qt.UserRole)
+            clicked_item_text = streaming_model.text(clicked_row)
+            clicked_item_data = streaming_model.entry(clicked_row)
 
             #Check if item data is valid
             if not clicked_item_data:
                 return
 
+            #Save clicked entry, so late results of previous clicks can be ignored
+            self.prev_clicked_streaming_entry = clicked_item_data
+
             #Get if clicked item is favorite
             is_fav = clicked_item_data.get('favorite', False)
 
@@ -1947,7 +2786,7 @@ class IPTVPlayerApp(QMainWindow):
                 stream_type = ''
 
             #Skip when back button or already loaded series info
-            if clicked_item.text() == self.go_back_text or ('series' in stream_type and self.series_navigation_level > 0):
+            if clicked_item_text == self.go_back_text or ('series' in stream_type and self.series_navigation_level > 0):
                 return
 
             #Show EPG data if live tv clicked
@@ -1964,9 +2803,7 @@ class IPTVPlayerApp(QMainWindow):
                 self.live_info_box.stream_status.setPixmap(QPixmap(self.path_to_unknown_status_icon).scaledToWidth(25))
 
                 #Clear EPG data
-                self.live_info_box.live_EPG_info.clear()
-                item = QTreeWidgetItem(["...", "...", "...", "Loading EPG Data..."])
-                self.live_info_box.live_EPG_info.addTopLevelItem(item)
+                self.live_info_box.live_EPG_model.setMessage(["...", "...", "...", "Loading EPG Data..."])
 
                 #Fetch cover image
                 self.fetch_image(clicked_item_data['stream_icon'], 'Live')
@@ -1974,8 +2811,8 @@ class IPTVPlayerApp(QMainWindow):
                 # Fetch stream status
                 self.startOnlineWorker(clicked_item_data['stream_id'], clicked_item_data['url'])
 
-                #Fetch EPG data
-                self.startEPGWorker(clicked_item_data['stream_id'])
+                #Load EPG data
+                self.load_epg(clicked_item_data)
 
             #Show movie info if movie clicked
             elif 'movie' in stream_type:
@@ -2048,17 +2885,21 @@ class IPTVPlayerApp(QMainWindow):
         except Exception as e:
             print(f"Failed item single click: {e}")
 
-    def streaming_item_double_clicked(self, clicked_item):
+    def streaming_item_double_clicked(self, clicked_index):
         try:
             # print("Double clicked")
 
             #Check if clicked item is valid
-            if not clicked_item:
+            if not clicked_index.isValid():
                 return
 
+            streaming_model = self.sender().model()
+            clicked_row     = clicked_index.row()
+            clicked_item    = streaming_model.itemKey(clicked_row)
+
             #Get clicked item data
-            clicked_item_text = clicked_item.text()
-            clicked_item_data = clicked_item.data(Qt.UserRole)
+            clicked_item_text = streaming_model.text(clicked_row)
+            clicked_item_data = streaming_model.entry(clicked_row)
 
             #Check if item data is valid and not go back item
             if not clicked_item_data and clicked_item_text != self.go_back_text:
@@ -2099,7 +2940,7 @@ class IPTVPlayerApp(QMainWindow):
                         
                     else:
                         self.series_navigation_level = 2
-                        self.show_episodes(clicked_item_data)
+                        self.show_episodes(clicked_item_data['episodes'])
 
                 case 2: #Series episodes
                     if clicked_item_text == self.go_back_text:
@@ -2116,32 +2957,23 @@ class IPTVPlayerApp(QMainWindow):
     def go_back_to_level(self, series_navigation_level):
         self.set_progress_bar(0, "Loading items")
 
-        #Clear series list widget
-        self.streaming_list_widgets['Series'].clear()
-
-        #Reset scrollbar position to top
-        self.streaming_list_widgets['Series'].scrollToTop()
-
         if series_navigation_level == 0:    #From seasons back to series list
-            for entry in self.currently_loaded_streams['Series']:
-                item = QListWidgetItem(entry['name'])
-                item.setData(Qt.UserRole, entry)
-
-                self.streaming_list_widgets['Series'].addItem(item)
+            self.load_streaming_list('Series', self.currently_loaded_streams['Series'])
 
         elif series_navigation_level == 1:  #From episodes back to seasons list
-            #Add go back item
-            go_back_item = QListWidgetItem(self.go_back_text)
-            go_back_item.setIcon(self.go_back_icon)
-            self.streaming_list_widgets['Series'].addItem(go_back_item)
+            self.load_seasons_list(self.currently_loaded_streams['Seasons'])
 
-            for season in self.currently_loaded_streams['Seasons'].keys():
-                item = QListWidgetItem(f"Season {season}")
-                item.setData(Qt.UserRole, self.currently_loaded_streams['Seasons'][season])
+        self.animate_progress(0, 100, "Loading finished")
 
-                self.streaming_list_widgets['Series'].addItem(item)
+    def load_seasons_list(self, seasons, search_text=""):
+        #Create a season entry for each season that matches the search text
+        season_entries = [{'name': f"Season {season}", 'episodes': episodes} for season, episodes in seasons.items() if search_text in f"season {season}"]
 
-        self.animate_progress(0, 100, "Loading finished")
+        #Show seasons with go back item on top
+        self.streaming_list_widgets['Series'].model().setEntries(season_entries, None, 'name', [(self.go_back_text, None, self.go_back_icon)])
+
+        #Reset scrollbar position to top
+        self.streaming_list_widgets['Series'].scrollToTop()
 
     def show_seasons(self, seasons_data):
         self.set_progress_bar(0, "Loading items")
@@ -2152,25 +2984,11 @@ class IPTVPlayerApp(QMainWindow):
     def show_episodes(self, episodes_data):
         self.set_progress_bar(0, "Loading items")
 
-        #Clear series list
-        self.streaming_list_widgets['Series'].clear()
-
-        #Reset scrollbar position to top
-        self.streaming_list_widgets['Series'].scrollToTop()
-
-        #Add go back item
-        go_back_item = QListWidgetItem(self.go_back_text)
-        go_back_item.setIcon(self.go_back_icon)
-        self.streaming_list_widgets['Series'].addItem(go_back_item)
-
         #Clear episodes list so it can be filled again
-        self.currently_loaded_streams['Episodes'].clear()
+        self.currently_loaded_streams['Episodes'] = []
 
-        #Show episodes in list
+        #Prepare episodes for the list
         for episode in episodes_data:
-            #Create episode item
-            item = QListWidgetItem(f"{episode['title']}")
-
             #Make playable url
             container_extension = episode['container_extension']
             episode_id          = episode['id']
@@ -2195,14 +3013,14 @@ class IPTVPlayerApp(QMainWindow):
             #Add new 'url' key to episode data
             episode['url'] = playable_url
 
-            #Set data to the episode item
-            item.setData(Qt.UserRole, episode)
-
             #Append episode data to the currently loaded list for search functionality
             self.currently_loaded_streams['Episodes'].append(episode)
 
-            #Add episode item to series list
-            self.streaming_list_widgets['Series'].addItem(item)
+        #Show episodes with go back item on top
+        self.streaming_list_widgets['Series'].model().setEntries(self.currently_loaded_streams['Episodes'], None, 'title', [(self.go_back_text, None, self.go_back_icon)])
+
+        #Reset scrollbar position to top
+        self.streaming_list_widgets['Series'].scrollToTop()
 
         self.animate_progress(0, 100, "Loading finished")
 
@@ -2309,6 +3127,9 @@ class IPTVPlayerApp(QMainWindow):
                 
                 history_list_idx[0] = 0
 
+                #Search right away instead of waiting for the search while typing
+                self.search_timers[search_bar].stop()
+
                 if text:
                     history_list.insert(0, text)
 
@@ -2366,6 +3187,75 @@ class IPTVPlayerApp(QMainWindow):
                 search_bar.insert(e.text())
                 # e.accept()
 
+    def start_streaming_search(self, stream_type, text):
+        loaded_rows = self.currently_loaded_streams[stream_type]
+        index       = self.catalog_indexes[stream_type]
+        folded_text = index.get_search_key(text)
+
+        #Results of older searches are ignored
+        self.search_generations[stream_type] += 1
+
+        #Previous search in the same loaded list
+        last_search = self.last_streaming_searches.get(stream_type)
+        narrow_rows = None
+
+        if last_search and last_search[0] is loaded_rows and last_search[1] in folded_text and \
+            (len(last_search[2]) <= MAX_NARROW_SEARCH_ROWS or len(folded_text) < TRIGRAM_LENGTH - 1):
+            #Text contains the previous text, so only the previous results can match
+            narrow_rows = last_search[2]
+
+        #No loaded rows means all rows are loaded, so the found rows don't have to be filtered
+        search_worker = SearchWorker(self.search_generations[stream_type], stream_type, index.get_search_snapshot(),
+            None if len(loaded_rows) == index.num_of_rows else loaded_rows, text, narrow_rows)
+
+        search_worker.signals.finished.connect(self.show_search_result)
+        search_worker.signals.error.connect(self.on_search_error)
+
+        #Drop searches that didn't start yet, they are outdated
+        self.search_threadpool.clear()
+        self.search_threadpool.start(search_worker)
+
+    def show_search_result(self, generation, stream_type, folded_text, rows):
+        #Ignore results of outdated searches, or when the list has been reloaded in the meantime
+        if generation != self.search_generations[stream_type]:
+            return
+
+        #Ignore results when navigated into a series
+        if stream_type == 'Series' and self.series_navigation_level != 0:
+            return
+
+        try:
+            entries         = self.entries_per_stream_type[stream_type]
+            index           = self.catalog_indexes[stream_type]
+            streaming_model = self.streaming_list_widgets[stream_type].model()
+
+            #Save search, so the results can be narrowed down by the next search
+            self.last_streaming_searches[stream_type] = (self.currently_loaded_streams[stream_type], folded_text, rows)
+
+            #When sorting is enabled, pick the sort order from the sort permutations
+            sorted_rows = index.sort_rows(rows, self.sorting_order) if self.sorting_enabled else rows
+
+            #Update the shown rows in place when the list already shows these entries
+            if streaming_model.entries is entries and not streaming_model.pinned_items:
+                streaming_model.updateRows(rows, sorted_rows)
+            else:
+                streaming_model.setEntries(entries, rows, sort_function=index.sort_rows)
+
+                if self.sorting_enabled:
+                    streaming_model.sortRows(self.sorting_order)
+
+            #Check if no search results found
+            if not streaming_model.entryCount():
+                streaming_model.setPinnedItems([("No search results found...", None, None)])
+
+            self.set_progress_bar(100, "Loaded search results")
+        except Exception as e:
+            print(f"showing search results failed: {e}")
+
+    def on_search_error(self, generation, stream_type, error_msg):
+        if generation == self.search_generations[stream_type]:
+            self.animate_progress(0, 100, "Search failed")
+
     def search_in_list(self, list_content_type, stream_type, text):
         try:
             self.set_progress_bar(0, f"Loading search results...")
@@ -2376,40 +3266,24 @@ class IPTVPlayerApp(QMainWindow):
                 if not self.currently_loaded_categories[stream_type]:
                     return
 
-                #Enable or disable sorting
-                self.category_list_widgets[stream_type].setSortingEnabled(self.sorting_enabled)
-
-                #When sorting is enabled, set sort order, 0: A-Z, 1: Z-A
-                if self.sorting_enabled:
-                    self.category_list_widgets[stream_type].sortItems(self.sorting_order)
+                category_model = self.category_list_widgets[stream_type].model()
 
-                self.category_list_widgets[stream_type].clear()
+                #Get categories that match the search text
+                search_text = fold_text(text)
+                rows        = [row for row, entry in enumerate(self.currently_loaded_categories[stream_type]) if search_text in fold_text(entry.get('category_name', ''))]
 
-                for entry in self.currently_loaded_categories[stream_type]:
-                    if text.lower() in entry.get('category_name', '').lower():
-                        item = QListWidgetItem(entry['category_name'])
-                        item.setData(Qt.UserRole, entry)
+                #if search bar is empty, add 'All' and 'Favorites' categories to top
+                pinned_items = self.get_pinned_categories() if not text else []
 
-                        self.category_list_widgets[stream_type].addItem(item)
+                category_model.setEntries(self.currently_loaded_categories[stream_type], rows, 'category_name', pinned_items)
 
-                #Disable sorting
-                self.category_list_widgets[stream_type].setSortingEnabled(False)
-
-                #if search bar is empty
-                if not text:
-                    # Add 'All' and 'Favorites' categories to top
-                    itemAll = QListWidgetItem(self.all_categories_text)
-                    itemAll.setData(Qt.UserRole, {'category_name': self.all_categories_text})
-                    self.category_list_widgets[stream_type].insertItem(0, itemAll)
-
-                    itemFav = QListWidgetItem(self.fav_categories_text)
-                    itemFav.setData(Qt.UserRole, {'category_name': self.fav_categories_text})
-                    self.category_list_widgets[stream_type].insertItem(1, itemFav)
+                #When sorting is enabled, set sort order, 0: A-Z, 1: Z-A
+                if self.sorting_enabled:
+                    category_model.sortRows(self.sorting_order)
 
                 #Check if no search results found
-                num_of_items = self.category_list_widgets[stream_type].count()
-                if not num_of_items:
-                    self.category_list_widgets[stream_type].addItem("No search results found...")
+                if not category_model.rowCount():
+                    category_model.setPinnedItems([("No search results found...", None, None)])
 
             #If searching in streaming content list
             elif list_content_type == 'streaming':
@@ -2417,51 +3291,147 @@ class IPTVPlayerApp(QMainWindow):
                 if not self.currently_loaded_streams[stream_type]:
                     return
 
-                #Enable or disable sorting
-                self.streaming_list_widgets[stream_type].setSortingEnabled(self.sorting_enabled)
-
-                #When sorting is enabled, set sort order, 0: A-Z, 1: Z-A
-                if self.sorting_enabled:
-                    self.streaming_list_widgets[stream_type].sortItems(self.sorting_order)
-
-                self.streaming_list_widgets[stream_type].clear()
+                streaming_model = self.streaming_list_widgets[stream_type].model()
 
                 match self.series_navigation_level:
                     case 0: #LIVE/VOD/Series
-                        for entry in self.currently_loaded_streams[stream_type]:
-                            if text.lower() in entry['name'].lower():
-                                item = QListWidgetItem(entry['name'])
-                                item.setData(Qt.UserRole, entry)
+                        #Search in a worker thread, the result is shown by show_search_result
+                        self.start_streaming_search(stream_type, text)
+                        return
 
-                                self.streaming_list_widgets[stream_type].addItem(item)
                     case 1: #Seasons
-                        self.streaming_list_widgets[stream_type].addItem(self.go_back_text)
+                        self.load_seasons_list(self.currently_loaded_streams['Seasons'], fold_text(text))
 
-                        for season in self.currently_loaded_streams['Seasons'].keys():
-                            if text.lower() in f"season {season}":
-                                item = QListWidgetItem(f"Season {season}")
-                                item.setData(Qt.UserRole, self.currently_loaded_streams['Seasons'][season])
+                        if self.sorting_enabled:
+                            streaming_model.sortRows(self.sorting_order)
 
-                                self.streaming_list_widgets[stream_type].addItem(item)
                     case 2: #Episodes
-                        self.streaming_list_widgets[stream_type].addItem(self.go_back_text)
+                        episodes    = self.currently_loaded_streams['Episodes']
+                        search_text = fold_text(text)
+                        rows        = [row for row, episode in enumerate(episodes) if search_text in fold_text(episode['title'])]
 
-                        for episode in self.currently_loaded_streams['Episodes']:
-                            if text.lower() in episode['title'].lower():
-                                item = QListWidgetItem(episode['title'])
-                                item.setData(Qt.UserRole, episode)
+                        streaming_model.setEntries(episodes, rows, 'title', [(self.go_back_text, None, self.go_back_icon)])
 
-                                self.streaming_list_widgets[stream_type].addItem(item)
+                        if self.sorting_enabled:
+                            streaming_model.sortRows(self.sorting_order)
 
                 #Check if no search results found
-                num_of_items = self.streaming_list_widgets[stream_type].count()
-                if not (num_of_items - (self.series_navigation_level > 0)):
-                    self.streaming_list_widgets[stream_type].addItem("No search results found...")
+                if not streaming_model.entryCount():
+                    streaming_model.setPinnedItems(streaming_model.pinned_items + [("No search results found...", None, None)])
 
             self.set_progress_bar(100, f"Loaded search results")
         except Exception as e:
             print(f"search in list failed: {e}")
 
+    def start_global_search(self, text):
+        #Results of older searches are ignored
+        self.global_search_generation += 1
+        self.global_search_results = []
+        self.global_search_timer.stop()
+
+        search_model = self.global_search_list.model()
+
+        if not text:
+            search_model.clear()
+            return
+
+        self.set_progress_bar(0, "Loading search results...")
+
+        #Loaded episodes are searched as well, keep the list the found rows refer to
+        self.global_search_episodes = list(self.currently_loaded_streams['Episodes'])
+
+        #Search all stream types with their search index snapshots in a single worker
+        search_indexes = {stream_type: index.get_search_snapshot() for stream_type, index in self.catalog_indexes.items()}
+        search_worker = GlobalSearchWorker(self.global_search_generation, search_indexes,
+            [episode.get('title', '') for episode in self.global_search_episodes], text, MAX_GLOBAL_SEARCH_RESULTS)
+
+        search_worker.signals.results.connect(self.show_global_search_results)
+        search_worker.signals.finished.connect(self.finish_global_search)
+        search_worker.signals.error.connect(self.on_global_search_error)
+
+        #Drop searches that didn't start yet, they are outdated
+        self.global_search_threadpool.clear()
+        self.global_search_threadpool.start(search_worker)
+
+    def show_global_search_results(self, generation, stream_type, ranked_rows):
+        #Ignore results of outdated searches
+        if generation != self.global_search_generation:
+            return
+
+        try:
+            if stream_type == 'Episodes':
+                entries     = self.global_search_episodes
+                text_key    = 'title'
+            else:
+                entries     = self.entries_per_stream_type[stream_type]
+                text_key    = 'name'
+
+            #Results of the same rank are shown in tab order
+            stream_type_order = list(self.catalog_indexes).index(stream_type) if stream_type in self.catalog_indexes else len(self.catalog_indexes)
+
+            for match_rank, name_length, row in ranked_rows:
+                #Skip entries removed by a refresh
+                if row >= len(entries) or entries[row] is None:
+                    continue
+
+                self.global_search_results.append({
+                    'name': entries[row].get(text_key, ''),
+                    'result_type': stream_type,
+                    'entry': entries[row],
+                    'rank': (match_rank, name_length, stream_type_order, row)
+                })
+
+            #Show prefix matches first, then word matches, then the other matches
+            self.global_search_results.sort(key=lambda result: result['rank'])
+            self.global_search_list.model().setEntries(self.global_search_results)
+        except Exception as e:
+            print(f"showing global search results failed: {e}")
+
+    def finish_global_search(self, generation, folded_text):
+        if generation != self.global_search_generation:
+            return
+
+        search_model = self.global_search_list.model()
+
+        #Check if no search results found
+        if not search_model.entryCount():
+            search_model.setPinnedItems([("No search results found...", None, None)])
+
+        self.set_progress_bar(100, "Loaded search results")
+
+    def on_global_search_error(self, generation, error_msg):
+        if generation == self.global_search_generation:
+            self.animate_progress(0, 100, "Search failed")
+
+    def global_search_item_double_clicked(self, clicked_index):
+        try:
+            #Check if clicked item is valid
+            if not clicked_index.isValid():
+                return
+
+            result = self.global_search_list.model().entry(clicked_index.row())
+
+            #Check if item is a search result and not the no results item
+            if not result:
+                return
+
+            entry = result['entry']
+
+            if result['result_type'] == 'Series':
+                #Open the seasons of the series in the Series tab
+                self.tab_widget.setCurrentIndex(self.tab_widget.indexOf(self.series_tab_layout.parentWidget()))
+
+                self.prev_double_clicked_streaming_item = 0
+                self.series_navigation_level            = 1
+                self.show_seasons(entry)
+
+            else:
+                #LIVE channels, movies and episodes are played right away
+                self.play_item(entry['url'])
+
+        except Exception as e:
+            print(f"failed global search item double click: {e}")
+
     def load_external_player_command(self):
         external_player_command = ""
 
@@ -0,0 +1,147 @@
+import re
+import json
+
+#Stream types of which the categories can be hidden
+STREAM_TYPES = ('LIVE', 'Movies', 'Series')
+
+def compile_pattern(pattern):
+    #Empty patterns don't filter, invalid patterns are ignored
+    if not pattern:
+        return None
+
+    try:
+        return re.compile(pattern, re.IGNORECASE)
+    except re.error as e:
+        print(f"Invalid filter pattern '{pattern}': {e}")
+        return None
+
+def get_config_section(server, username):
+    #Filter rules are saved per account
+    return f"Ingest filter {username}@{server}"
+
+class IngestFilter:
+    def __init__(self, include_names="", exclude_names="", exclude_categories="", hidden_categories=None, exclude_adult=False):
+        #Regular expressions as entered by the user, matched case insensitive
+        self.include_names      = include_names
+        self.exclude_names      = exclude_names
+        self.exclude_categories = exclude_categories
+
+        #Names of the hidden categories per stream type
+        self.hidden_categories  = {stream_type: set((hidden_categories or {}).get(stream_type, ())) for stream_type in STREAM_TYPES}
+        self.exclude_adult      = exclude_adult
+
+        self.include_names_pattern      = compile_pattern(include_names)
+        self.exclude_names_pattern      = compile_pattern(exclude_names)
+        self.exclude_categories_pattern = compile_pattern(exclude_categories)
+
+    def is_empty(self):
+        return not (self.include_names_pattern or self.exclude_names_pattern or self.exclude_categories_pattern or
+            self.exclude_adult or any(self.hidden_categories.values()))
+
+    def has_entry_rules(self):
+        #Rules that only need the entry itself, so they can be applied while the entries are downloading
+        return bool(self.include_names_pattern or self.exclude_names_pattern or self.exclude_adult)
+
+    def accepts_entry(self, entry):
+        name = str(entry.get('name', ''))
+
+        if self.include_names_pattern and not self.include_names_pattern.search(name):
+            return False
+
+        if self.exclude_names_pattern and self.exclude_names_pattern.search(name):
+            return False
+
+        if self.exclude_adult and str(entry.get('is_adult', 0)).lower() in ('1', 'true'):
+            return False
+
+        return True
+
+    def get_hidden_category_ids(self, stream_type, categories):
+        #Ids of the categories hidden by name or by the category pattern
+        hidden_names = self.hidden_categories.get(stream_type, set())
+
+        return {str(category.get('category_id')) for category in categories
+            if category.get('category_name', '') in hidden_names or
+            (self.exclude_categories_pattern and self.exclude_categories_pattern.search(category.get('category_name', '')))}
+
+    def filter_categories(self, categories, hidden_category_ids):
+        if not hidden_category_ids:
+            return categories
+
+        return [category for category in categories if str(category.get('category_id')) not in hidden_category_ids]
+
+    def filter_entries(self, entries, hidden_category_ids, check_entries=True):
+        #Leave out entries of which all categories are hidden, and entries not accepted by the entry rules.
+        #Entries checked while downloading don't have to be checked again.
+        check_entries = check_entries and self.has_entry_rules()
+
+        if not hidden_category_ids and not check_entries:
+            return entries
+
+        return [entry for entry in entries
+            if (not check_entries or self.accepts_entry(entry)) and not self.is_in_hidden_categories(entry, hidden_category_ids)]
+
+    def is_in_hidden_categories(self, entry, hidden_category_ids):
+        if not hidden_category_ids:
+            return False
+
+        category_ids = set()
+
+        if entry.get('category_id') is not None:
+            category_ids.add(str(entry['category_id']))
+
+        if isinstance(entry.get('category_ids'), list):
+            category_ids.update(str(category_id) for category_id in entry['category_ids'] if category_id is not None)
+
+        return bool(category_ids) and category_ids <= hidden_category_ids
+
+    def filter_data(self, categories_per_stream_type, entries_per_stream_type, checked_stream_types=()):
+        #Apply all rules to the categories and entries of each stream type
+        for stream_type in entries_per_stream_type.keys():
+            hidden_category_ids = self.get_hidden_category_ids(stream_type, categories_per_stream_type.get(stream_type, []))
+
+            categories_per_stream_type[stream_type] = self.filter_categories(categories_per_stream_type.get(stream_type, []), hidden_category_ids)
+            entries_per_stream_type[stream_type]    = self.filter_entries(entries_per_stream_type[stream_type], hidden_category_ids,
+                stream_type not in checked_stream_types)
+
+    @staticmethod
+    def from_config(config, server, username):
+        section = get_config_section(server, username)
+
+        if section not in config:
+            return IngestFilter()
+
+        rules = config[section]
+
+        hidden_categories = {}
+        for stream_type in STREAM_TYPES:
+            try:
+                hidden_categories[stream_type] = json.loads(rules.get(f"hidden_{stream_type.lower()}_categories", "[]"))
+            except Exception as e:
+                print(f"Failed loading hidden {stream_type} categories: {e}")
+
+        return IngestFilter(
+            rules.get('include_names', ''),
+            rules.get('exclude_names', ''),
+            rules.get('exclude_categories', ''),
+            hidden_categories,
+            rules.get('exclude_adult', 'False') == 'True'
+        )
+
+    def save_config(self, config, server, username):
+        section = get_config_section(server, username)
+
+        if self.is_empty():
+            config.remove_section(section)
+            return
+
+        #Escape '%', because config values are interpolated
+        config[section] = {
+            'include_names': self.include_names.replace('%', '%%'),
+            'exclude_names': self.exclude_names.replace('%', '%%'),
+            'exclude_categories': self.exclude_categories.replace('%', '%%'),
+            'exclude_adult': str(self.exclude_adult)
+        }
+
+        for stream_type in STREAM_TYPES:
+            config[section][f"hidden_{stream_type.lower()}_categories"] = json.dumps(sorted(self.hidden_categories[stream_type])).replace('%', '%%')
@@ -0,0 +1,203 @@
+import re
+import unicodedata
+from array import array
+from bisect import bisect_left, insort
+from heapq import nsmallest
+
+#Number of characters per n-gram in the index
+TRIGRAM_LENGTH = 3
+
+#Posting lists are arrays of unsigned ints, which take less memory than lists of ints
+POSTING_TYPECODE = 'I'
+
+#Provider prefixes in front of names, e.g. 'UK |', 'NL|' and 'BE-VIP|'. Prefixes start with a country or language
+#code and end with '|', a '-' is part of many titles like '300 - Rise of an Empire' and 'CNN - International'.
+PROVIDER_PREFIX_PATTERN = re.compile(r'^\s*([A-Z]{2,3}(?:[ -][A-Z0-9]{2,4})?)\s*\|\s*')
+
+#Match ranks of search results, lower ranks are shown first
+MATCH_PREFIX    = 0
+MATCH_WORD      = 1
+MATCH_SUBSTRING = 2
+
+def fold_text(text, strip_prefix=False):
+    #Search key of a name or search text. Searching is case and accent insensitive.
+    text = str(text)
+
+    if strip_prefix:
+        text = PROVIDER_PREFIX_PATTERN.sub('', text, count=1)
+
+    text = text.casefold()
+
+    #Most names are plain ASCII and don't need to be normalized
+    if text.isascii():
+        return text
+
+    #Split characters into base characters and accents, then drop the accents. NFKD also turns
+    #compatibility characters like full width letters and ligatures into plain letters, which can be upper case.
+    text = unicodedata.normalize('NFKD', text)
+
+    return ''.join(char for char in text if not unicodedata.combining(char)).casefold()
+
+def get_trigrams(folded_text):
+    return {folded_text[i:i + TRIGRAM_LENGTH] for i in range(len(folded_text) - TRIGRAM_LENGTH + 1)}
+
+def contains_row(posting, row):
+    #Posting lists are sorted, so rows can be found with a binary search
+    i = bisect_left(posting, row)
+
+    return i < len(posting) and posting[i] == row
+
+def intersect_rows(found_rows, rows):
+    #Both row lists are sorted, look up the rows of the larger list in a set of the smaller one
+    if len(found_rows) < len(rows):
+        found_rows_set = set(found_rows)
+        return [row for row in rows if row in found_rows_set]
+
+    rows_set = set(rows)
+    return [row for row in found_rows if row in rows_set]
+
+def get_match_rank(folded_name, folded_text):
+    #Names starting with the text come first, then names with a word starting with the text
+    if folded_name.startswith(folded_text):
+        return MATCH_PREFIX
+
+    i = folded_name.find(folded_text)
+    while i > 0:
+        if not folded_name[i - 1].isalnum():
+            return MATCH_WORD
+
+        i = folded_name.find(folded_text, i + 1)
+
+    return MATCH_SUBSTRING
+
+def rank_rows(names, rows, folded_text, max_results):
+    #Returns the best (match rank, name length, row) of the found rows, shorter names are closer matches
+    return nsmallest(max_results, ((get_match_rank(names[row], folded_text), len(names[row]), row) for row in rows))
+
+class TrigramIndex:
+    def __init__(self, strip_prefixes=False):
+        #Whether provider prefixes are removed from names and search texts
+        self.strip_prefixes = strip_prefixes
+
+        #Search key of the name per row, None for rows that are not indexed
+        self.names      = []
+
+        #Sorted rows per trigram of the folded names
+        self.postings   = {}
+
+        #Trigrams starting or ending with each bigram, used for searching texts of two characters
+        self.trigrams_per_bigram = {}
+
+        #Rows of names shorter than a trigram, these are not in any posting list
+        self.short_rows = set()
+
+    def copy(self):
+        search_index = TrigramIndex(self.strip_prefixes)
+
+        search_index.names                  = list(self.names)
+        search_index.postings               = {trigram: posting[:] for trigram, posting in self.postings.items()}
+        search_index.trigrams_per_bigram    = {bigram: set(trigrams) for bigram, trigrams in self.trigrams_per_bigram.items()}
+        search_index.short_rows             = set(self.short_rows)
+
+        return search_index
+
+    def get_key(self, text):
+        return fold_text(text, self.strip_prefixes)
+
+    def add(self, row, name):
+        if row >= len(self.names):
+            self.names.extend([None] * (row + 1 - len(self.names)))
+
+        folded_name     = self.get_key(name)
+        self.names[row] = folded_name
+
+        if len(folded_name) < TRIGRAM_LENGTH:
+            self.short_rows.add(row)
+
+        postings = self.postings
+        for trigram in get_trigrams(folded_name):
+            posting = postings.get(trigram)
+
+            #Rows are mostly added in order, only changed rows of a refresh need to be inserted
+            if posting is None:
+                postings[trigram] = array(POSTING_TYPECODE, (row,))
+
+                self.trigrams_per_bigram.setdefault(trigram[:-1], set()).add(trigram)
+                self.trigrams_per_bigram.setdefault(trigram[1:], set()).add(trigram)
+            elif posting[-1] < row:
+                posting.append(row)
+            elif not contains_row(posting, row):
+                insort(posting, row)
+
+    def remove(self, row):
+        if row >= len(self.names) or self.names[row] is None:
+            return
+
+        for trigram in get_trigrams(self.names[row]):
+            posting = self.postings.get(trigram)
+
+            if posting and contains_row(posting, row):
+                del posting[bisect_left(posting, row)]
+
+                if not posting:
+                    del self.postings[trigram]
+
+                    for bigram in (trigram[:-1], trigram[1:]):
+                        trigrams = self.trigrams_per_bigram.get(bigram)
+
+                        if trigrams is not None:
+                            trigrams.discard(trigram)
+
+                            if not trigrams:
+                                del self.trigrams_per_bigram[bigram]
+
+        self.short_rows.discard(row)
+        self.names[row] = None
+
+    def filter(self, rows, text):
+        #Get the rows of which the name contains the text, by checking the names of the given rows only
+        text    = self.get_key(text)
+        names   = self.names
+
+        return [row for row in rows if text in names[row]]
+
+    def search(self, text):
+        #Returns the sorted rows of which the name contains the text
+        text = self.get_key(text)
+
+        #Single characters match most names, so all names are checked
+        if len(text) < TRIGRAM_LENGTH - 1:
+            return [row for row, name in enumerate(self.names) if name is not None and text in name]
+
+        if len(text) == TRIGRAM_LENGTH - 1:
+            return self.search_bigram(text)
+
+        postings = []
+        for trigram in get_trigrams(text):
+            posting = self.postings.get(trigram)
+
+            #No name contains this trigram
+            if not posting:
+                return []
+
+            postings.append(posting)
+
+        #Only a single trigram, its posting list is the result
+        if len(postings) == 1:
+            return list(postings[0])
+
+        #Check the names of the smallest posting list. Names with all trigrams of the text don't always contain
+        #the text itself, and checking a name is faster than intersecting it with the other posting lists.
+        names = self.names
+        return [row for row in min(postings, key=len) if text in names[row]]
+
+    def search_bigram(self, text):
+        #Names containing a text of two characters have a trigram starting or ending with it, or are shorter than a trigram
+        postings    = [self.postings[trigram] for trigram in self.trigrams_per_bigram.get(text, ())]
+        names       = self.names
+        short_rows  = [row for row in self.short_rows if text in names[row]]
+
+        if len(postings) == 1 and not short_rows:
+            return list(postings[0])
+
+        return sorted(set(short_rows).union(*postings))
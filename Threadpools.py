@@ -2,12 +2,16 @@ import sys
 import os
 from os import path
 import time
+import threading
 import requests
+from requests.adapters import HTTPAdapter
 import subprocess
 import configparser
 import re
 import json
+import codecs
 import html
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from lxml import etree, html
 from datetime import datetime
 from dateutil import parser, tz
@@ -28,6 +32,10 @@ from PyQt5.QtWidgets import (
 
 import base64
 
+from SearchIndex import fold_text, intersect_rows, rank_rows
+from CatalogIndex import build_search_index
+from EPGStore import iter_xmltv_programmes, get_epg_expiry
+
 CONNECTION_HEADER           = "Keep-Alive"
 CONTENT_HEADER              = "gzip, deflate"
 DEFAULT_USER_AGENT_HEADER   = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/138.0.0.0 Safari/537.36"
@@ -37,6 +45,144 @@ CONNECTION_TIMEOUT  = 3
 READ_TIMEOUT        = 30
 LIVE_STATUS_TIMEOUT = 7
 
+#Maximum number of simultaneous connections used for fetching the IPTV data
+MAX_FETCH_CONNECTIONS = 4
+
+#Connection pool sizes of the shared HTTP session
+POOL_CONNECTIONS    = 10    #Number of hosts for which a connection pool is kept
+POOL_MAXSIZE        = 8     #Number of kept-alive connections per host
+
+#Size of the chunks in which the streaming lists are downloaded and parsed
+JSON_STREAM_CHUNK_SIZE = 256 * 1024
+
+#Fields added to the entries when they are prepared. They depend on the favorites and URL settings, so they are not cached.
+DERIVED_ENTRY_FIELDS = frozenset(('url', 'favorite'))
+
+#Number of programmes of the short EPG, which is shown while the full EPG table is downloading
+SHORT_EPG_LIMIT = 4
+
+#Shared HTTP session used by all workers, so connections to the IPTV provider are reused
+http_session        = None
+http_session_lock   = threading.Lock()
+http_user_agent     = DEFAULT_USER_AGENT_HEADER
+
+def get_http_session():
+    global http_session
+
+    #Create the session once, the connection pools of the session are thread-safe
+    with http_session_lock:
+        if http_session is None:
+            adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+
+            session = requests.Session()
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers.update({
+                "Connection": CONNECTION_HEADER,
+                "Accept-Encoding": CONTENT_HEADER,
+                "User-Agent": http_user_agent
+            })
+
+            http_session = session
+
+        return http_session
+
+def set_user_agent(user_agent):
+    global http_user_agent
+
+    http_user_agent = user_agent
+
+    #Update the header of the shared session
+    with http_session_lock:
+        if http_session is not None:
+            http_session.headers["User-Agent"] = user_agent
+
+def http_get(url, params=None, timeout=None, **kwargs):
+    #Use the current timeout settings by default
+    if timeout is None:
+        timeout = (CONNECTION_TIMEOUT, READ_TIMEOUT)
+
+    return get_http_session().get(url, params=params, timeout=timeout, **kwargs)
+
+JSON_WHITESPACE = re.compile(r'[ \t\n\r]*')
+json_decoder    = json.JSONDecoder()
+
+def parse_json_array_stream(chunks, on_entry=None):
+    #Parse a JSON array entry by entry while it is downloading, so the whole response is never kept in memory.
+    #Any other JSON value is parsed at once.
+    decoder     = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    buffer      = ""
+    pos         = 0
+    entries     = None
+    finished    = False
+
+    for chunk in chunks:
+        #Keep only the unparsed part of the buffer
+        buffer      = buffer[pos:] + decoder.decode(chunk)
+        pos         = JSON_WHITESPACE.match(buffer, 0).end()
+        failed_end  = -1
+
+        #Check if the response is an array
+        if entries is None:
+            if pos == len(buffer):
+                continue
+
+            if buffer[pos] != '[':
+                buffer += "".join(decoder.decode(chunk) for chunk in chunks) + decoder.decode(b"", final=True)
+                return json.loads(buffer)
+
+            entries = []
+            pos += 1
+
+        while not finished:
+            pos = JSON_WHITESPACE.match(buffer, pos).end()
+
+            if pos == len(buffer):
+                break
+
+            if buffer[pos] == ']':
+                finished = True
+                break
+
+            if buffer[pos] == ',':
+                pos += 1
+                continue
+
+            #Parse all complete entries at once, so the entries share their key strings.
+            #The last '}' is not always the end of an entry, then the entries are parsed one by one.
+            end     = buffer.rfind('}', pos)
+            batch   = None
+
+            if end > pos and end != failed_end:
+                try:
+                    batch   = json.loads(f"[{buffer[pos:end + 1]}]")
+                    pos     = end + 1
+                except json.JSONDecodeError:
+                    failed_end = end
+
+            if batch is None:
+                try:
+                    entry, pos = json_decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    #Entry is not completely downloaded yet
+                    break
+
+                batch = [entry]
+
+            #Entries for which on_entry returns False are left out
+            if on_entry:
+                batch = [entry for entry in batch if on_entry(entry) is not False]
+
+            entries.extend(batch)
+
+    if entries is None:
+        return json.loads(buffer + decoder.decode(b"", final=True))
+
+    if not finished:
+        raise Exception("Incomplete or invalid JSON array")
+
+    return entries
+
 class FetchDataWorkerSignals(QObject):
     finished        = pyqtSignal(dict, dict, dict)
     error           = pyqtSignal(str)
@@ -45,7 +191,7 @@ class FetchDataWorkerSignals(QObject):
     show_info_msg   = pyqtSignal(str, str)
 
 class FetchDataWorker(QRunnable):
-    def __init__(self, server, username, password, live_url_format, movie_url_format, series_url_format, parent=None, fetch_vods=True):
+    def __init__(self, server, username, password, live_url_format, movie_url_format, series_url_format, parent=None, fetch_vods=True, load_from_cache=False, ingest_filter=None):
         super().__init__()
         self.server            = server
         self.username          = username
@@ -54,9 +200,13 @@ class FetchDataWorker(QRunnable):
         self.movie_url_format  = movie_url_format
         self.series_url_format = series_url_format
         self.fetch_vods        = fetch_vods
+        self.load_from_cache   = load_from_cache
         self.parent            = parent
         self.signals           = FetchDataWorkerSignals()
 
+        #Rules of the account for leaving out streams, no rules when empty
+        self.ingest_filter     = ingest_filter if ingest_filter and not ingest_filter.is_empty() else None
+
     @pyqtSlot()
     def run(self):
         try:
@@ -71,46 +221,42 @@ class FetchDataWorker(QRunnable):
                 'Series': []
             }
 
-            #Create header
-            headers = {
-                "Connection": CONNECTION_HEADER,
-                "Accept-Encoding": CONTENT_HEADER,
-                "User-Agent": self.parent.current_user_agent
-            }
-
             params = {
                 'username': self.username,
-                'password': self.password,
-                'action': ''
+                'password': self.password
             }
 
             host_url = f"{self.server}/player_api.php"
 
             print("Going to fetch IPTV data")
 
-            #Get IPTV info
-            self.signals.progress_bar.emit(0, 5, "Fetching IPTV info")
-            try:
-                iptv_info_resp = requests.get(host_url, params=params, headers=headers, timeout=(CONNECTION_TIMEOUT, READ_TIMEOUT))
-                iptv_info_resp.raise_for_status()
+            iptv_info_data = {}
 
-                iptv_info_data = iptv_info_resp.json()
-            except Exception as e:
-                iptv_info_data = {}
+            #Streaming lists of which the entries are already prepared and checked by the ingest filter
+            prepared_stream_types = set()
+
+            fav_data = {}
 
-                print(f"failed fetching IPTV data: {e}")
+            #Check if favorites file exists
+            if path.isfile(self.parent.favorites_file):
+                print("Favorites file is there")
+
+                with open(self.parent.favorites_file, 'r') as fav_file:
+                    fav_data = json.load(fav_file)
+
+            #Use sets of favorite ids, so checking each entry is a constant time lookup
+            fav_data = {fav_key: set(fav_ids) for fav_key, fav_ids in fav_data.items()}
 
             #Load cached data
             cached_data = {}
 
-            #Check if cache file exists
-            if path.isfile(self.parent.cache_file):
+            #Check if cache file of this account exists
+            if self.parent.catalog_cache.has_cache(self.server, self.username):
                 print("Cache file is there")
 
                 try:
                     print("Loading cached data")
-                    with open(self.parent.cache_file, 'r') as cache_file:
-                        cached_data = json.load(cache_file)
+                    cached_data = self.parent.catalog_cache.load(self.server, self.username)
                 except Exception as e:
                     cached_data = {}
 
@@ -122,7 +268,31 @@ class FetchDataWorker(QRunnable):
             config = configparser.ConfigParser()
             config.read(self.parent.user_data_file)
 
-            if 'Debug' in config and config['Debug']['load_with_cache'] == 'True':   #For testing purposes only
+            if self.load_from_cache:
+                #Only load the cached data, fresh data is fetched afterwards in the background
+                if not cached_data.get('LIVE', 0):
+                    raise Exception("No cached IPTV data available")
+
+                self.signals.progress_bar.emit(0, 80, "Loading cached IPTV data")
+
+                for stream_type in entries_per_stream_type.keys():
+                    categories_per_stream_type[stream_type] = cached_data.get(f"{stream_type} categories", [])
+                    entries_per_stream_type[stream_type]    = cached_data.get(stream_type, [])
+
+                #The rules of the account can have changed since the data was cached
+                if self.ingest_filter:
+                    self.ingest_filter.filter_data(categories_per_stream_type, entries_per_stream_type)
+
+            elif 'Debug' in config and config['Debug']['load_with_cache'] == 'True':   #For testing purposes only
+                #Get IPTV info
+                self.signals.progress_bar.emit(0, 5, "Fetching IPTV info")
+                try:
+                    iptv_info_data = self.fetch_action(host_url, params, '')
+                except Exception as e:
+                    iptv_info_data = {}
+
+                    print(f"failed fetching IPTV data: {e}")
+
                 categories_per_stream_type['LIVE'] = cached_data['LIVE categories']
                 categories_per_stream_type['Movies'] = cached_data['Movies categories']
                 categories_per_stream_type['Series'] = cached_data['Series categories']
@@ -130,250 +300,103 @@ class FetchDataWorker(QRunnable):
                 entries_per_stream_type['Movies'] = cached_data['Movies']
                 entries_per_stream_type['Series'] = cached_data['Series']
             else:
-                #Get all category data
-                print("Fetching Live TV categories")
-                self.signals.progress_bar.emit(5, 10, "Fetching LIVE Categories")
-                try:
-                    params['action'] = 'get_live_categories'
-                    live_category_resp = requests.get(host_url, params=params, headers=headers, timeout=(CONNECTION_TIMEOUT, READ_TIMEOUT))
-                    live_category_resp.raise_for_status()  #Raises HTTP error is status is 4xx or 5xx
-
-                    categories_per_stream_type['LIVE'] = live_category_resp.json()
-                except Exception as e:
-                    print(f"failed fetching LIVE categories: {e}")
-
-                    if cached_data.get('LIVE categories', 0):
-                        print("Getting LIVE categories from cache")
-                        categories_per_stream_type['LIVE'] = cached_data['LIVE categories']
-
-                        #Notify user that data is fetched from cache file
-                        # self.signals.show_info_msg.emit('Getting IPTV data from cache', 
-                        #     "Couldn't get Live TV categories from IPTV provider.\n"
-                        #     "Please check your internet connection or if IPTV server is still online.\n"
-                        #     "Fortunately, Live TV categories could be loaded from cache.")
-                        print("Failed fetching Live TV categories. Got them from cache.")
-                    else:
-                        #Display error msg that data fetching failed
-                        # self.signals.show_error_msg.emit('Failed fetching data from IPTV provider', 
-                        #     "Couldn't get Live TV categories from IPTV provider.\n"
-                        #     "Please check your internet connection or if IPTV server is still online.")
-                        print("Failed fetching Live TV categories")
-
-                if self.fetch_vods:
-                    print("Fetching Movies categories")
-                    self.signals.progress_bar.emit(10, 20, "Fetching VOD Categories")
-                    try:
-                        params['action'] = 'get_vod_categories'
-                        movies_category_resp = requests.get(host_url, params=params, headers=headers, timeout=(CONNECTION_TIMEOUT, READ_TIMEOUT))
-                        movies_category_resp.raise_for_status()  #Raises HTTP error is status is 4xx or 5xx
-
-                        categories_per_stream_type['Movies'] = movies_category_resp.json()
-                    except Exception as e:
-                        print(f"failed fetching VOD categories: {e}")
-
-                        if cached_data.get('Movies categories', 0):
-                            print("Getting Movies categories from cache")
-                            categories_per_stream_type['Movies'] = cached_data['Movies categories']
-
-                            #Notify user that data is fetched from cache file
-                            # self.signals.show_info_msg.emit('Getting IPTV data from cache', 
-                            #     "Couldn't get Movies categories from IPTV provider.\n"
-                            #     "Please check your internet connection or if IPTV server is still online.\n"
-                            #     "Fortunately, Movies categories could be loaded from cache.")
-                            print("Failed fetching Movies categories. Got them from cache.")
+                #Endpoints to fetch: (action, cache key, destination, stream type, VOD endpoint).
+                #The large streaming lists are listed first so they are started first.
+                endpoints = [
+                    ('get_vod_streams',         'Movies',               entries_per_stream_type,    'Movies',   True),
+                    ('get_series',              'Series',               entries_per_stream_type,    'Series',   True),
+                    ('get_live_streams',        'LIVE',                 entries_per_stream_type,    'LIVE',     False),
+                    ('get_live_categories',     'LIVE categories',      categories_per_stream_type, 'LIVE',     False),
+                    ('get_vod_categories',      'Movies categories',    categories_per_stream_type, 'Movies',   True),
+                    ('get_series_categories',   'Series categories',    categories_per_stream_type, 'Series',   True),
+                ]
+
+                #Skip VOD endpoints if disabled
+                if not self.fetch_vods:
+                    endpoints = [endpoint for endpoint in endpoints if not endpoint[4]]
+
+                #Number of requests including the IPTV info request
+                num_of_requests = len(endpoints) + 1
+                num_of_finished = 0
+
+                self.signals.progress_bar.emit(0, 5, f"Fetching IPTV data: 0 of {num_of_requests}")
+
+                #Fetch IPTV info and all endpoints concurrently with a bounded number of connections
+                with ThreadPoolExecutor(max_workers=min(MAX_FETCH_CONNECTIONS, num_of_requests)) as executor:
+                    futures = {executor.submit(self.fetch_action, host_url, params, ''): None}
+                    for endpoint in endpoints:
+                        if endpoint[2] is entries_per_stream_type:
+                            #Parse and prepare the large streaming lists while downloading
+                            futures[executor.submit(self.fetch_streams, host_url, params, endpoint[0], fav_data)] = endpoint
                         else:
-                            #Display error msg that data fetching failed
-                            # self.signals.show_error_msg.emit('Failed fetching data from IPTV provider', 
-                            #     "Couldn't get Movies categories from IPTV provider.\n"
-                            #     "Please check your internet connection or if IPTV server is still online.")
-                            print("Failed fetching Movies categories")
-
-                if self.fetch_vods:
-                    print("Fetching Series categories")
-                    self.signals.progress_bar.emit(20, 30, "Fetching Series Categories")
-                    try:
-                        params['action'] = 'get_series_categories'
-                        series_category_resp = requests.get(host_url, params=params, headers=headers, timeout=(CONNECTION_TIMEOUT, READ_TIMEOUT))
-                        series_category_resp.raise_for_status()  #Raises HTTP error is status is 4xx or 5xx
-
-                        categories_per_stream_type['Series'] = series_category_resp.json()
-                    except Exception as e:
-                        print(f"failed fetching Series categories: {e}")
-
-                        if cached_data.get('Series categories', 0):
-                            print("Getting Series categories from cache")
-                            categories_per_stream_type['Series'] = cached_data['Series categories']
-
-                            #Notify user that data is fetched from cache file
-                            # self.signals.show_info_msg.emit('Getting IPTV data from cache', 
-                            #     "Couldn't get Series categories from IPTV provider.\n"
-                            #     "Please check your internet connection or if IPTV server is still online.\n"
-                            #     "Fortunately, Series categories could be loaded from cache.")
-                            print("Failed fetching Series categories. Got them from cache.")
-                        else:
-                            #Display error msg that data fetching failed
-                            # self.signals.show_error_msg.emit('Failed fetching data from IPTV provider', 
-                            #     "Couldn't get Series categories from IPTV provider.\n"
-                            #     "Please check your internet connection or if IPTV server is still online.")
-                            print("Failed fetching Series categories")
-
-                print("Fetching Live TV streaming data")
-                #Get all streaming data
-                self.signals.progress_bar.emit(30, 40, "Fetching LIVE Streaming data")
-                try:
-                    params['action'] = 'get_live_streams'
-                    live_streams_resp = requests.get(host_url, params=params, headers=headers, timeout=(CONNECTION_TIMEOUT, READ_TIMEOUT))
-                    live_streams_resp.raise_for_status()  #Raises HTTP error is status is 4xx or 5xx
+                            futures[executor.submit(self.fetch_action, host_url, params, endpoint[0])] = endpoint
 
-                    entries_per_stream_type['LIVE'] = live_streams_resp.json()
-                except Exception as e:
-                    print(f"failed fetching LIVE streams: {e}")
-
-                    if cached_data.get('LIVE', 0):
-                        print("Getting LIVE streams from cache")
-                        entries_per_stream_type['LIVE'] = cached_data['LIVE']
-
-                        #Notify user that data is fetched from cache file
-                        # self.signals.show_info_msg.emit('Getting IPTV data from cache', 
-                        #     "Couldn't get Live TV streams from IPTV provider.\n"
-                        #     "Please check your internet connection or if IPTV server is still online.\n"
-                        #     "Fortunately, Live TV streams could be loaded from cache.")
-                        print("Failed fetching Live TV streams. Got them from cache.")
-                    else:
-                        #Display error msg that data fetching failed
-                        # self.signals.show_error_msg.emit('Failed fetching data from IPTV provider', 
-                        #     "Couldn't get Live TV streams from IPTV provider.\n"
-                        #     "Please check your internet connection or if IPTV server is still online.")
-                        print("Failed fetching Live TV streams")
-
-                if self.fetch_vods:
-                    print("Fetching Movies streaming data")
-                    self.signals.progress_bar.emit(40, 60, "Fetching VOD Streaming data")
-                    try:
-                        params['action'] = 'get_vod_streams'
-                        movies_streams_resp = requests.get(host_url, params=params, headers=headers, timeout=(CONNECTION_TIMEOUT, READ_TIMEOUT))
-                        movies_streams_resp.raise_for_status()  #Raises HTTP error is status is 4xx or 5xx
-
-                        entries_per_stream_type['Movies'] = movies_streams_resp.json()
-                    except Exception as e:
-                        print(f"failed fetching VOD streams: {e}")
-
-                        if cached_data.get('Movies', 0):
-                            print("Getting Movies streams from cache")
-                            entries_per_stream_type['Movies'] = cached_data['Movies']
-
-                            #Notify user that data is fetched from cache file
-                            # self.signals.show_info_msg.emit('Getting IPTV data from cache', 
-                            #     "Couldn't get Movies streams from IPTV provider.\n"
-                            #     "Please check your internet connection or if IPTV server is still online.\n"
-                            #     "Fortunately, Movies streams could be loaded from cache.")
-                            print("Failed fetching Movies streams. Got them from cache.")
-                        else:
-                            #Display error msg that data fetching failed
-                            # self.signals.show_error_msg.emit('Failed fetching data from IPTV provider', 
-                            #     "Couldn't get Movies streams from IPTV provider.\n"
-                            #     "Please check your internet connection or if IPTV server is still online.")
-                            print("Failed fetching Live TV streams")
-
-                if self.fetch_vods:
-                    print("Fetching Series streaming data")
-                    self.signals.progress_bar.emit(60, 80, "Fetching Series Streaming data")
-                    try:
-                        params['action'] = 'get_series'
-                        series_streams_resp = requests.get(host_url, params=params, headers=headers, timeout=(CONNECTION_TIMEOUT, READ_TIMEOUT))
-                        series_streams_resp.raise_for_status()  #Raises HTTP error is status is 4xx or 5xx
-
-                        entries_per_stream_type['Series'] = series_streams_resp.json()
-                    except Exception as e:
-                        print(f"failed fetching Series streams: {e}")
-
-                        if cached_data.get('Series', 0):
-                            print("Getting Series streams from cache")
-                            entries_per_stream_type['Series'] = cached_data['Series']
-
-                            #Notify user that data is fetched from cache file
-                            # self.signals.show_info_msg.emit('Getting IPTV data from cache', 
-                            #     "Couldn't get Series streams from IPTV provider.\n"
-                            #     "Please check your internet connection or if IPTV server is still online.\n"
-                            #     "Fortunately, Series streams could be loaded from cache.")
-                            print("Failed fetching Series streams. Got them from cache.")
+                    for future in as_completed(futures):
+                        endpoint = futures[future]
+
+                        if endpoint is None:
+                            #Get IPTV info
+                            try:
+                                iptv_info_data = future.result()
+                            except Exception as e:
+                                print(f"failed fetching IPTV data: {e}")
                         else:
-                            #Display error msg that data fetching failed
-                            # self.signals.show_error_msg.emit('Failed fetching data from IPTV provider', 
-                            #     "Couldn't get Series streams from IPTV provider.\n"
-                            #     "Please check your internet connection or if IPTV server is still online.")
-                            print("Failed fetching Series streams")
+                            action, cache_key, destination, stream_type, _ = endpoint
 
-                print("going to create cached data")
+                            try:
+                                destination[stream_type] = future.result()
 
-                all_cached_data = json.dumps({
-                        'LIVE categories': categories_per_stream_type['LIVE'],
-                        'Movies categories': categories_per_stream_type['Movies'],
-                        'Series categories': categories_per_stream_type['Series'],
-                        'LIVE': entries_per_stream_type['LIVE'],
-                        'Movies': entries_per_stream_type['Movies'],
-                        'Series': entries_per_stream_type['Series']
-                    }, 
-                    indent=4)
+                                if destination is entries_per_stream_type:
+                                    prepared_stream_types.add(stream_type)
+                            except Exception as e:
+                                print(f"failed fetching {cache_key}: {e}")
 
-                with open(self.parent.cache_file, 'w') as cache_file:
-                    cache_file.write(all_cached_data)
+                                #Fall back to cached data of this endpoint
+                                if cached_data.get(cache_key, 0):
+                                    destination[stream_type] = cached_data[cache_key]
 
-            # self.set_progress_bar(100, "Finished loading data")
-            self.signals.progress_bar.emit(80, 100, "Finished Fetching data")
+                                    print(f"Failed fetching {cache_key}. Got them from cache.")
+                                else:
+                                    print(f"Failed fetching {cache_key}")
 
-            fav_data = {}
+                        #Report progress per finished request
+                        prev_perc = 5 + (75 * num_of_finished) // num_of_requests
+                        num_of_finished += 1
+                        perc = 5 + (75 * num_of_finished) // num_of_requests
+                        self.signals.progress_bar.emit(prev_perc, perc, f"Fetching IPTV data: {num_of_finished} of {num_of_requests}")
 
-            #Check if cache file exists
-            if path.isfile(self.parent.favorites_file):
-                print("Favorites file is there")
+                #Leave out hidden categories and their entries before they are cached
+                if self.ingest_filter:
+                    self.ingest_filter.filter_data(categories_per_stream_type, entries_per_stream_type, prepared_stream_types)
 
-                with open(self.parent.favorites_file, 'r') as fav_file:
-                    fav_data = json.load(fav_file)
+                print("going to create cached data")
+
+                all_cached_data = {
+                    'LIVE categories': categories_per_stream_type['LIVE'],
+                    'Movies categories': categories_per_stream_type['Movies'],
+                    'Series categories': categories_per_stream_type['Series'],
+                    'LIVE': entries_per_stream_type['LIVE'],
+                    'Movies': entries_per_stream_type['Movies'],
+                    'Series': entries_per_stream_type['Series']
+                }
+
+                #Save to the cache of this account
+                try:
+                    self.parent.catalog_cache.save(self.server, self.username, all_cached_data, DERIVED_ENTRY_FIELDS)
+                except Exception as e:
+                    print(f"Failed saving cache file: {e}")
+
+            # self.set_progress_bar(100, "Finished loading data")
+            self.signals.progress_bar.emit(80, 100, "Finished Fetching data")
 
             print("Preparing streaming data")
-            #Make streaming URL in each entry except for the series
+            #Make streaming URL in each entry, entries of fetched streaming lists are already prepared while downloading
             for tab_name in entries_per_stream_type.keys():
-                for idx, entry in enumerate(entries_per_stream_type[tab_name]):
-                    #Get stream type. If no stream_type is found it is series
-                    stream_type         = entry.get('stream_type', 'series')
-                    stream_id           = entry.get("stream_id", -1)
-                    series_id           = entry.get("series_id", -1)
-                    container_extension = entry.get("container_extension", "m3u8")
-
-                    #Correct for any vague other stream types. Series stream type is already fixed by code above.
-                    if "live" in stream_type:
-                        stream_type = "live"
-
-                    if "movie" in stream_type:
-                        stream_type = "movie"
-
-                    #Check if stream_id is valid
-                    if stream_id:
-                        entries_per_stream_type[tab_name][idx]["url"] = self.generate_url(stream_type, stream_id, container_extension)
-
-                        #Check if stream id is in favorites list in userdata.ini
-                        if stream_id in fav_data.get('stream_ids', []):
-                            #Add "favorite" parameter to entries_per_stream_type and set to True or False depending if inside userdata.ini
-                            entries_per_stream_type[tab_name][idx]['favorite'] = True
-                        else:
-                            entries_per_stream_type[tab_name][idx]['favorite'] = False
-                    else:
-                        entries_per_stream_type[tab_name][idx]["url"] = None
-
-                    #Check if stream type is series
-                    if stream_type == 'series':
-                        #Create stream type key for series data
-                        entries_per_stream_type[tab_name][idx]["stream_type"] = stream_type
-
-                        #Check if series_id is valid
-                        if series_id:
-                            #Check if series id is in favorites list in userdata.ini
-                            if series_id in fav_data.get('series_ids', []):
-                                #Add "favorite" parameter to entries_per_stream_type and set to True or False depending if inside userdata.ini
-                                entries_per_stream_type[tab_name][idx]['favorite'] = True
-                            else:
-                                entries_per_stream_type[tab_name][idx]['favorite'] = False
+                if tab_name in prepared_stream_types:
+                    continue
+
+                for entry in entries_per_stream_type[tab_name]:
+                    self.prepare_entry(entry, fav_data)
 
             #Send received data to processing function
             self.signals.finished.emit(iptv_info_data, categories_per_stream_type, entries_per_stream_type)
@@ -384,6 +407,82 @@ class FetchDataWorker(QRunnable):
             print(f"Exception! {e}")
             self.signals.error.emit(str(e))
 
+    def fetch_action(self, host_url, params, action):
+        #Copy parameters, because the requests are running concurrently.
+        #The IPTV info request has no action, some panels handle an empty action differently.
+        action_params = dict(params)
+        if action:
+            action_params['action'] = action
+
+        resp = http_get(host_url, params=action_params)
+        resp.raise_for_status()  #Raises HTTP error is status is 4xx or 5xx
+
+        return resp.json()
+
+    def fetch_streams(self, host_url, params, action, fav_data):
+        #Copy parameters, because the requests are running concurrently
+        action_params = dict(params)
+        action_params['action'] = action
+
+        with http_get(host_url, params=action_params, stream=True) as resp:
+            resp.raise_for_status()  #Raises HTTP error is status is 4xx or 5xx
+
+            entries = parse_json_array_stream(resp.iter_content(chunk_size=JSON_STREAM_CHUNK_SIZE), lambda entry: self.ingest_entry(entry, fav_data))
+
+        #Streaming lists have to be a list of entries
+        if not isinstance(entries, list):
+            raise Exception(f"Unexpected response for {action}")
+
+        return entries
+
+    def ingest_entry(self, entry, fav_data):
+        #Leave out entries of which the name or adult flag is filtered, so they are never kept in memory
+        if self.ingest_filter and not self.ingest_filter.accepts_entry(entry):
+            return False
+
+        self.prepare_entry(entry, fav_data)
+
+    def prepare_entry(self, entry, fav_data):
+        #Get stream type. If no stream_type is found it is series
+        stream_type         = entry.get('stream_type', 'series')
+        stream_id           = entry.get("stream_id", -1)
+        series_id           = entry.get("series_id", -1)
+        container_extension = entry.get("container_extension", "m3u8")
+
+        #Correct for any vague other stream types. Series stream type is already fixed by code above.
+        if "live" in stream_type:
+            stream_type = "live"
+
+        if "movie" in stream_type:
+            stream_type = "movie"
+
+        #Check if stream_id is valid
+        if stream_id:
+            entry["url"] = self.generate_url(stream_type, stream_id, container_extension)
+
+            #Check if stream id is in favorites list in userdata.ini
+            if stream_id in fav_data.get('stream_ids', ()):
+                #Add "favorite" parameter to entry and set to True or False depending if inside userdata.ini
+                entry['favorite'] = True
+            else:
+                entry['favorite'] = False
+        else:
+            entry["url"] = None
+
+        #Check if stream type is series
+        if stream_type == 'series':
+            #Create stream type key for series data
+            entry["stream_type"] = stream_type
+
+            #Check if series_id is valid
+            if series_id:
+                #Check if series id is in favorites list in userdata.ini
+                if series_id in fav_data.get('series_ids', ()):
+                    #Add "favorite" parameter to entry and set to True or False depending if inside userdata.ini
+                    entry['favorite'] = True
+                else:
+                    entry['favorite'] = False
+
     def generate_url(self, stream_type, stream_id, container_extension):
         # Select the appropriate format string
         if stream_type == 'live':
@@ -426,13 +525,6 @@ class MovieInfoFetcher(QRunnable):
     def run(self):
         try:
             #Set request parameters
-            # headers = {'User-Agent': CUSTOM_USER_AGENT}
-            #Create header
-            headers = {
-                "Connection": CONNECTION_HEADER,
-                "Accept-Encoding": CONTENT_HEADER,
-                "User-Agent": self.parent.current_user_agent
-            }
             host_url = f"{self.server}/player_api.php"
             params = {
                 'username': self.username,
@@ -442,7 +534,7 @@ class MovieInfoFetcher(QRunnable):
             }
 
             #Request vod info
-            vod_info_resp = requests.get(host_url, params=params, headers=headers, timeout=(CONNECTION_TIMEOUT, READ_TIMEOUT))
+            vod_info_resp = http_get(host_url, params=params)
 
             #Get vod info data
             vod_info_data = vod_info_resp.json()
@@ -483,13 +575,6 @@ class SeriesInfoFetcher(QRunnable):
     def run(self):
         try:
             #Set request parameters
-            # headers = {'User-Agent': CUSTOM_USER_AGENT}
-            #Create header
-            headers = {
-                "Connection": CONNECTION_HEADER,
-                "Accept-Encoding": CONTENT_HEADER,
-                "User-Agent": self.parent.current_user_agent
-            }
             host_url = f"{self.server}/player_api.php"
             params = {
                 'username': self.username,
@@ -499,7 +584,7 @@ class SeriesInfoFetcher(QRunnable):
             }
 
             #Request series info
-            series_info_resp = requests.get(host_url, params=params, headers=headers, timeout=(CONNECTION_TIMEOUT, READ_TIMEOUT))
+            series_info_resp = http_get(host_url, params=params)
 
             #Get series info data
             series_info_data = series_info_resp.json()
@@ -529,17 +614,8 @@ class ImageFetcher(QRunnable):
     @pyqtSlot()
     def run(self):
         try:
-            #Set header for request
-            # headers = {'User-Agent': CUSTOM_USER_AGENT}
-            #Create header
-            headers = {
-                "Connection": CONNECTION_HEADER,
-                "Accept-Encoding": CONTENT_HEADER,
-                "User-Agent": self.parent.current_user_agent
-            }
-
             #Request image
-            image_resp = requests.get(self.img_url, headers=headers, timeout=(CONNECTION_TIMEOUT, READ_TIMEOUT))
+            image_resp = http_get(self.img_url)
 
             #Check if response code is valid, otherwise set replacement image
             resp_status = image_resp.status_code
@@ -571,77 +647,187 @@ class ImageFetcher(QRunnable):
             self.signals.error.emit(str(e))
 
 class SearchWorkerSignals(QObject):
-    list_widget = pyqtSignal(list, str)
-    error = pyqtSignal(str)
+    finished = pyqtSignal(int, str, str, list)
+    error = pyqtSignal(int, str, str)
 
 class SearchWorker(QRunnable):
-    def __init__(self, stream_type, currently_loaded_entries, list_widgets, text):
+    def __init__(self, generation, stream_type, search_index, loaded_rows, text, narrow_rows=None):
         super().__init__()
-        self.stream_type = stream_type
-        self.currently_loaded_entries = currently_loaded_entries[0]
-        self.list_widgets = list_widgets[0]
-        self.text = text
+        #Generation of the search, the GUI only shows the result of the latest search
+        self.generation     = generation
+        self.stream_type    = stream_type
+
+        #Search index snapshot and row lists are not changed anymore by the GUI, so they can be read here
+        self.search_index   = search_index
+        self.loaded_rows    = loaded_rows
+        self.text           = text
+        self.narrow_rows    = narrow_rows
 
         self.signals = SearchWorkerSignals()
 
-        # self.setAutoDelete(True)
+    @pyqtSlot()
+    def run(self):
+        try:
+            if self.narrow_rows is not None:
+                #Only the results of the previous search can match
+                rows = self.search_index.filter(self.narrow_rows, self.text)
+
+            else:
+                #Search with the trigram index
+                found_rows = self.search_index.search(self.text)
+
+                #Only keep rows of the loaded list, all rows are loaded when there are no loaded rows given
+                rows = found_rows if self.loaded_rows is None else intersect_rows(found_rows, self.loaded_rows)
+
+            self.signals.finished.emit(self.generation, self.stream_type, self.search_index.get_key(self.text), rows)
+        except Exception as e:
+            print(f"failed search worker: {e}")
+            self.signals.error.emit(self.generation, self.stream_type, str(e))
+
+class SearchIndexWorkerSignals(QObject):
+    finished = pyqtSignal(int, str, object)
+    error = pyqtSignal(int, str, str)
+
+class SearchIndexWorker(QRunnable):
+    def __init__(self, generation, stream_type, search_index, entries, strip_prefixes):
+        super().__init__()
+        #Generation of the rebuild, the GUI only uses the indexes of the latest rebuild
+        self.generation     = generation
+        self.stream_type    = stream_type
+
+        #Search index snapshot is not changed anymore by the GUI, so it can be read here
+        self.search_index   = search_index
+        self.entries        = entries
+        self.strip_prefixes = strip_prefixes
+
+        self.signals = SearchIndexWorkerSignals()
 
     @pyqtSlot()
     def run(self):
         try:
-            self.list_widgets[self.stream_type].clear()
-            print("starting searching through entries")
+            rebuilt_index = build_search_index(self.search_index, self.entries, self.strip_prefixes)
+
+            self.signals.finished.emit(self.generation, self.stream_type, rebuilt_index)
+        except Exception as e:
+            print(f"failed rebuilding search index: {e}")
+            self.signals.error.emit(self.generation, self.stream_type, str(e))
+
+class GlobalSearchWorkerSignals(QObject):
+    results = pyqtSignal(int, str, list)
+    finished = pyqtSignal(int, str)
+    error = pyqtSignal(int, str)
+
+class GlobalSearchWorker(QRunnable):
+    def __init__(self, generation, search_indexes, episode_titles, text, max_results):
+        super().__init__()
+        #Generation of the search, the GUI only shows the results of the latest search
+        self.generation     = generation
 
-            for entry in self.currently_loaded_entries[self.stream_type]:
-                if self.text.lower() in entry['name'].lower():
-                    item = QListWidgetItem(entry['name'])
-                    item.setData(Qt.UserRole, entry)
+        #Search index snapshot per stream type and titles of the loaded episodes
+        self.search_indexes = search_indexes
+        self.episode_titles = episode_titles
+        self.text           = text
+        self.max_results    = max_results
 
-                    self.list_widgets[self.stream_type].addItem(item)
+        self.signals = GlobalSearchWorkerSignals()
 
-                    print(entry['name'])
+    @pyqtSlot()
+    def run(self):
+        try:
+            #Results are sent per stream type, so the first results are shown while the others are searched
+            for stream_type, search_index in self.search_indexes.items():
+                search_key = search_index.get_key(self.text)
+                found_rows = search_index.search(self.text)
+                self.signals.results.emit(self.generation, stream_type, rank_rows(search_index.names, found_rows, search_key, self.max_results))
+
+            folded_text = fold_text(self.text)
 
-            self.signals.list_widget.emit([self.list_widgets[self.stream_type]], self.stream_type)
+            #Loaded episodes are not indexed, there are only a few of them
+            if self.episode_titles:
+                episode_names   = [fold_text(title) for title in self.episode_titles]
+                found_rows      = [row for row, name in enumerate(episode_names) if folded_text in name]
+                self.signals.results.emit(self.generation, 'Episodes', rank_rows(episode_names, found_rows, folded_text, self.max_results))
+
+            self.signals.finished.emit(self.generation, folded_text)
         except Exception as e:
-            print(f"failed search worker: {e}")
+            print(f"failed global search worker: {e}")
+            self.signals.error.emit(self.generation, str(e))
 
 class EPGWorkerSignals(QObject):
-    finished = pyqtSignal(list)
+    short_finished = pyqtSignal(list)
+    finished = pyqtSignal(list, bool)
     error = pyqtSignal(str)
 
 class EPGWorker(QRunnable):
-    def __init__(self, server, username, password, stream_id, parent=None):
+    def __init__(self, server, username, password, stream_id, parent=None, short_epg_limit=SHORT_EPG_LIMIT, epg_store=None):
         super().__init__()
-        self.server     = server
-        self.username   = username
-        self.password   = password
-        self.stream_id  = stream_id
-        self.parent     = parent
-        self.signals    = EPGWorkerSignals()
+        self.server             = server
+        self.username           = username
+        self.password           = password
+        self.stream_id          = stream_id
+        self.parent             = parent
+        self.short_epg_limit    = short_epg_limit
+        self.epg_store          = epg_store  #EPG store of the account the EPG is fetched for
+        self.signals            = EPGWorkerSignals()
 
     @pyqtSlot()
     def run(self):
+        #First fetch the next few programmes, so they can be shown before the full EPG table is downloaded
+        short_epg_data = None
+
+        if self.short_epg_limit:
+            try:
+                short_epg_url = f"{self.server}/player_api.php?username={self.username}&password={self.password}&action=get_short_epg&stream_id={self.stream_id}&limit={self.short_epg_limit}"
+                short_epg_data = self.decryptEPGData(http_get(short_epg_url).json())
+
+                if short_epg_data:
+                    self.signals.short_finished.emit(short_epg_data)
+            except Exception as e:
+                print(f"failed fetching short EPG: {e}")
+
         try:
             #Creating url for requesting EPG data for specific stream
             epg_url = f"{self.server}/player_api.php?username={self.username}&password={self.password}&action=get_simple_data_table&stream_id={self.stream_id}"
-            # headers = {'User-Agent': CUSTOM_USER_AGENT}
-            #Create header
-            headers = {
-                "Connection": CONNECTION_HEADER,
-                "Accept-Encoding": CONTENT_HEADER,
-                "User-Agent": self.parent.current_user_agent
-            }
-
             #Requesting EPG data
-            response = requests.get(epg_url, headers=headers, timeout=(CONNECTION_TIMEOUT, READ_TIMEOUT))
+            response = http_get(epg_url)
             epg_data = response.json()
 
             #Decrypt EPG data with base 64
-            decrypted_epg_data = self.decryptEPGData(epg_data)
+            decrypted_epg_data = self.mergeEPGData(self.decryptEPGData(epg_data), short_epg_data)
 
-            self.signals.finished.emit(decrypted_epg_data)
+            self.saveEPGData(decrypted_epg_data)
+
+            self.signals.finished.emit(decrypted_epg_data, True)
         except Exception as e:
-            self.signals.error.emit(str(e))
+            #Keep the short EPG when the full EPG table failed, it is incomplete so it isn't cached
+            if short_epg_data:
+                print(f"failed fetching full EPG: {e}")
+                self.signals.finished.emit(short_epg_data, False)
+            else:
+                self.signals.error.emit(str(e))
+
+    def saveEPGData(self, epg_data):
+        #Cache the EPG on disk in this thread, so the GUI doesn't wait for writing it
+        if not self.epg_store or epg_data is None:
+            return
+
+        try:
+            self.epg_store.save_stream_epg(self.stream_id, epg_data, get_epg_expiry(epg_data, time.time()))
+        except Exception as e:
+            print(f"failed saving EPG: {e}")
+
+    def mergeEPGData(self, epg_data, short_epg_data):
+        #Add programmes of the short EPG that are missing in the full EPG table
+        if not short_epg_data:
+            return epg_data
+
+        if epg_data is None:
+            return short_epg_data
+
+        start_times = {epg_entry['start_time'] for epg_entry in epg_data}
+
+        return sorted(epg_data + [epg_entry for epg_entry in short_epg_data if epg_entry['start_time'] not in start_times],
+            key=lambda epg_entry: epg_entry['start_time'])
 
     def decryptEPGData(self, epg_data):
         try:
@@ -653,16 +839,15 @@ class EPGWorker(QRunnable):
                 stop_timestamp  = datetime.fromtimestamp(int(epg_entry['stop_timestamp']))
                 date            = f"{start_timestamp.day:02}-{start_timestamp.month:02}-{start_timestamp.year}"
 
-                #Decode program name and descryption
-                program_name        = base64.b64decode(epg_entry['title']).decode("utf-8")
-                program_description = base64.b64decode(epg_entry['description']).decode("utf-8")
+                #Decode program name. The description is only decoded when it is shown.
+                program_name = base64.b64decode(epg_entry['title']).decode("utf-8")
 
                 #Put only necessary EPG data in list
                 decrypted_epg_data.append({
                     'start_time': start_timestamp,
                     'stop_time': stop_timestamp,
                     'program_name': program_name,
-                    'description': program_description,
+                    'encoded_description': epg_entry['description'],
                     'date': date
                     })
 
@@ -671,6 +856,55 @@ class EPGWorker(QRunnable):
         except Exception as e:
             print(f"failed decrypting: {e}")
 
+class EPGDownloadWorkerSignals(QObject):
+    finished = pyqtSignal(int)
+    error = pyqtSignal(str)
+
+class EPGDownloadWorker(QRunnable):
+    def __init__(self, server, username, password, epg_store):
+        super().__init__()
+        self.server     = server
+        self.username   = username
+        self.password   = password
+        self.epg_store  = epg_store
+        self.signals    = EPGDownloadWorkerSignals()
+
+    @pyqtSlot()
+    def run(self):
+        try:
+            #Download the full XMLTV guide of all channels
+            params = {
+                'username': self.username,
+                'password': self.password
+            }
+
+            with http_get(f"{self.server}/xmltv.php", params=params, stream=True) as resp:
+                resp.raise_for_status()  #Raises HTTP error is status is 4xx or 5xx
+
+                #Let the raw stream decompress gzip responses, so it can be parsed while downloading
+                resp.raw.decode_content = True
+
+                num_of_programmes = self.epg_store.replace_all(iter_xmltv_programmes(resp.raw))
+
+            self.signals.finished.emit(num_of_programmes)
+        except Exception as e:
+            print(f"failed downloading EPG: {e}")
+            self.signals.error.emit(str(e))
+
+class EPGCleanupWorker(QRunnable):
+    def __init__(self, epg_store, before):
+        super().__init__()
+        self.epg_store  = epg_store
+        self.before     = before
+
+    @pyqtSlot()
+    def run(self):
+        try:
+            #Forget cached EPG of channels that haven't been watched for a while
+            self.epg_store.remove_expired_stream_epg(self.before)
+        except Exception as e:
+            print(f"failed removing expired EPG: {e}")
+
 class OnlineWorkerSignals(QObject):
     finished = pyqtSignal(int, str)
     error = pyqtSignal(str)
@@ -686,15 +920,9 @@ class OnlineWorker(QRunnable):
     @pyqtSlot()
     def run(self):
         try:
-            #Create header
-            headers = {
-                "Connection": CONNECTION_HEADER,
-                "Accept-Encoding": CONTENT_HEADER,
-                "User-Agent": self.parent.current_user_agent
-            }
 
             #Requesting stream playlist data
-            response = requests.get(self.url, headers=headers, timeout=(CONNECTION_TIMEOUT, LIVE_STATUS_TIMEOUT))
+            response = http_get(self.url, timeout=(CONNECTION_TIMEOUT, LIVE_STATUS_TIMEOUT))
             response_code = response.status_code
             url_data = response.text
 
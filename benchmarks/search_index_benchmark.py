@@ -0,0 +1,68 @@
+#Benchmark of the trigram search index against scanning all names.
+#Usage: python benchmarks/search_index_benchmark.py [number of entries]
+import sys
+import os
+import time
+import random
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from CatalogIndex import CatalogIndex
+from SearchIndex import TRIGRAM_LENGTH, fold_text
+
+#Target query latency of the search index
+TARGET_LATENCY_MS = 5
+
+NUM_OF_RUNS = 5
+
+WORDS       = ['the', 'movie', 'night', 'star', 'café', 'über', 'dark', 'news', 'sport', 'kids', 'radio', 'love', 'war',
+               'man', 'city', 'lost', 'return', 'king', 'queen', 'blue', 'red', 'HD', 'FHD', '4K', 'guldkanalen']
+PREFIXES    = ['UK |', 'NL|', 'DE-', 'PT|', 'SWE|', 'CN -', 'BE-VIP|', 'FR|', 'ES|', 'IT|']
+QUERIES     = ['the', 'star 12', 'queen blue', '1234', 'guldkanalen', 'uk | the', '(2001)', 'zzz', '4k']
+
+def make_entries(num_of_entries):
+    #Names look like the names of a typical IPTV provider
+    random.seed(1)
+
+    return [{
+        'stream_id': i,
+        'name': f"{random.choice(PREFIXES)} {' '.join(random.choice(WORDS) for _ in range(random.randint(1, 4)))} {random.randint(1, 99999)} ({random.randint(1950, 2024)})",
+        'category_id': str(i % 100)
+    } for i in range(num_of_entries)]
+
+def measure(function):
+    #Best and median time of multiple runs in ms
+    times = []
+
+    for _ in range(NUM_OF_RUNS):
+        start = time.perf_counter()
+        result = function()
+        times.append((time.perf_counter() - start) * 1000)
+
+    return result, min(times), statistics.median(times)
+
+def main():
+    num_of_entries = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+
+    entries = make_entries(num_of_entries)
+
+    start = time.perf_counter()
+    index = CatalogIndex('Movies', entries)
+    print(f"Indexed {num_of_entries} entries in {time.perf_counter() - start:.2f} s")
+    print()
+
+    print(f"{'query':<14}{'results':>9}{'index ms':>11}{'scan ms':>10}")
+
+    for query in QUERIES:
+        found_rows, index_best, index_median = measure(lambda: index.search_rows(query))
+        scan_rows, scan_best, scan_median = measure(lambda: [row for row, entry in enumerate(entries) if fold_text(query) in fold_text(entry['name'])])
+
+        if found_rows != scan_rows:
+            print(f"Results of '{query}' differ from scanning all names!")
+
+        within_target = "" if index_median <= TARGET_LATENCY_MS or len(query) < TRIGRAM_LENGTH - 1 else f"  above {TARGET_LATENCY_MS} ms"
+        print(f"{query:<14}{len(found_rows):>9}{index_median:>11.2f}{scan_median:>10.2f}{within_target}")
+
+if __name__ == "__main__":
+    main()
@@ -92,6 +92,12 @@ REM Run PyInstaller directly with all necessary options and added data files
   --add-data "Threadpools.py;." ^
   --add-data "CustomPyQtWidgets.py;." ^
   --add-data "AccountManager.py;." ^
+  --add-data "CatalogCache.py;." ^
+  --add-data "CatalogIndex.py;." ^
+  --add-data "SearchIndex.py;." ^
+  --add-data "IngestFilter.py;." ^
+  --add-data "EPGStore.py;." ^
+  --add-data "EPGIndex.py;." ^
   %MAIN_SCRIPT%
 
 IF "%exec_choice%"=="1" GOTO end
@@ -132,6 +138,12 @@ REM Create executable with debug console
   --add-data "Threadpools.py;." ^
   --add-data "CustomPyQtWidgets.py;." ^
   --add-data "AccountManager.py;." ^
+  --add-data "CatalogCache.py;." ^
+  --add-data "CatalogIndex.py;." ^
+  --add-data "SearchIndex.py;." ^
+  --add-data "IngestFilter.py;." ^
+  --add-data "EPGStore.py;." ^
+  --add-data "EPGIndex.py;." ^
   %MAIN_SCRIPT%
 
 :end
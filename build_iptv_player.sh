@@ -62,6 +62,12 @@ $PYINSTALLER \
   --add-data "Threadpools.py:." \
   --add-data "CustomPyQtWidgets.py:." \
   --add-data "AccountManager.py:." \
+  --add-data "CatalogCache.py:." \
+  --add-data "CatalogIndex.py:." \
+  --add-data "SearchIndex.py:." \
+  --add-data "IngestFilter.py:." \
+  --add-data "EPGStore.py:." \
+  --add-data "EPGIndex.py:." \
   "$MAIN_SCRIPT"
 
 echo